@@ -1,17 +1,17 @@
 import logging
-import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 import re
 import json_repair
-import json5  # More forgiving JSON parser
 import ast # For literal_eval
 
 # Assuming BaseModelClient is importable from clients.py in the same directory
 from .clients import BaseModelClient, load_model_client 
 # Import load_prompt and the new logging wrapper from utils
 from .utils import load_prompt, run_llm_and_log, log_llm_response
-from .prompt_constructor import build_context_prompt # Added import
+from .prompt_registry import get_prompt_template
+from .json_extract import iter_json_objects
+from .phase_context import get_phase_context
 from .clients import GameHistory
 from diplomacy import Game
 
@@ -20,23 +20,11 @@ logger = logging.getLogger(__name__)
 # == Best Practice: Define constants at module level ==
 ALL_POWERS = frozenset({"AUSTRIA", "ENGLAND", "FRANCE", "GERMANY", "ITALY", "RUSSIA", "TURKEY"})
 ALLOWED_RELATIONSHIPS = ["Enemy", "Unfriendly", "Neutral", "Friendly", "Ally"]
+# **key:** value pairs, used when a response has no JSON object at all
+_MARKDOWN_KV_RE = re.compile(r"\*\*(?P<key>[^:]+):\*\*\s*(?P<value>[\s\S]*?)(?=(?:\n\s*\*\*|$))", re.DOTALL)
 
-# == New: Helper function to load prompt files reliably ==
-def _load_prompt_file(filename: str) -> Optional[str]:
-    """Loads a prompt template from the prompts directory."""
-    try:
-        # Construct path relative to this file's location
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        prompts_dir = os.path.join(current_dir, 'prompts')
-        filepath = os.path.join(prompts_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    except FileNotFoundError:
-        logger.error(f"Prompt file not found: {filepath}")
-        return None
-    except Exception as e:
-        logger.error(f"Error loading prompt file {filepath}: {e}")
-        return None
+# Marks the rolling summary entry at the start of DiplomacyAgent.private_diary
+CONSOLIDATED_PREFIX = "[CONSOLIDATED HISTORY]"
 
 class DiplomacyAgent:
     """
@@ -82,12 +70,8 @@ class DiplomacyAgent:
         self.private_diary: List[str] = []
 
         # --- Load and set the appropriate system prompt ---
-        # Get the directory containing the current file (agent.py)
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        # Construct path relative to the current file's directory
-        prompts_dir = os.path.join(current_dir, "prompts") 
-        power_prompt_filename = os.path.join(prompts_dir, f"{power_name.lower()}_system_prompt.txt")
-        default_prompt_filename = os.path.join(prompts_dir, "system_prompt.txt")
+        power_prompt_filename = f"{power_name.lower()}_system_prompt.txt"
+        default_prompt_filename = "system_prompt.txt"
 
         system_prompt_content = load_prompt(power_prompt_filename)
 
@@ -107,234 +91,53 @@ class DiplomacyAgent:
         self.add_journal_entry(f"Agent initialized. Initial Goals: {self.goals}")
 
     def _extract_json_from_text(self, text: str) -> dict:
-        """Extract and parse JSON from text, handling common LLM response formats."""
+        """Extract and parse JSON from text, handling common LLM response formats (see json_extract.py)."""
         if not text or not text.strip():
             logger.warning(f"[{self.power_name}] Empty text provided to JSON extractor")
             return {}
-            
-        # Store original text for debugging
-        original_text = text
-        
-        # Preprocessing: Normalize common formatting issues
-        # This helps with the KeyError: '\n  "negotiation_summary"' problem
-        text = re.sub(r'\n\s+"(\w+)"\s*:', r'"\1":', text)  # Remove newlines before keys
-        # Fix specific patterns that cause trouble
-        problematic_patterns = [
-            'negotiation_summary', 'relationship_updates', 'updated_relationships',
-            'order_summary', 'goals', 'relationships', 'intent'
-        ]
-        for pattern in problematic_patterns:
-            text = re.sub(fr'\n\s*"{pattern}"', f'"{pattern}"', text)
-        
-        # Try different patterns to extract JSON
-        # Order matters - try most specific patterns first
-        patterns = [
-            # Special handling for ```{{ ... }}``` format that some models use
-            r"```\s*\{\{\s*(.*?)\s*\}\}\s*```",
-            # JSON in code blocks with or without language specifier
-            r"```(?:json)?\s*\n(.*?)\n\s*```",
-            # JSON after "PARSABLE OUTPUT:" or similar
-            r"PARSABLE OUTPUT:\s*(\{.*?\})",
-            r"JSON:\s*(\{.*?\})",
-            # Any JSON object
-            r"(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})",
-            # Simple JSON in backticks
-            r"`(\{.*?\})`",
-        ]
-        
-        # Try each pattern
-        for pattern_idx, pattern in enumerate(patterns):
-            matches = re.findall(pattern, text, re.DOTALL)
-            if matches:
-                for match_idx, match in enumerate(matches):
-                    # Multiple attempts with different parsers
-                    json_text = match.strip()
-                    
-                    # Attempt 1: Standard JSON after basic cleaning
-                    try:
-                        cleaned = self._clean_json_text(json_text)
-                        result = json.loads(cleaned)
-                        if isinstance(result, dict):
-                            logger.debug(f"[{self.power_name}] Successfully parsed JSON object with pattern {pattern_idx}, match {match_idx}")
-                            return result
-                        else:
-                            logger.warning(f"[{self.power_name}] Parsed JSON with pattern {pattern_idx}, match {match_idx}, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
-                    except json.JSONDecodeError as e_initial:
-                        logger.debug(f"[{self.power_name}] Standard JSON parse failed: {e_initial}")
-                        
-                        # Attempt 1.5: Try surgical cleaning with original patterns if basic cleaning failed
-                        try:
-                            # Apply several different cleaning patterns from the old method
-                            cleaned_match_candidate = json_text
-                            
-                            # Pattern 1: Removes 'Sentence.' when followed by ',', '}', or ']'
-                            cleaned_match_candidate = re.sub(r'\s*([A-Z][\w\s,]*?\.(?:\s+[A-Z][\w\s,]*?\.)*)\s*(?=[,\}\]])', '', cleaned_match_candidate)
-                            
-                            # Pattern 2: Removes 'Sentence.' when it's at the very end, before the final '}' of the current scope
-                            cleaned_match_candidate = re.sub(r'\s*([A-Z][\w\s,]*?\.(?:\s+[A-Z][\w\s,]*?\.)*)\s*(?=\s*\}\s*$)', '', cleaned_match_candidate)
-                            
-                            # Pattern 3: Fix for newlines and spaces before JSON keys (common problem with LLMs)
-                            cleaned_match_candidate = re.sub(r'\n\s+"(\w+)"\s*:', r'"\1":', cleaned_match_candidate)
-                            
-                            # Pattern 4: Fix trailing commas in JSON objects
-                            cleaned_match_candidate = re.sub(r',\s*}', '}', cleaned_match_candidate)
-                            
-                            # Pattern 5: Handle specific known problematic patterns
-                            for pattern in problematic_patterns:
-                                cleaned_match_candidate = cleaned_match_candidate.replace(f'\n  "{pattern}"', f'"{pattern}"')
-                            
-                            # Pattern 6: Fix quotes - replace single quotes with double quotes for keys
-                            cleaned_match_candidate = re.sub(r"'(\w+)'\s*:", r'"\1":', cleaned_match_candidate)
-
-                            # Only try parsing if cleaning actually changed something
-                            if cleaned_match_candidate != json_text:
-                                logger.debug(f"[{self.power_name}] Surgical cleaning applied. Attempting to parse modified JSON.")
-                                return json.loads(cleaned_match_candidate)
-                        except json.JSONDecodeError as e_surgical:
-                            logger.debug(f"[{self.power_name}] Surgical cleaning didn't work: {e_surgical}")
-                    
-                    # Attempt 2: json5 (more forgiving)
-                    try:
-                        result = json5.loads(json_text)
-                        if isinstance(result, dict):
-                            logger.debug(f"[{self.power_name}] Successfully parsed JSON object with json5")
-                            return result
-                        else:
-                            logger.warning(f"[{self.power_name}] Parsed with json5, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
-                    except Exception as e:
-                        logger.debug(f"[{self.power_name}] json5 parse failed: {e}")
-                    
-                    # Attempt 3: json-repair
-                    try:
-                        result = json_repair.loads(json_text)
-                        if isinstance(result, dict):
-                            logger.debug(f"[{self.power_name}] Successfully parsed JSON object with json-repair")
-                            return result
-                        else:
-                            logger.warning(f"[{self.power_name}] Parsed with json-repair, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
-                    except Exception as e:
-                        logger.debug(f"[{self.power_name}] json-repair failed: {e}")
-        
-        # New Strategy: Parse markdown-like key-value pairs
+
+        # Single pass over the text: marker-prefixed, fenced, bare, then truncated objects
+        for result in iter_json_objects(text):
+            logger.debug(f"[{self.power_name}] Successfully parsed JSON object")
+            return result
+
+        # Parse markdown-like key-value pairs when the response has no JSON object at all
         # Example: **key:** value
-        # This comes after trying to find fenced JSON blocks but before broad fallbacks.
-        if not matches: # Only try if previous patterns didn't yield a dict from a match
+        if "{" not in text:
             try:
                 markdown_data = {}
                 # Regex to find **key:** value, where value can be multi-line until next **key:** or end of string
-                md_pattern = r"\*\*(?P<key>[^:]+):\*\*\s*(?P<value>[\s\S]*?)(?=(?:\n\s*\*\*|$))"
-                for match in re.finditer(md_pattern, text, re.DOTALL):
+                for match in _MARKDOWN_KV_RE.finditer(text):
                     key_name = match.group('key').strip()
                     value_str = match.group('value').strip()
                     try:
                         # Attempt to evaluate the value string as a Python literal
                         # This handles lists, strings, numbers, booleans, None
-                        actual_value = ast.literal_eval(value_str)
-                        markdown_data[key_name] = actual_value
+                        markdown_data[key_name] = ast.literal_eval(value_str)
                     except (ValueError, SyntaxError) as e_ast:
-                        # If ast.literal_eval fails, it might be a plain string that doesn't look like a literal
-                        # Or it could be genuinely malformed. We'll take it as a string if it's not empty.
-                        if value_str: # Only add if it's a non-empty string
-                            markdown_data[key_name] = value_str # Store as string
+                        # Not a literal: keep it as a plain string if it's not empty
+                        if value_str:
+                            markdown_data[key_name] = value_str
                         logger.debug(f"[{self.power_name}] ast.literal_eval failed for key '{key_name}', value '{value_str[:50]}...': {e_ast}. Storing as string if non-empty.")
-                
-                if markdown_data: # If we successfully extracted any key-value pairs this way
-                    # Check if essential keys are present, if needed, or just return if any data found
-                    # For now, if markdown_data is populated, we assume it's the intended structure.
+
+                if markdown_data:
                     logger.debug(f"[{self.power_name}] Successfully parsed markdown-like key-value format. Data: {str(markdown_data)[:200]}")
                     return markdown_data
-                else:
-                    logger.debug(f"[{self.power_name}] No markdown-like key-value pairs found or parsed using markdown strategy.")
+                logger.debug(f"[{self.power_name}] No markdown-like key-value pairs found or parsed using markdown strategy.")
             except Exception as e_md_parse:
                 logger.error(f"[{self.power_name}] Error during markdown-like key-value parsing: {e_md_parse}", exc_info=True)
 
-        # Fallback: Try to find ANY JSON-like structure
-        try:
-            # Find the first { and last }
-            start = text.find('{')
-            end = text.rfind('}') + 1  # Include the closing brace
-            if start != -1 and end > start:
-                potential_json = text[start:end]
-                
-                # Try all parsers on this extracted text
-                for parser_name, parser_func in [
-                    ("json", json.loads),
-                    ("json5", json5.loads),
-                    ("json_repair", json_repair.loads)
-                ]:
-                    try:
-                        cleaned = self._clean_json_text(potential_json) if parser_name == "json" else potential_json
-                        result = parser_func(cleaned)
-                        if isinstance(result, dict):
-                            logger.debug(f"[{self.power_name}] Fallback parse succeeded with {parser_name}, got dict.")
-                            return result
-                        else:
-                            logger.warning(f"[{self.power_name}] Fallback parse with {parser_name} succeeded, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
-                    except Exception as e:
-                        logger.debug(f"[{self.power_name}] Fallback {parser_name} failed: {e}")
-                
-                # If standard parsers failed, try aggressive cleaning
-                try:
-                    # Remove common non-JSON text that LLMs might add
-                    cleaned_text = re.sub(r'[^{}[\]"\',:.\d\w\s_-]', '', potential_json)
-                    # Replace single quotes with double quotes (common LLM error)
-                    text_fixed = re.sub(r"'([^']*)':", r'"\1":', cleaned_text)
-                    text_fixed = re.sub(r': *\'([^\']*)\'', r': "\1"', text_fixed)
-                    
-                    result = json.loads(text_fixed)
-                    if isinstance(result, dict):
-                        logger.debug(f"[{self.power_name}] Aggressive cleaning worked, got dict.")
-                        return result
-                    else:
-                        logger.warning(f"[{self.power_name}] Aggressive cleaning worked, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
-                except json.JSONDecodeError:
-                    pass
-                    
-        except Exception as e:
-            logger.debug(f"[{self.power_name}] Fallback extraction failed: {e}")
-        
         # Last resort: Try json-repair on the entire text
         try:
             result = json_repair.loads(text)
             if isinstance(result, dict):
                 logger.warning(f"[{self.power_name}] Last resort json-repair succeeded, got dict.")
                 return result
-            else:
-                logger.warning(f"[{self.power_name}] Last resort json-repair succeeded, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
-                # If even the last resort doesn't give a dict, return empty dict
-                return {}
-        except Exception as e:
-            logger.error(f"[{self.power_name}] All JSON extraction attempts failed. Original text: {original_text[:500]}...")
+            logger.warning(f"[{self.power_name}] Last resort json-repair succeeded, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+            return {}
+        except Exception:
+            logger.error(f"[{self.power_name}] All JSON extraction attempts failed. Original text: {text[:500]}...")
             return {}
-    
-    def _clean_json_text(self, text: str) -> str:
-        """Clean common JSON formatting issues from LLM responses."""
-        if not text:
-            return text
-            
-        # Remove trailing commas
-        text = re.sub(r',\s*}', '}', text)
-        text = re.sub(r',\s*]', ']', text)
-        
-        # Fix newlines before JSON keys
-        text = re.sub(r'\n\s+"(\w+)"\s*:', r'"\1":', text)
-        
-        # Replace single quotes with double quotes for keys
-        text = re.sub(r"'(\w+)'\s*:", r'"\1":', text)
-        
-        # Remove comments (if any)
-        text = re.sub(r'//.*$', '', text, flags=re.MULTILINE)
-        text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
-        
-        # Fix unescaped quotes in values (basic attempt)
-        # This is risky but sometimes helps with simple cases
-        text = re.sub(r':\s*"([^"]*)"([^",}\]]+)"', r': "\1\2"', text)
-        
-        # Remove any BOM or zero-width spaces
-        text = text.replace('\ufeff', '').replace('\u200b', '')
-        
-        return text.strip()
-
 
     def add_journal_entry(self, entry: str):
         """Adds a formatted entry string to the agent's private journal."""
@@ -373,7 +176,7 @@ class DiplomacyAgent:
 
         consolidated_entry = ""
         # Find the single consolidated entry, which should be the first one if it exists.
-        if self.private_diary and self.private_diary[0].startswith("[CONSOLIDATED HISTORY]"):
+        if self.private_diary and self.private_diary[0].startswith(CONSOLIDATED_PREFIX):
             consolidated_entry = self.private_diary[0]
             # Get all other entries, which are the full, unconsolidated ones.
             recent_entries = self.private_diary[1:]
@@ -399,89 +202,58 @@ class DiplomacyAgent:
         logger.info(f"[{self.power_name}] Formatted diary with {1 if consolidated_entry else 0} consolidated and {len(recent_entries)} recent entries. Preview: {formatted_diary[:250]}...")
         return formatted_diary
     
-    async def consolidate_entire_diary(
+    def _split_context_diary(self) -> Tuple[str, List[str]]:
+        """(consolidated summary text or "", recent full entries) of the context diary."""
+        if self.private_diary and self.private_diary[0].startswith(CONSOLIDATED_PREFIX):
+            return self.private_diary[0][len(CONSOLIDATED_PREFIX):].strip(), self.private_diary[1:]
+        return "", list(self.private_diary)
+
+    def entries_to_consolidate(self, char_budget: int, min_recent_entries: int = 4) -> List[str]:
+        """
+        The oldest recent entries to fold into the consolidated summary, or [] if the
+        formatted diary fits in char_budget. The newest entries are kept verbatim up to
+        half the budget, and never fewer than min_recent_entries of them.
+        """
+        if char_budget <= 0 or len(self.format_private_diary_for_prompt()) <= char_budget:
+            return []
+        _, recent_entries = self._split_context_diary()
+        keep = 0
+        kept_chars = 0
+        for entry in reversed(recent_entries):
+            if keep >= min_recent_entries and kept_chars + len(entry) > char_budget // 2:
+                break
+            keep += 1
+            kept_chars += len(entry)
+        return recent_entries[:len(recent_entries) - keep]
+
+    async def consolidate_diary(
         self,
         game: "Game",
         log_file_path: str,
-        entries_to_keep_unsummarized: int = 15,
+        char_budget: int,
+        min_recent_entries: int = 4,
     ):
         """
-        Consolidate older diary entries while keeping all entries from the
-        `cutoff_year` onward in full.
-
-        The cutoff year is taken from the N-th most-recent *full* entry
-        (N = entries_to_keep_unsummarized).  Every earlier full entry is
-        summarised; every entry from cutoff_year or later is left verbatim.
-
-        Existing “[CONSOLIDATED HISTORY] …” lines are ignored during both
-        selection and summarisation, so summaries are never nested.
+        Rolling diary consolidation. When the formatted diary exceeds char_budget, the
+        oldest recent entries are folded into the existing "[CONSOLIDATED HISTORY]"
+        summary with one LLM call; the newest entries stay verbatim. The summary is
+        asked to stay under half the budget, so each call sees at most one summary plus
+        the entries that crossed the cutoff since the last consolidation, and its cost
+        does not grow with game length. self.full_private_diary is never modified.
         """
-        logger.info(
-            f"[{self.power_name}] CONSOLIDATION START — "
-            f"{len(self.full_private_diary)} total full entries"
-        )
-
-        # ----- 1. Collect only the full (non-summary) entries -----
-        full_entries = [
-            e for e in self.full_private_diary
-            if not e.startswith("[CONSOLIDATED HISTORY]")
-        ]
-
-        if len(full_entries) <= entries_to_keep_unsummarized:
-            self.private_diary = list(self.full_private_diary)
-            logger.info(
-                f"[{self.power_name}] ≤ {entries_to_keep_unsummarized} full entries — "
-                "skipping consolidation"
-            )
+        entries_to_fold = self.entries_to_consolidate(char_budget, min_recent_entries)
+        if not entries_to_fold:
+            logger.debug(f"[{self.power_name}] Diary within {char_budget} chars — no consolidation needed")
             return
 
-        # ----- 2. Determine cutoff_year from the N-th most-recent full entry -----
-        boundary_entry = full_entries[-entries_to_keep_unsummarized]
-        match = re.search(r"\[[SFWRAB]\s*(\d{4})", boundary_entry)
-        if not match:
-            logger.error(
-                f"[{self.power_name}] Could not parse year from boundary entry; "
-                "aborting consolidation"
-            )
-            self.private_diary = list(self.full_private_diary)
-            return
-
-        cutoff_year = int(match.group(1))
-        logger.info(
-            f"[{self.power_name}] Cut-off year for consolidation: {cutoff_year}"
-        )
-
-        # Helper to extract the year (returns None if not found)
-        def _entry_year(entry: str) -> int | None:
-            m = re.search(r"\[[SFWRAB]\s*(\d{4})", entry)
-            return int(m.group(1)) if m else None
-
-        # ----- 3. Partition full entries by year -----
-        entries_to_summarize = [
-            e for e in full_entries
-            if (_entry_year(e) is not None and _entry_year(e) < cutoff_year)
-        ]
-        entries_to_keep = [
-            e for e in full_entries
-            if (_entry_year(e) is None or _entry_year(e) >= cutoff_year)
-        ]
-
+        existing_summary, recent_entries = self._split_context_diary()
+        entries_to_keep = recent_entries[len(entries_to_fold):]
         logger.info(
-            f"[{self.power_name}] Summarising {len(entries_to_summarize)} entries; "
+            f"[{self.power_name}] CONSOLIDATION — folding {len(entries_to_fold)} entries into the summary; "
             f"keeping {len(entries_to_keep)} recent entries verbatim"
         )
 
-        if not entries_to_summarize:
-            # Safety fallback — should not occur but preserves context
-            self.private_diary = list(self.full_private_diary)
-            logger.warning(
-                f"[{self.power_name}] No eligible entries to summarise; "
-                "context diary left unchanged"
-            )
-            return
-
-        # ----- 4. Build the prompt -----
-        prompt_template = _load_prompt_file("diary_consolidation_prompt.txt")
+        prompt_template = get_prompt_template("diary_consolidation_prompt.txt")
         if not prompt_template:
             logger.error(
                 f"[{self.power_name}] diary_consolidation_prompt.txt missing — aborting"
@@ -490,18 +262,17 @@ class DiplomacyAgent:
 
         prompt = prompt_template.format(
             power_name=self.power_name,
-            full_diary_text="\n\n".join(entries_to_summarize),
+            existing_summary=existing_summary or "(No consolidated summary yet)",
+            full_diary_text="\n\n".join(entries_to_fold),
+            max_summary_chars=max(500, char_budget // 2),
         )
 
-        # ----- 5. Call the LLM -----
         raw_response = ""
         success_flag = "FALSE"
-        consolidation_client = None
+        context_length = len(self.private_diary)
         try:
-            consolidation_client = self.client
-
             raw_response = await run_llm_and_log(
-                client=consolidation_client,
+                client=self.client,
                 prompt=prompt,
                 log_file_path=log_file_path,
                 power_name=self.power_name,
@@ -513,14 +284,13 @@ class DiplomacyAgent:
             if not consolidated_text:
                 raise ValueError("LLM returned empty summary")
 
-            new_summary_entry = f"[CONSOLIDATED HISTORY] {consolidated_text}"
-
-            # ----- 6. Rebuild the context diary -----
-            self.private_diary = [new_summary_entry] + entries_to_keep
+            # Entries added while the call was in flight stay in the recent section
+            added_meanwhile = self.private_diary[context_length:]
+            self.private_diary = [f"{CONSOLIDATED_PREFIX} {consolidated_text}"] + entries_to_keep + added_meanwhile
             success_flag = "TRUE"
             logger.info(
                 f"[{self.power_name}] Consolidation complete — "
-                f"{len(self.private_diary)} context entries now"
+                f"{len(self.private_diary)} context entries, {len(self.format_private_diary_for_prompt())} chars"
             )
 
         except Exception as exc:
@@ -531,11 +301,7 @@ class DiplomacyAgent:
             # Always log the exchange
             log_llm_response(
                 log_file_path=log_file_path,
-                model_name=(
-                    consolidation_client.model_name
-                    if consolidation_client is not None
-                    else self.client.model_name
-                ),
+                model_name=self.client.model_name,
                 power_name=self.power_name,
                 phase=game.current_short_phase,
                 response_type="diary_consolidation",
@@ -544,8 +310,6 @@ class DiplomacyAgent:
                 success=success_flag,
             )
 
-
-
     async def generate_negotiation_diary_entry(self, game: 'Game', game_history: GameHistory, log_file_path: str):
         """
         Generates a diary entry summarizing negotiations and updates relationships.
@@ -558,15 +322,15 @@ class DiplomacyAgent:
         success_status = "Failure: Initialized" # Default
 
         try:
-            # Load the template file but safely preprocess it first
-            prompt_template_content = _load_prompt_file('negotiation_diary_prompt.txt')
+            # Registry template: placeholders were validated when the prompts were loaded
+            prompt_template_content = get_prompt_template('negotiation_diary_prompt.txt')
             if not prompt_template_content:
                 logger.error(f"[{self.power_name}] Could not load negotiation_diary_prompt.txt. Skipping diary entry.")
                 success_status = "Failure: Prompt file not loaded"
                 return # Exit early if prompt can't be loaded
 
             # Prepare context for the prompt
-            board_state_dict = game.get_state()
+            board_state_dict = get_phase_context(game).board_state
             board_state_str = f"Units: {board_state_dict.get('units', {})}, Centers: {board_state_dict.get('centers', {})}"
             
             messages_this_round = game_history.get_messages_this_round(
@@ -592,31 +356,6 @@ class DiplomacyAgent:
             else:
                 ignored_context = "\n\nAll powers have been responsive to your messages."
             
-            # Do aggressive preprocessing of the template to fix the problematic patterns
-            # This includes removing any newlines or whitespace before JSON keys that cause issues
-            for pattern in ['negotiation_summary', 'updated_relationships', 'relationship_updates', 'intent']:
-                # Fix the "\n  "key"" pattern that breaks .format()
-                prompt_template_content = re.sub(
-                    fr'\n\s*"{pattern}"', 
-                    f'"{pattern}"', 
-                    prompt_template_content
-                )
-            
-            # Escape all curly braces in JSON examples to prevent format() from interpreting them
-            # First, temporarily replace the actual template variables
-            temp_vars = ['power_name', 'current_phase', 'messages_this_round', 'agent_goals', 
-                        'agent_relationships', 'board_state_str', 'ignored_messages_context']
-            for var in temp_vars:
-                prompt_template_content = prompt_template_content.replace(f'{{{var}}}', f'<<{var}>>')
-            
-            # Now escape all remaining braces (which should be JSON)
-            prompt_template_content = prompt_template_content.replace('{', '{{')
-            prompt_template_content = prompt_template_content.replace('}', '}}')
-            
-            # Restore the template variables
-            for var in temp_vars:
-                prompt_template_content = prompt_template_content.replace(f'<<{var}>>', f'{{{var}}}')
-            
             # Create a dictionary with safe values for formatting
             format_vars = {
                 "power_name": self.power_name,
@@ -630,12 +369,11 @@ class DiplomacyAgent:
                 "ignored_messages_context": ignored_context
             }
             
-            # Now try to use the template after preprocessing
+            # Only the declared placeholders are substituted; the JSON examples keep their braces
             try:
-                # Apply format with our set of variables
                 full_prompt = prompt_template_content.format(**format_vars)
-                logger.info(f"[{self.power_name}] Successfully formatted prompt template after preprocessing.")
-                success_status = "Using prompt file with preprocessing"                
+                logger.info(f"[{self.power_name}] Successfully formatted negotiation diary prompt template.")
+                success_status = "Using prompt file"                
             except KeyError as e:
                 logger.error(f"[{self.power_name}] Error formatting negotiation diary prompt template: {e}. Skipping diary entry.")
                 success_status = "Failure: Template formatting error"
@@ -747,19 +485,30 @@ class DiplomacyAgent:
                     success=success_status
                 )
 
-    async def generate_order_diary_entry(self, game: 'Game', orders: List[str], log_file_path: str):
+    async def generate_order_diary_entry(
+        self,
+        game: 'Game',
+        orders: List[str],
+        log_file_path: str,
+        board_state: Optional[Dict] = None,
+        phase: Optional[str] = None,
+    ):
         """
         Generates a diary entry reflecting on the decided orders.
+
+        `board_state` and `phase` default to the game's current state. lm_game passes
+        the pre-processing snapshot so this can run while game.process() advances the game.
         """
-        logger.info(f"[{self.power_name}] Generating order diary entry for {game.current_short_phase}...")
+        current_phase = phase or game.current_short_phase
+        logger.info(f"[{self.power_name}] Generating order diary entry for {current_phase}...")
         
-        # Load the template but we'll use it carefully with string interpolation
-        prompt_template = _load_prompt_file('order_diary_prompt.txt')
+        # Registry template: JSON example braces are kept, only the placeholders are filled in
+        prompt_template = get_prompt_template('order_diary_prompt.txt')
         if not prompt_template:
             logger.error(f"[{self.power_name}] Could not load order_diary_prompt.txt. Skipping diary entry.")
             return
 
-        board_state_dict = game.get_state()
+        board_state_dict = board_state if board_state is not None else get_phase_context(game).board_state
         board_state_str = f"Units: {board_state_dict.get('units', {})}, Centers: {board_state_dict.get('centers', {})}"
         
         orders_list_str = "\n".join([f"- {o}" for o in orders]) if orders else "No orders submitted."
@@ -767,30 +516,10 @@ class DiplomacyAgent:
         goals_str = "\n".join([f"- {g}" for g in self.goals]) if self.goals else "None"
         relationships_str = "\n".join([f"- {p}: {s}" for p, s in self.relationships.items()]) if self.relationships else "None"
 
-        # Do aggressive preprocessing on the template file
-        # Fix any whitespace or formatting issues that could break .format()
-        for pattern in ['order_summary']:
-            prompt_template = re.sub(fr'\n\s*"{pattern}"', f'"{pattern}"', prompt_template)
-        
-        # Escape all curly braces in JSON examples to prevent format() from interpreting them
-        # First, temporarily replace the actual template variables
-        temp_vars = ['power_name', 'current_phase', 'orders_list_str', 'board_state_str', 
-                    'agent_goals', 'agent_relationships']
-        for var in temp_vars:
-            prompt_template = prompt_template.replace(f'{{{var}}}', f'<<{var}>>')
-        
-        # Now escape all remaining braces (which should be JSON)
-        prompt_template = prompt_template.replace('{', '{{')
-        prompt_template = prompt_template.replace('}', '}}')
-        
-        # Restore the template variables
-        for var in temp_vars:
-            prompt_template = prompt_template.replace(f'<<{var}>>', f'{{{var}}}')
-        
         # Create a dictionary of variables for template formatting
         format_vars = {
             "power_name": self.power_name,
-            "current_phase": game.current_short_phase,
+            "current_phase": current_phase,
             "orders_list_str": orders_list_str,
             "board_state_str": board_state_str,
             "agent_goals": goals_str,
@@ -817,7 +546,7 @@ class DiplomacyAgent:
                 prompt=prompt, 
                 log_file_path=log_file_path,
                 power_name=self.power_name,
-                phase=game.current_short_phase,
+                phase=current_phase,
                 response_type='order_diary',
             )
 
@@ -850,7 +579,7 @@ class DiplomacyAgent:
                 log_file_path=log_file_path,
                 model_name=self.client.model_name,
                 power_name=self.power_name,
-                phase=game.current_short_phase,
+                phase=current_phase,
                 response_type='order_diary',
                 raw_input_prompt=prompt, # ENSURED
                 raw_response=raw_response if raw_response else "",
@@ -858,11 +587,11 @@ class DiplomacyAgent:
             )
 
             if success_status == "TRUE" and actual_diary_text:
-                self.add_diary_entry(actual_diary_text, game.current_short_phase)
+                self.add_diary_entry(actual_diary_text, current_phase)
                 logger.info(f"[{self.power_name}] Order diary entry generated and added.")
             else:
-                fallback_diary = f"Submitted orders for {game.current_short_phase}: {', '.join(orders)}. (LLM failed to generate a specific diary entry)"
-                self.add_diary_entry(fallback_diary, game.current_short_phase)
+                fallback_diary = f"Submitted orders for {current_phase}: {', '.join(orders)}. (LLM failed to generate a specific diary entry)"
+                self.add_diary_entry(fallback_diary, current_phase)
                 logger.warning(f"[{self.power_name}] Failed to generate specific order diary entry. Added fallback.")
 
         except Exception as e:
@@ -873,14 +602,14 @@ class DiplomacyAgent:
                 log_file_path=log_file_path,
                 model_name=self.client.model_name if hasattr(self, 'client') else "UnknownModel",
                 power_name=self.power_name,
-                phase=game.current_short_phase if 'game' in locals() and hasattr(game, 'current_short_phase') else "order_phase",
+                phase=current_phase,
                 response_type='order_diary_exception',
                 raw_input_prompt=current_prompt, # ENSURED (using current_prompt for safety)
                 raw_response=current_raw_response,
                 success="FALSE"
             )
-            fallback_diary = f"Submitted orders for {game.current_short_phase}: {', '.join(orders)}. (Critical error in diary generation process)"
-            self.add_diary_entry(fallback_diary, game.current_short_phase)
+            fallback_diary = f"Submitted orders for {current_phase}: {', '.join(orders)}. (Critical error in diary generation process)"
+            self.add_diary_entry(fallback_diary, current_phase)
             logger.warning(f"[{self.power_name}] Added fallback order diary entry due to critical error.")
         # Rest of the code remains the same
 
@@ -890,16 +619,20 @@ class DiplomacyAgent:
         game_history: 'GameHistory',
         phase_summary: str,
         all_orders: Dict[str, List[str]],
-        log_file_path: str
+        log_file_path: str,
+        phase_name: Optional[str] = None,
     ):
         """
         Generates a diary entry analyzing the actual phase results,
         comparing them to negotiations and identifying betrayals/collaborations.
+        phase_name is the phase that was just processed; it defaults to game.current_short_phase,
+        which after processing is already the next phase.
         """
-        logger.info(f"[{self.power_name}] Generating phase result diary entry for {game.current_short_phase}...")
+        phase_name = phase_name or game.current_short_phase
+        logger.info(f"[{self.power_name}] Generating phase result diary entry for {phase_name}...")
         
         # Load the template
-        prompt_template = _load_prompt_file('phase_result_diary_prompt.txt')
+        prompt_template = get_prompt_template('phase_result_diary_prompt.txt')
         if not prompt_template:
             logger.error(f"[{self.power_name}] Could not load phase_result_diary_prompt.txt. Skipping diary entry.")
             return
@@ -915,7 +648,7 @@ class DiplomacyAgent:
         your_orders_str = ", ".join(your_orders) if your_orders else "No orders"
         
         # Get recent negotiations for this phase
-        messages_this_phase = game_history.get_messages_by_phase(game.current_short_phase)
+        messages_this_phase = game_history.get_messages_by_phase(phase_name)
         your_negotiations = ""
         for msg in messages_this_phase:
             if msg.sender == self.power_name:
@@ -935,7 +668,7 @@ class DiplomacyAgent:
         # Create the prompt
         prompt = prompt_template.format(
             power_name=self.power_name,
-            current_phase=game.current_short_phase,
+            current_phase=phase_name,
             phase_summary=phase_summary,
             all_orders_formatted=all_orders_formatted,
             your_negotiations=your_negotiations,
@@ -955,33 +688,33 @@ class DiplomacyAgent:
                 prompt=prompt,
                 log_file_path=log_file_path,
                 power_name=self.power_name,
-                phase=game.current_short_phase,
+                phase=phase_name,
                 response_type='phase_result_diary',
             )
             
             if raw_response and raw_response.strip():
                 # The response should be plain text diary entry
                 diary_entry = raw_response.strip()
-                self.add_diary_entry(diary_entry, game.current_short_phase)
+                self.add_diary_entry(diary_entry, phase_name)
                 success_status = "TRUE"
                 logger.info(f"[{self.power_name}] Phase result diary entry generated and added.")
             else:
-                fallback_diary = f"Phase {game.current_short_phase} completed. Orders executed as: {your_orders_str}. (Failed to generate detailed analysis)"
-                self.add_diary_entry(fallback_diary, game.current_short_phase)
+                fallback_diary = f"Phase {phase_name} completed. Orders executed as: {your_orders_str}. (Failed to generate detailed analysis)"
+                self.add_diary_entry(fallback_diary, phase_name)
                 logger.warning(f"[{self.power_name}] Empty response from LLM. Added fallback phase result diary.")
                 success_status = "FALSE"
                 
         except Exception as e:
             logger.error(f"[{self.power_name}] Error generating phase result diary: {e}", exc_info=True)
-            fallback_diary = f"Phase {game.current_short_phase} completed. Unable to analyze results due to error."
-            self.add_diary_entry(fallback_diary, game.current_short_phase)
+            fallback_diary = f"Phase {phase_name} completed. Unable to analyze results due to error."
+            self.add_diary_entry(fallback_diary, phase_name)
             success_status = f"FALSE: {type(e).__name__}"
         finally:
             log_llm_response(
                 log_file_path=log_file_path,
                 model_name=self.client.model_name,
                 power_name=self.power_name,
-                phase=game.current_short_phase,
+                phase=phase_name,
                 response_type='phase_result_diary',
                 raw_input_prompt=prompt,
                 raw_response=raw_response,
@@ -1002,7 +735,7 @@ class DiplomacyAgent:
 
         try:
             # 1. Construct the prompt using the dedicated state update prompt file
-            prompt_template = _load_prompt_file('state_update_prompt.txt')
+            prompt_template = get_prompt_template('state_update_prompt.txt')
             if not prompt_template:
                  logger.error(f"[{power_name}] Could not load state_update_prompt.txt. Skipping state update.")
                  return
@@ -1021,23 +754,6 @@ class DiplomacyAgent:
                 logger.warning(f"[{power_name}] No summary available for previous phase {last_phase_name}. Skipping state update.")
                 return
  
-            # == Fix: Use board_state parameter ==
-            possible_orders = game.get_all_possible_orders()
-            
-            # Get formatted diary for context
-            formatted_diary = self.format_private_diary_for_prompt()
-
-            context = build_context_prompt(
-                game=game,
-                board_state=board_state, # Use provided board_state parameter
-                power_name=power_name,
-                possible_orders=possible_orders, # Pass possible_orders
-                game_history=game_history, # Pass game_history
-                agent_goals=self.goals,
-                agent_relationships=self.relationships,
-                agent_private_diary=formatted_diary, # Pass formatted diary
-            )
-
             # Add previous phase summary to the information provided to the LLM
             other_powers = [p for p in game.powers if p != power_name]
             
@@ -0,0 +1,258 @@
+"""
+Phase-level checkpoints for lm_game.py, and resuming from them (--resume).
+
+After agent initialization and after every completed phase, CheckpointWriter
+appends one record to <results>/checkpoint.jsonl. It holds everything the
+phase loop needs to carry on without repeating an LLM call:
+
+  * the engine phase that was just processed and the new current phase, in
+    the to_saved_game_format phase layout;
+  * the GameHistory phases touched since the previous record;
+  * each agent's goals and relationships, plus the entries added to its
+    private_diary, full_private_diary and private_journal (private_diary is
+    stored in full after a consolidation rewrote it);
+  * model_error_stats, new or changed phase summaries, and the phase's entries
+    in the relationship histories.
+
+Records are deltas, so the cost per phase does not grow with game length. Each
+record is one line, flushed and fsynced before the phase loop moves on. A line
+cut short by a crash fails to parse; load_checkpoint() stops at the last
+complete record, and the resumed writer truncates the partial line before
+appending.
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from diplomacy.utils.export import RULES_TO_SKIP, from_saved_game_format
+
+from .game_history import GameHistory, Phase
+from .game_output import phase_to_dict
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+CHECKPOINT_VERSION = 1
+
+
+@dataclass
+class ResumeState:
+    """Everything restored from a checkpoint file."""
+    game: Any
+    game_history: GameHistory
+    power_model_map: Dict[str, str]
+    agent_states: Dict[str, Dict[str, Any]]
+    model_error_stats: Dict[str, Dict[str, int]]
+    all_phase_relationships: Dict[str, Dict[str, Any]]
+    all_phase_relationships_history: Dict[str, Dict[str, Any]]
+    completed_phases: List[str] = field(default_factory=list)
+    records: int = 0
+    valid_bytes: int = 0  # Length of the checkpoint file up to the last complete record
+
+    @property
+    def last_completed_phase(self) -> Optional[str]:
+        return self.completed_phases[-1] if self.completed_phases else None
+
+
+def apply_agent_state(agent: Any, state: Dict[str, Any]) -> None:
+    """Restores a DiplomacyAgent's goals, relationships, journal and diaries."""
+    agent.goals = list(state.get("goals", []))
+    agent.relationships = dict(state.get("relationships", {}))
+    agent.private_journal = list(state.get("private_journal", []))
+    agent.full_private_diary = list(state.get("full_private_diary", []))
+    agent.private_diary = list(state.get("private_diary", []))
+
+
+class CheckpointWriter:
+    """Appends one delta record per completed phase to a checkpoint file."""
+
+    def __init__(self, path: str, game: Any, resume_state: Optional[ResumeState] = None):
+        self.path = path
+        self.records_written = 0
+        # What the previous record already holds, so each record only carries what changed since
+        self._history_count = 0
+        self._diary_counts: Dict[str, int] = {}
+        self._journal_counts: Dict[str, int] = {}
+        self._context_diaries: Dict[str, List[str]] = {}
+        self._summaries: Dict[str, str] = {}
+        if resume_state is not None:
+            with open(path, "r+b") as f:
+                f.truncate(resume_state.valid_bytes)  # Drop a partial last line left by the crash
+            self._file = open(path, "a", encoding="utf-8")
+            self.records_written = resume_state.records
+            self._history_count = len(resume_state.game_history.phases)
+            for power_name, state in resume_state.agent_states.items():
+                self._diary_counts[power_name] = len(state.get("full_private_diary", []))
+                self._journal_counts[power_name] = len(state.get("private_journal", []))
+                self._context_diaries[power_name] = list(state.get("private_diary", []))
+            self._summaries = dict(getattr(resume_state.game, "phase_summaries", {}))
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+            self._write({
+                "type": "header",
+                "version": CHECKPOINT_VERSION,
+                "id": game.game_id,
+                "map": game.map_name,
+                "rules": [rule for rule in game.rules if rule not in RULES_TO_SKIP],
+                "power_model_map": dict(game.power_model_map),
+            })
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _agent_delta(self, power_name: str, agent: Any) -> Dict[str, Any]:
+        delta: Dict[str, Any] = {"goals": list(agent.goals), "relationships": dict(agent.relationships)}
+
+        diary_count = self._diary_counts.get(power_name, 0)
+        delta["full_private_diary_tail"] = agent.full_private_diary[diary_count:]
+        self._diary_counts[power_name] = len(agent.full_private_diary)
+
+        journal_count = self._journal_counts.get(power_name, 0)
+        delta["private_journal_tail"] = agent.private_journal[journal_count:]
+        self._journal_counts[power_name] = len(agent.private_journal)
+
+        previous = self._context_diaries.get(power_name, [])
+        current = agent.private_diary
+        if len(current) >= len(previous) and current[:len(previous)] == previous:
+            delta["private_diary_tail"] = current[len(previous):]
+        else:
+            delta["private_diary"] = list(current)  # Rewritten by consolidation
+        self._context_diaries[power_name] = list(current)
+        return delta
+
+    def write(
+        self,
+        game: Any,
+        game_history: GameHistory,
+        agents: Dict[str, Any],
+        model_error_stats: Dict[str, Dict[str, int]],
+        all_phase_relationships: Dict[str, Dict[str, Any]],
+        all_phase_relationships_history: Dict[str, Dict[str, Any]],
+        completed_phase: Optional[str] = None,
+    ) -> None:
+        """Records the state after `completed_phase` was processed (None for the record after initialization)."""
+        rules = [rule for rule in game.rules if rule not in RULES_TO_SKIP]
+        # The last phase of the previous record may have gained orders or messages since
+        history_start = max(self._history_count - 1, 0)
+        summaries = {
+            name: text for name, text in game.phase_summaries.items() if self._summaries.get(name) != text
+        }
+        record = {
+            "type": "phase",
+            "completed_phase": completed_phase,
+            "engine_phase": phase_to_dict(game, game.get_phase_from_history(completed_phase), rules) if completed_phase else None,
+            "current_phase": phase_to_dict(game, game.get_phase_data(), rules),
+            "phase_summaries": summaries,
+            "history_start": history_start,
+            "history_phases": [phase.to_dict() for phase in game_history.phases[history_start:]],
+            "agents": {power_name: self._agent_delta(power_name, agent) for power_name, agent in agents.items()},
+            "model_error_stats": {model: dict(stats) for model, stats in model_error_stats.items()},
+            "relationships": {
+                name: all_phase_relationships[name] for name in [completed_phase] if name in all_phase_relationships
+            },
+            "relationships_history": {
+                name: all_phase_relationships_history[name]
+                for name in [completed_phase]
+                if name in all_phase_relationships_history
+            },
+        }
+        self._write(record)
+        self._history_count = len(game_history.phases)
+        self._summaries.update(summaries)
+        self.records_written += 1
+        logger.debug(f"Checkpoint {self.records_written} written to {self.path} after {completed_phase or 'initialization'}")
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def load_checkpoint(path: str) -> ResumeState:
+    """Rebuilds the game, history, agent states and statistics from a checkpoint file."""
+    header: Optional[Dict[str, Any]] = None
+    engine_phases: List[Dict[str, Any]] = []
+    current_phase: Optional[Dict[str, Any]] = None
+    phase_summaries: Dict[str, str] = {}
+    history_phases: List[Phase] = []
+    agent_states: Dict[str, Dict[str, Any]] = {}
+    model_error_stats: Dict[str, Dict[str, int]] = {}
+    relationships: Dict[str, Dict[str, Any]] = {}
+    relationships_history: Dict[str, Dict[str, Any]] = {}
+    completed_phases: List[str] = []
+    records = 0
+    valid_bytes = 0
+
+    with open(path, "rb") as f:
+        for raw_line in f:
+            try:
+                if not raw_line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                record = json.loads(raw_line)
+            except ValueError:
+                logger.warning(f"{path}: ignoring incomplete record after {records} complete ones (interrupted write)")
+                break
+            valid_bytes += len(raw_line)
+            if record.get("type") == "header":
+                if record.get("version") != CHECKPOINT_VERSION:
+                    raise ValueError(f"{path}: unsupported checkpoint version {record.get('version')}")
+                header = record
+                continue
+            records += 1
+            if record.get("completed_phase"):
+                completed_phases.append(record["completed_phase"])
+                engine_phases.append(record["engine_phase"])
+            current_phase = record["current_phase"]
+            phase_summaries.update(record.get("phase_summaries", {}))
+            start = record.get("history_start", 0)
+            history_phases[start:] = [Phase.from_dict(p) for p in record.get("history_phases", [])]
+            for power_name, delta in record.get("agents", {}).items():
+                state = agent_states.setdefault(
+                    power_name, {"private_journal": [], "full_private_diary": [], "private_diary": []}
+                )
+                state["goals"] = delta.get("goals", [])
+                state["relationships"] = delta.get("relationships", {})
+                state["full_private_diary"].extend(delta.get("full_private_diary_tail", []))
+                state["private_journal"].extend(delta.get("private_journal_tail", []))
+                if "private_diary" in delta:
+                    state["private_diary"] = list(delta["private_diary"])
+                else:
+                    state["private_diary"].extend(delta.get("private_diary_tail", []))
+            model_error_stats = record.get("model_error_stats", model_error_stats)
+            relationships.update(record.get("relationships", {}))
+            relationships_history.update(record.get("relationships_history", {}))
+
+    if header is None or current_phase is None:
+        raise ValueError(f"{path}: no complete checkpoint to resume from")
+
+    game = from_saved_game_format({
+        "id": header["id"],
+        "map": header["map"],
+        "rules": header["rules"],
+        "phases": engine_phases + [current_phase],
+    })
+    game.phase_summaries = phase_summaries
+    game.power_model_map = dict(header["power_model_map"])
+
+    game_history = GameHistory()
+    game_history.phases = history_phases
+
+    logger.info(
+        f"Loaded checkpoint {path}: {records} records, resuming at {game.current_short_phase} "
+        f"after {completed_phases[-1] if completed_phases else 'initialization'}"
+    )
+    return ResumeState(
+        game=game,
+        game_history=game_history,
+        power_model_map=game.power_model_map,
+        agent_states=agent_states,
+        model_error_stats=model_error_stats,
+        all_phase_relationships=relationships,
+        all_phase_relationships_history=relationships_history,
+        completed_phases=completed_phases,
+        records=records,
+        valid_bytes=valid_bytes,
+    )
@@ -0,0 +1,134 @@
+"""
+Process-wide registry of pooled async HTTP transports for the model clients.
+
+load_model_client() builds one BaseModelClient per power, but several powers
+usually talk to the same provider. Instead of each client owning its own SDK
+client (and the Responses API client opening a new aiohttp session per call),
+clients ask this module for a shared SDK client / session keyed by
+(provider, base_url, api_key). That keeps keep-alive connections and TLS
+sessions warm across calls, powers and games in the same process.
+
+Connection limits and HTTP/2 are set with configure_client_pool() before the
+first client is created; aclose_all() closes everything and is called at the
+end of lm_game.main().
+"""
+import importlib.util
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient as AnthropicHttpxClient
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient as OpenAIHttpxClient
+from together import AsyncTogether
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 in httpx needs the optional 'h2' package
+_H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_pool_config = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "http2": True,
+}
+
+_clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+_aiohttp_sessions: Dict[Optional[str], aiohttp.ClientSession] = {}
+
+
+def configure_client_pool(
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    http2: bool = True,
+) -> None:
+    """Sets connection limits for transports created after this call."""
+    _pool_config.update(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+        http2=http2,
+    )
+    if http2 and not _H2_AVAILABLE:
+        logger.info("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1 connection pools.")
+
+
+def _httpx_kwargs() -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=_pool_config["max_connections"],
+            max_keepalive_connections=_pool_config["max_keepalive_connections"],
+            keepalive_expiry=_pool_config["keepalive_expiry"],
+        ),
+        "http2": bool(_pool_config["http2"] and _H2_AVAILABLE),
+    }
+
+
+def get_async_openai(api_key: Optional[str], base_url: Optional[str] = None) -> AsyncOpenAI:
+    """Shared AsyncOpenAI client for an OpenAI-compatible endpoint (OpenAI, DeepSeek, OpenRouter, ...)."""
+    key = ("openai", base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=OpenAIHttpxClient(**_httpx_kwargs()))
+        _clients[key] = client
+        logger.debug(f"Created pooled OpenAI-compatible client for {base_url or 'api.openai.com'}")
+    return client
+
+
+def get_async_anthropic(api_key: Optional[str], base_url: Optional[str] = None) -> AsyncAnthropic:
+    """Shared AsyncAnthropic client."""
+    key = ("anthropic", base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncAnthropic(api_key=api_key, base_url=base_url, http_client=AnthropicHttpxClient(**_httpx_kwargs()))
+        _clients[key] = client
+        logger.debug(f"Created pooled Anthropic client for {base_url or 'api.anthropic.com'}")
+    return client
+
+
+def get_async_together(api_key: Optional[str]) -> AsyncTogether:
+    """Shared AsyncTogether client (the SDK manages its own transport, so only the instance is shared)."""
+    key = ("together", None, api_key)
+    client = _clients.get(key)
+    if client is None:
+        client = AsyncTogether(api_key=api_key)
+        _clients[key] = client
+    return client
+
+
+def get_aiohttp_session(base_url: Optional[str] = None) -> aiohttp.ClientSession:
+    """
+    Shared aiohttp session for direct HTTP calls to `base_url` (e.g. the OpenAI
+    Responses API). Callers still pass absolute URLs. Must be called from inside
+    the running event loop.
+    """
+    session = _aiohttp_sessions.get(base_url)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=_pool_config["max_connections"],
+            keepalive_timeout=_pool_config["keepalive_expiry"],
+        )
+        session = aiohttp.ClientSession(connector=connector)
+        _aiohttp_sessions[base_url] = session
+    return session
+
+
+async def aclose_all() -> None:
+    """Closes every pooled client and session. Safe to call more than once."""
+    for key, client in list(_clients.items()):
+        close = getattr(client, "close", None)
+        if close is None:
+            continue
+        try:
+            result = close()
+            if hasattr(result, "__await__"):
+                await result
+        except Exception as e:
+            logger.warning(f"Error closing pooled {key[0]} client: {e}")
+    _clients.clear()
+    for session in list(_aiohttp_sessions.values()):
+        if not session.closed:
+            await session.close()
+    _aiohttp_sessions.clear()
@@ -3,26 +3,30 @@ import json
 from json import JSONDecodeError
 import re
 import logging
-import ast  # For literal_eval in JSON fallback parsing
 import aiohttp  # For direct HTTP requests to Responses API
+import asyncio
+import random
+from collections import defaultdict, deque
 
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, AsyncIterator
 from dotenv import load_dotenv
 
-# Use Async versions of clients
-from openai import AsyncOpenAI
-from openai import AsyncOpenAI as AsyncDeepSeekOpenAI # Alias for clarity
-from anthropic import AsyncAnthropic
+# Async SDK clients are shared per (provider, base_url, api key) through the client pool
+from .client_pool import get_async_openai, get_async_anthropic, get_async_together, get_aiohttp_session
 
 import google.generativeai as genai
-from together import AsyncTogether
 from together.error import APIError as TogetherAPIError # For specific error handling
 
 from diplomacy.engine.message import GLOBAL
 from .game_history import GameHistory
-from .utils import load_prompt, run_llm_and_log, log_llm_response, generate_random_seed
+from .utils import load_prompt, run_llm_and_log, log_llm_response, generate_random_seed, llm_call_context
+from .rate_limit import RateLimitError, is_transient_error
+from .telemetry import mark_first_byte, note_stream, record_usage
+from .json_extract import JsonStreamDetector, extract_orders
+from .llm_log import find_llm_log_files, iter_llm_log_rows
 # Import DiplomacyAgent for type hinting if needed, but avoid circular import if possible
-from .prompt_constructor import construct_order_generation_prompt, build_context_prompt
+from .prompt_constructor import construct_order_generation_prompt, build_context_prompt, order_prompt_prefix
+from .phase_context import PhaseContext
 
 # set logger back to just info
 logger = logging.getLogger("client")
@@ -32,6 +36,44 @@ logger.setLevel(logging.DEBUG) # Keep debug for now during async changes
 
 load_dotenv()
 
+# Response types whose reply is parsed from a single JSON object, and the keys that object carries.
+# With --stream_responses these streams are closed once that object is complete (see JsonStreamDetector).
+STREAM_STOP_KEYS = {
+    "order": ("orders",),
+    "negotiation_diary_raw": ("negotiation_summary", "summary", "diary_entry"),
+    "order_diary": ("order_summary",),
+    "state_update": ("updated_goals", "goals", "updated_relationships", "relationships"),
+    "initialization": ("initial_goals", "goals", "initial_relationships", "relationships"),
+}
+
+
+def configure_streaming(enabled: bool) -> None:
+    """Turns response streaming on or off for every client that supports it (lm_game.py --stream_responses)."""
+    BaseModelClient.stream_responses = enabled
+
+
+async def _close_stream(stream: Any) -> None:
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is not None:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+async def _openai_chat_chunks(client: Any, include_usage: bool = True, **request) -> AsyncIterator[str]:
+    """Text deltas of a streamed OpenAI-compatible chat completion; the HTTP stream is closed when this is."""
+    if include_usage:
+        request["stream_options"] = {"include_usage": True}
+    stream = await client.chat.completions.create(stream=True, **request)
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                record_usage(chunk)  # Sent in the last chunk, so missing if the stream is cut early
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await _close_stream(stream)
+
 ##############################################################################
 # 1) Base Interface
 ##############################################################################
@@ -44,11 +86,20 @@ class BaseModelClient:
       - get_conversation_reply(power_name, conversation_so_far, game_phase) -> str
     """
 
+    # Used by the shared rate limiter to group clients by provider
+    provider = "generic"
+    # Read responses as a stream where the provider supports it (see configure_streaming)
+    stream_responses = False
+    # Estimated input-token budget for context prompts (lm_game.py --prompt_token_budget); None = no limit
+    prompt_token_budget: Optional[int] = None
+
     def __init__(self, model_name: str):
         self.model_name = model_name
         # Load a default initially, can be overwritten by set_system_prompt
         self.system_prompt = load_prompt("system_prompt.txt") 
         self.max_tokens = 16000  # default unless overridden
+        # Optional ResponseCache (see response_cache.py); consulted by run_llm_and_log
+        self.response_cache = None
 
     def set_system_prompt(self, content: str):
         """Allows updating the system prompt after initialization."""
@@ -62,6 +113,52 @@ class BaseModelClient:
         """
         raise NotImplementedError("Subclasses must implement generate_response().")
 
+    def _request_texts(self, prompt: str, inject_random_seed: bool = True) -> Tuple[str, str]:
+        """
+        (system prompt, user message) of a request. The random seed block goes at
+        the end of the user message, so the system prompt and the static start of
+        the prompt are byte-identical between calls and can be served from the
+        provider's prompt cache.
+        """
+        user_message = prompt
+        if inject_random_seed:
+            user_message = f"{prompt}\n\n{generate_random_seed()}"
+        return self.system_prompt, user_message + "\n\nPROVIDE YOUR RESPONSE BELOW:"
+
+    @staticmethod
+    def _cache_prefix_chars() -> int:
+        """Length of the static start of the current prompt, as passed to run_llm_and_log (0 if unknown)."""
+        return (llm_call_context.get() or {}).get("cache_prefix_chars") or 0
+
+    async def _collect_stream(self, chunks: AsyncIterator[str], early_stop: bool = True) -> str:
+        """
+        Joins the text chunks of a streamed response. The first chunk marks the
+        time to first token. For response types in STREAM_STOP_KEYS the stream
+        is closed as soon as the parsable JSON block is complete, which saves
+        the wait for (and the output tokens of) whatever the model writes after it.
+        Clients whose SDK cannot close a stream part-way pass early_stop=False.
+        """
+        context = llm_call_context.get() or {}
+        stop_keys = STREAM_STOP_KEYS.get(context.get("response_type") or "") if early_stop else None
+        detector = JsonStreamDetector(stop_keys) if stop_keys else None
+        parts = []
+        early_stopped = False
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                mark_first_byte()
+                parts.append(chunk)
+                if detector is not None and detector.feed(chunk):
+                    early_stopped = True
+                    break
+        finally:
+            await _close_stream(chunks)
+        note_stream(early_stopped)
+        if early_stopped:
+            logger.debug(f"[{self.model_name}] Closed the response stream after the parsable JSON block")
+        return "".join(parts)
+
     # build_context_prompt and build_prompt (now construct_order_generation_prompt)
     # have been moved to prompt_constructor.py
 
@@ -78,6 +175,7 @@ class BaseModelClient:
         agent_goals: Optional[List[str]] = None,
         agent_relationships: Optional[Dict[str, str]] = None,
         agent_private_diary_str: Optional[str] = None, # Added
+        phase_context: Optional[PhaseContext] = None,
     ) -> List[str]:
         """
         1) Builds the prompt with conversation context if available
@@ -97,6 +195,8 @@ class BaseModelClient:
             agent_goals=agent_goals,
             agent_relationships=agent_relationships,
             agent_private_diary_str=agent_private_diary_str,
+            phase_context=phase_context,
+            token_budget=self.prompt_token_budget,
         )
 
         raw_response = ""
@@ -113,7 +213,8 @@ class BaseModelClient:
                 power_name=power_name,
                 phase=phase,
                 response_type='order', # Context for run_llm_and_log's own error logging
-                temperature=0
+                temperature=0,
+                cache_prefix_chars=len(order_prompt_prefix(self.system_prompt)),
             )
             logger.debug(
                 f"[{self.model_name}] Raw LLM response for {power_name} orders:\n{raw_response}"
@@ -180,176 +281,19 @@ class BaseModelClient:
 
     def _extract_moves(self, raw_response: str, power_name: str) -> Optional[List[str]]:
         """
-        Attempt multiple parse strategies to find JSON array of moves.
+        Find the JSON "orders" list in the response (see json_extract.py).
 
-        1. Regex for PARSABLE OUTPUT lines.
-        2. If that fails, also look for fenced code blocks with { ... }.
-        3. Attempt bracket-based fallback if needed.
+        Candidates after PARSABLE OUTPUT are tried first, then fenced code blocks,
+        then bare or truncated objects, and finally a bare "orders": [...] list.
 
         Returns a list of move strings or None if everything fails.
         """
-        # 1) Regex for "PARSABLE OUTPUT:{...}"
-        pattern = r"PARSABLE OUTPUT:\s*(\{[\s\S]*\})"
-        matches = re.search(pattern, raw_response, re.DOTALL)
-
-        if not matches:
-            # Some LLMs might not put the colon or might have triple backtick fences.
-            logger.debug(
-                f"[{self.model_name}] Regex parse #1 failed for {power_name}. Trying alternative patterns."
-            )
-
-            # 1b) Check for inline JSON after "PARSABLE OUTPUT"
-            pattern_alt = r"PARSABLE OUTPUT\s*\{(.*?)\}\s*$"
-            matches = re.search(pattern_alt, raw_response, re.DOTALL)
-            
-        if not matches:
-            # 1c) Check for **PARSABLE OUTPUT:** pattern (with asterisks)
+        moves = extract_orders(raw_response)
+        if moves is None:
             logger.debug(
-                f"[{self.model_name}] Regex parse #2 failed for {power_name}. Trying asterisk-wrapped pattern."
+                f"[{self.model_name}] No JSON orders found in LLM response for {power_name}."
             )
-            pattern_asterisk = r"\*\*PARSABLE OUTPUT:\*\*\s*(\{[\s\S]*?\})"
-            matches = re.search(pattern_asterisk, raw_response, re.DOTALL)
-
-        if not matches:
-            logger.debug(
-                f"[{self.model_name}] Regex parse #3 failed for {power_name}. Trying triple-backtick code fences."
-            )
-
-        # 2) If still no match, check for triple-backtick code fences containing JSON
-        if not matches:
-            code_fence_pattern = r"```json\n(.*?)\n```"
-            matches = re.search(code_fence_pattern, raw_response, re.DOTALL)
-            if matches:
-                logger.debug(
-                    f"[{self.model_name}] Found triple-backtick JSON block for {power_name}."
-                )
-        
-        # 2b) Also try plain ``` code fences without json marker
-        if not matches:
-            code_fence_plain = r"```\n(.*?)\n```"
-            matches = re.search(code_fence_plain, raw_response, re.DOTALL)
-            if matches:
-                logger.debug(
-                    f"[{self.model_name}] Found plain triple-backtick block for {power_name}."
-                )
-        
-        # 2c) Try to find bare JSON object anywhere in the response
-        if not matches:
-            logger.debug(
-                f"[{self.model_name}] No explicit markers found for {power_name}. Looking for bare JSON."
-            )
-            # Look for a JSON object that contains "orders" key
-            bare_json_pattern = r'(\{[^{}]*"orders"\s*:\s*\[[^\]]*\][^{}]*\})'
-            matches = re.search(bare_json_pattern, raw_response, re.DOTALL)
-            if matches:
-                logger.debug(
-                    f"[{self.model_name}] Found bare JSON object with 'orders' key for {power_name}."
-                )
-
-        # 3) Attempt to parse JSON if we found anything
-        json_text = None
-        if matches:
-            # Add braces back around the captured group if needed
-            captured = matches.group(1).strip()
-            if captured.startswith(r"{{"):
-                json_text = captured[1:-1]
-            elif captured.startswith(r"{"):
-                json_text = captured
-            else:
-                json_text = "{%s}" % captured
-
-            json_text = json_text.strip()
-
-        if not json_text:
-            logger.debug(
-                f"[{self.model_name}] No JSON text found in LLM response for {power_name}."
-            )
-            return None
-
-        # 3a) Try JSON loading
-        try:
-            data = json.loads(json_text)
-            return data.get("orders", None)
-        except json.JSONDecodeError as e:
-            logger.warning(
-                f"[{self.model_name}] JSON decode failed for {power_name}: {e}. Trying to fix common issues."
-            )
-            
-            # Try to fix common JSON issues
-            try:
-                # Remove trailing commas
-                fixed_json = re.sub(r',\s*([\}\]])', r'\1', json_text)
-                # Fix single quotes to double quotes
-                fixed_json = fixed_json.replace("'", '"')
-                # Try parsing again
-                data = json.loads(fixed_json)
-                logger.info(f"[{self.model_name}] Successfully parsed JSON after fixes for {power_name}")
-                return data.get("orders", None)
-            except json.JSONDecodeError:
-                logger.warning(
-                    f"[{self.model_name}] JSON decode still failed after fixes for {power_name}. Trying to remove inline comments."
-                )
-                
-                # Try to remove inline comments (// style)
-                try:
-                    # Remove // comments from each line
-                    lines = json_text.split('\n')
-                    cleaned_lines = []
-                    for line in lines:
-                        # Find // that's not inside quotes
-                        comment_pos = -1
-                        in_quotes = False
-                        escape_next = False
-                        for i, char in enumerate(line):
-                            if escape_next:
-                                escape_next = False
-                                continue
-                            if char == '\\':
-                                escape_next = True
-                                continue
-                            if char == '"' and not escape_next:
-                                in_quotes = not in_quotes
-                            if not in_quotes and line[i:i+2] == '//':
-                                comment_pos = i
-                                break
-                        
-                        if comment_pos >= 0:
-                            # Remove comment but keep any trailing comma
-                            cleaned_line = line[:comment_pos].rstrip()
-                        else:
-                            cleaned_line = line
-                        cleaned_lines.append(cleaned_line)
-                    
-                    comment_free_json = '\n'.join(cleaned_lines)
-                    # Also remove trailing commas after comment removal
-                    comment_free_json = re.sub(r',\s*([\}\]])', r'\1', comment_free_json)
-                    
-                    data = json.loads(comment_free_json)
-                    logger.info(f"[{self.model_name}] Successfully parsed JSON after removing inline comments for {power_name}")
-                    return data.get("orders", None)
-                except json.JSONDecodeError:
-                    logger.warning(
-                        f"[{self.model_name}] JSON decode still failed after removing comments for {power_name}. Trying bracket fallback."
-                    )
-
-        # 3b) Attempt bracket fallback: we look for the substring after "orders"
-        #     E.g. "orders: ['A BUD H']" and parse it. This is risky but can help with minor JSON format errors.
-        #     We only do this if we see something like "orders": ...
-        bracket_pattern = r'["\']orders["\']\s*:\s*\[([^\]]*)\]'
-        bracket_match = re.search(bracket_pattern, json_text, re.DOTALL)
-        if bracket_match:
-            try:
-                raw_list_str = "[" + bracket_match.group(1).strip() + "]"
-                moves = ast.literal_eval(raw_list_str)
-                if isinstance(moves, list):
-                    return moves
-            except Exception as e2:
-                logger.warning(
-                    f"[{self.model_name}] Bracket fallback parse also failed for {power_name}: {e2}"
-                )
-
-        # If all attempts failed
-        return None
+        return moves
     
     def _validate_orders(
         self, moves: List[str], possible_orders: Dict[str, List[str]]
@@ -425,7 +369,7 @@ class BaseModelClient:
         
         instructions = load_prompt("planning_instructions.txt")
 
-        context = self.build_context_prompt(
+        context = build_context_prompt(
             game,
             board_state,
             power_name,
@@ -434,6 +378,8 @@ class BaseModelClient:
             agent_goals=agent_goals,
             agent_relationships=agent_relationships,
             agent_private_diary=agent_private_diary_str, # Pass diary string
+            token_budget=self.prompt_token_budget,
+            reserved_text=self.system_prompt + instructions,
         )
 
         return context + "\n\n" + instructions
@@ -462,6 +408,8 @@ class BaseModelClient:
             agent_goals=agent_goals,
             agent_relationships=agent_relationships,
             agent_private_diary=agent_private_diary_str, # Pass diary string
+            token_budget=self.prompt_token_budget,
+            reserved_text=self.system_prompt + instructions,
         )
         
         # Get recent messages targeting this power to prioritize responses
@@ -709,7 +657,7 @@ class BaseModelClient:
         # For simplicity, let's pass empty if not strictly needed by context for planning.
         possible_orders_for_context = {} # game.get_all_possible_orders() if needed by context
         
-        context_prompt = self.build_context_prompt(
+        context_prompt = build_context_prompt(
             game,
             board_state,
             power_name,
@@ -718,6 +666,9 @@ class BaseModelClient:
             agent_goals=agent_goals,
             agent_relationships=agent_relationships,
             agent_private_diary=agent_private_diary_str, # Pass diary string
+            token_budget=self.prompt_token_budget,
+            # The system prompt is sent as the system message and repeated at the top of this prompt
+            reserved_text=self.system_prompt * 2 + planning_instructions,
         )
 
         full_prompt = f"{context_prompt}\n\n{planning_instructions}"
@@ -772,30 +723,35 @@ class OpenAIClient(BaseModelClient):
     For 'o3-mini', 'gpt-4o', or other OpenAI model calls.
     """
 
+    provider = "openai"
+
     def __init__(self, model_name: str):
         super().__init__(model_name)
-        self.client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        self.client = get_async_openai(api_key=os.environ.get("OPENAI_API_KEY"))
 
     async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
         # Updated to new API format
         try:
-            # Append the call to action to the user's prompt
-            prompt_with_cta = prompt + "\n\nPROVIDE YOUR RESPONSE BELOW:"
-
-            system_prompt_content = self.system_prompt
-            if inject_random_seed:
-                random_seed = generate_random_seed()
-                system_prompt_content = f"{random_seed}\n\n{self.system_prompt}"
+            # Seed and call to action go at the end of the user's prompt
+            system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
+
+            messages = [
+                {"role": "system", "content": system_prompt_content},
+                {"role": "user", "content": prompt_with_cta},
+            ]
+            if self.stream_responses:
+                return (await self._collect_stream(_openai_chat_chunks(
+                    self.client, model=self.model_name, messages=messages,
+                    temperature=temperature, max_tokens=self.max_tokens,
+                ))).strip()
 
             response = await self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt_content},
-                    {"role": "user", "content": prompt_with_cta},
-                ],
+                messages=messages,
                 temperature=temperature,
                 max_tokens=self.max_tokens,
             )
+            record_usage(response)
             if not response or not hasattr(response, "choices") or not response.choices:
                 logger.warning(
                     f"[{self.model_name}] Empty or invalid result in generate_response. Returning empty."
@@ -808,6 +764,8 @@ class OpenAIClient(BaseModelClient):
             )
             return ""
         except Exception as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             logger.error(
                 f"[{self.model_name}] Unexpected error in generate_response: {e}"
             )
@@ -819,25 +777,29 @@ class ClaudeClient(BaseModelClient):
     For 'claude-3-5-sonnet-20241022', 'claude-3-5-haiku-20241022', etc.
     """
 
+    provider = "anthropic"
+
     def __init__(self, model_name: str):
         super().__init__(model_name)
-        self.client = AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+        self.client = get_async_anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
 
     async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
         # Updated Claude messages format
         try:
-            system_prompt_content = self.system_prompt
-            if inject_random_seed:
-                random_seed = generate_random_seed()
-                system_prompt_content = f"{random_seed}\n\n{self.system_prompt}"
+            system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
 
-            response = await self.client.messages.create(
+            request = dict(
                 model=self.model_name,
                 max_tokens=self.max_tokens,
-                system=system_prompt_content,  # system is now a top-level parameter
-                messages=[{"role": "user", "content": prompt + "\n\nPROVIDE YOUR RESPONSE BELOW:"}],
+                system=self._cached_blocks(system_prompt_content),  # system is now a top-level parameter
+                messages=[{"role": "user", "content": self._cached_blocks(prompt_with_cta, self._cache_prefix_chars())}],
                 temperature=temperature,
             )
+            if self.stream_responses:
+                return (await self._collect_stream(self._stream_chunks(request))).strip()
+
+            response = await self.client.messages.create(**request)
+            record_usage(response)
             if not response.content:
                 logger.warning(
                     f"[{self.model_name}] Empty content in Claude generate_response. Returning empty."
@@ -850,17 +812,46 @@ class ClaudeClient(BaseModelClient):
             )
             return ""
         except Exception as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             logger.error(
                 f"[{self.model_name}] Unexpected error in generate_response: {e}"
             )
             return ""
 
+    @staticmethod
+    def _cached_blocks(text: str, cache_chars: Optional[int] = None) -> Any:
+        """
+        Content with an ephemeral cache_control breakpoint after its first
+        `cache_chars` characters (the whole text if None); plain text if there is
+        nothing to cache. Anthropic ignores breakpoints on prefixes shorter than
+        the model's minimum cacheable length.
+        """
+        cache_chars = len(text) if cache_chars is None else min(cache_chars, len(text))
+        if cache_chars <= 0:
+            return text
+        blocks = [{"type": "text", "text": text[:cache_chars], "cache_control": {"type": "ephemeral"}}]
+        if cache_chars < len(text):
+            blocks.append({"type": "text", "text": text[cache_chars:]})
+        return blocks
+
+    async def _stream_chunks(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        async with self.client.messages.stream(**request) as stream:
+            try:
+                async for text in stream.text_stream:
+                    yield text
+            finally:
+                # Input tokens and the output tokens so far, also when the stream is cut early
+                record_usage(stream.current_message_snapshot)
+
 
 class GeminiClient(BaseModelClient):
     """
     For 'gemini-1.5-flash' or other Google Generative AI models.
     """
 
+    provider = "gemini"
+
     def __init__(self, model_name: str):
         super().__init__(model_name)
         # Configure and get the model (corrected initialization)
@@ -872,22 +863,24 @@ class GeminiClient(BaseModelClient):
         logger.debug(f"[{self.model_name}] Initialized Gemini client (genai.GenerativeModel)")
 
     async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
-        system_prompt_content = self.system_prompt
-        if inject_random_seed:
-            random_seed = generate_random_seed()
-            system_prompt_content = f"{random_seed}\n\n{self.system_prompt}"
-
-        full_prompt = system_prompt_content + prompt + "\n\nPROVIDE YOUR RESPONSE BELOW:"
+        system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
+        full_prompt = system_prompt_content + prompt_with_cta
 
         try:
             generation_config = genai.types.GenerationConfig(
                 temperature=temperature,
                 max_output_tokens=self.max_tokens
             )
+            if self.stream_responses:
+                # No early stop: the SDK has no supported way to close a stream it has not finished reading
+                chunks = self._stream_chunks(full_prompt, generation_config)
+                return (await self._collect_stream(chunks, early_stop=False)).strip()
+
             response = await self.client.generate_content_async(
                 contents=full_prompt,
                 generation_config=generation_config,
             )
+            record_usage(response)
             
             if not response or not response.text:
                 logger.warning(
@@ -896,43 +889,66 @@ class GeminiClient(BaseModelClient):
                 return ""
             return response.text.strip()
         except Exception as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             logger.error(f"[{self.model_name}] Error in Gemini generate_response: {e}")
             return ""
 
+    async def _stream_chunks(self, full_prompt: str, generation_config: Any) -> AsyncIterator[str]:
+        response = await self.client.generate_content_async(
+            contents=full_prompt,
+            generation_config=generation_config,
+            stream=True,
+        )
+        async for chunk in response:
+            record_usage(chunk)  # usage_metadata is cumulative; the last chunk read wins
+            try:
+                text = chunk.text
+            except ValueError:  # A chunk without text parts (e.g. only a finish reason)
+                continue
+            if text:
+                yield text
+
 
 class DeepSeekClient(BaseModelClient):
     """
     For DeepSeek R1 'deepseek-reasoner'
     """
 
+    provider = "deepseek"
+
     def __init__(self, model_name: str):
         super().__init__(model_name)
         self.api_key = os.environ.get("DEEPSEEK_API_KEY")
-        self.client = AsyncDeepSeekOpenAI(
+        self.client = get_async_openai(
             api_key=self.api_key, 
             base_url="https://api.deepseek.com/"
         )
 
     async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
         try:
-            # Append the call to action to the user's prompt
-            prompt_with_cta = prompt + "\n\nPROVIDE YOUR RESPONSE BELOW:"
-
-            system_prompt_content = self.system_prompt
-            if inject_random_seed:
-                random_seed = generate_random_seed()
-                system_prompt_content = f"{random_seed}\n\n{self.system_prompt}"
+            # Seed and call to action go at the end of the user's prompt
+            system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
+
+            messages = [
+                {"role": "system", "content": system_prompt_content},
+                {"role": "user", "content": prompt_with_cta},
+            ]
+            if self.stream_responses:
+                # Only the answer is collected; reasoning_content deltas of deepseek-reasoner are skipped
+                return (await self._collect_stream(_openai_chat_chunks(
+                    self.client, model=self.model_name, messages=messages,
+                    temperature=temperature, max_tokens=self.max_tokens,
+                ))).strip()
 
             response = await self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt_content},
-                    {"role": "user", "content": prompt_with_cta},
-                ],
+                messages=messages,
                 stream=False,
                 temperature=temperature,
                 max_tokens=self.max_tokens,
             )
+            record_usage(response)
             
             logger.debug(f"[{self.model_name}] Raw DeepSeek response:\n{response}")
 
@@ -949,6 +965,8 @@ class DeepSeekClient(BaseModelClient):
             return content
 
         except Exception as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             logger.error(
                 f"[{self.model_name}] Unexpected error in generate_response: {e}"
             )
@@ -961,6 +979,8 @@ class OpenAIResponsesClient(BaseModelClient):
     This client makes direct HTTP requests to the v1/responses endpoint.
     """
 
+    provider = "openai"
+
     def __init__(self, model_name: str):
         super().__init__(model_name)
         self.api_key = os.environ.get("OPENAI_API_KEY")
@@ -973,12 +993,8 @@ class OpenAIResponsesClient(BaseModelClient):
         try:
             # The Responses API uses a different format than chat completions
             # Combine system prompt and user prompt into a single input
-            system_prompt_content = self.system_prompt
-            if inject_random_seed:
-                random_seed = generate_random_seed()
-                system_prompt_content = f"{random_seed}\n\n{self.system_prompt}"
-
-            full_prompt = f"{system_prompt_content}\n\n{prompt}\n\nPROVIDE YOUR RESPONSE BELOW:"
+            system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
+            full_prompt = f"{system_prompt_content}\n\n{prompt_with_cta}"
             
             # Prepare the request payload
             payload = {
@@ -993,70 +1009,84 @@ class OpenAIResponsesClient(BaseModelClient):
                 "Authorization": f"Bearer {self.api_key}"
             }
             
-            # Make the API call using aiohttp
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.base_url, json=payload, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(
-                            f"[{self.model_name}] API error (status {response.status}): {error_text}"
+            # Make the API call over the shared, pooled aiohttp session
+            session = get_aiohttp_session("https://api.openai.com")
+            async with session.post(self.base_url, json=payload, headers=headers) as response:
+                mark_first_byte()
+                # Rate limited or server-side failure: let the shared limiter back off and retry
+                if response.status == 429:
+                    raise RateLimitError(
+                        f"Responses API rate limited: {await response.text()}",
+                        retry_after=response.headers.get("Retry-After"),
+                    )
+                if response.status >= 500:
+                    response.raise_for_status()
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(
+                        f"[{self.model_name}] API error (status {response.status}): {error_text}"
+                    )
+                    return ""
+                
+                response_data = await response.json()
+                record_usage(response_data)
+                
+                # Extract the text from the nested response structure
+                # The text is in output[1].content[0].text based on the response
+                try:
+                    outputs = response_data.get("output", [])
+                    if len(outputs) < 2:
+                        logger.warning(
+                            f"[{self.model_name}] Unexpected output structure. Full response: {response_data}"
                         )
                         return ""
                     
-                    response_data = await response.json()
+                    # The message is typically in the second output item
+                    message_output = outputs[1]
+                    if message_output.get("type") != "message":
+                        logger.warning(
+                            f"[{self.model_name}] Expected message type in output[1]. Got: {message_output.get('type')}"
+                        )
+                        return ""
                     
-                    # Extract the text from the nested response structure
-                    # The text is in output[1].content[0].text based on the response
-                    try:
-                        outputs = response_data.get("output", [])
-                        if len(outputs) < 2:
-                            logger.warning(
-                                f"[{self.model_name}] Unexpected output structure. Full response: {response_data}"
-                            )
-                            return ""
-                        
-                        # The message is typically in the second output item
-                        message_output = outputs[1]
-                        if message_output.get("type") != "message":
-                            logger.warning(
-                                f"[{self.model_name}] Expected message type in output[1]. Got: {message_output.get('type')}"
-                            )
-                            return ""
-                        
-                        content_list = message_output.get("content", [])
-                        if not content_list:
-                            logger.warning(
-                                f"[{self.model_name}] Empty content list in message output"
-                            )
-                            return ""
-                        
-                        # Look for the content item with type 'output_text'
-                        text_content = ""
-                        for content_item in content_list:
-                            if content_item.get("type") == "output_text":
-                                text_content = content_item.get("text", "")
-                                break
-                        
-                        if not text_content:
-                            logger.warning(
-                                f"[{self.model_name}] No output_text found in content. Full content: {content_list}"
-                            )
-                            return ""
-                        
-                        return text_content.strip()
-                        
-                    except (KeyError, IndexError, TypeError) as e:
-                        logger.error(
-                            f"[{self.model_name}] Error parsing response structure: {e}. Full response: {response_data}"
+                    content_list = message_output.get("content", [])
+                    if not content_list:
+                        logger.warning(
+                            f"[{self.model_name}] Empty content list in message output"
+                        )
+                        return ""
+                    
+                    # Look for the content item with type 'output_text'
+                    text_content = ""
+                    for content_item in content_list:
+                        if content_item.get("type") == "output_text":
+                            text_content = content_item.get("text", "")
+                            break
+                    
+                    if not text_content:
+                        logger.warning(
+                            f"[{self.model_name}] No output_text found in content. Full content: {content_list}"
                         )
                         return ""
                     
+                    return text_content.strip()
+                    
+                except (KeyError, IndexError, TypeError) as e:
+                    logger.error(
+                        f"[{self.model_name}] Error parsing response structure: {e}. Full response: {response_data}"
+                    )
+                    return ""
+                
         except aiohttp.ClientError as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             logger.error(
                 f"[{self.model_name}] HTTP client error in generate_response: {e}"
             )
             return ""
         except Exception as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             logger.error(
                 f"[{self.model_name}] Unexpected error in generate_response: {e}"
             )
@@ -1068,6 +1098,8 @@ class OpenRouterClient(BaseModelClient):
     For OpenRouter models, with default being 'openrouter/quasar-alpha'
     """
 
+    provider = "openrouter"
+
     def __init__(self, model_name: str = "openrouter/quasar-alpha"):
         # Allow specifying just the model identifier or the full path
         if not model_name.startswith("openrouter/") and "/" not in model_name:
@@ -1080,7 +1112,7 @@ class OpenRouterClient(BaseModelClient):
         if not self.api_key:
             raise ValueError("OPENROUTER_API_KEY environment variable is required")
             
-        self.client = AsyncOpenAI(
+        self.client = get_async_openai(
             base_url="https://openrouter.ai/api/v1",
             api_key=self.api_key
         )
@@ -1090,24 +1122,30 @@ class OpenRouterClient(BaseModelClient):
     async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
         """Generate a response using OpenRouter with robust error handling."""
         try:
-            # Append the call to action to the user's prompt
-            prompt_with_cta = prompt + "\n\nPROVIDE YOUR RESPONSE BELOW:"
-
-            system_prompt_content = self.system_prompt
-            if inject_random_seed:
-                random_seed = generate_random_seed()
-                system_prompt_content = f"{random_seed}\n\n{self.system_prompt}"
+            # Seed and call to action go at the end of the user's prompt
+            system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
 
             # Prepare standard OpenAI-compatible request
+            messages = [
+                {"role": "system", "content": system_prompt_content},
+                {"role": "user", "content": prompt_with_cta}
+            ]
+            if self.stream_responses:
+                content = (await self._collect_stream(_openai_chat_chunks(
+                    self.client, model=self.model_name, messages=messages,
+                    max_tokens=self.max_tokens, temperature=temperature,
+                ))).strip()
+                if not content:
+                    logger.warning(f"[{self.model_name}] OpenRouter returned empty content")
+                return content
+
             response = await self.client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_prompt_content},
-                    {"role": "user", "content": prompt_with_cta}
-                ],
+                messages=messages,
                 max_tokens=self.max_tokens,
                 temperature=temperature,
             )
+            record_usage(response)
             
             if not response.choices:
                 logger.warning(f"[{self.model_name}] OpenRouter returned no choices")
@@ -1124,14 +1162,13 @@ class OpenRouterClient(BaseModelClient):
         except Exception as e:
             error_msg = str(e)
             # Check if it's a specific OpenRouter error
-            if "429" in error_msg or "rate" in error_msg.lower():
-                logger.warning(f"[{self.model_name}] OpenRouter rate limit error: {e}")
-                # The retry logic in run_llm_and_log will handle this
-                raise e  # Re-raise to trigger retry
+            if is_transient_error(e):
+                logger.warning(f"[{self.model_name}] OpenRouter rate limit / transient error: {e}")
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
             elif "provider" in error_msg.lower() and "error" in error_msg.lower():
                 logger.error(f"[{self.model_name}] OpenRouter provider error: {e}")
-                # This might be a temporary issue with the upstream provider
-                raise e  # Re-raise to trigger retry or fallback
+                # Usually a temporary issue with the upstream provider, so treat it as retryable
+                raise RateLimitError(f"OpenRouter provider error: {e}") from e
             else:
                 logger.error(f"[{self.model_name}] Error in OpenRouter generate_response: {e}")
                 return ""
@@ -1146,6 +1183,8 @@ class TogetherAIClient(BaseModelClient):
     Model names should be passed without the 'together-' prefix.
     """
 
+    provider = "together"
+
     def __init__(self, model_name: str):
         super().__init__(model_name)  # model_name here is the actual Together AI model identifier
         self.api_key = os.environ.get("TOGETHER_API_KEY")
@@ -1154,29 +1193,39 @@ class TogetherAIClient(BaseModelClient):
         
         # The model_name passed to super() is used for logging and identification.
         # The actual model name for the API call is self.model_name (from super class).
-        self.client = AsyncTogether(api_key=self.api_key)
+        self.client = get_async_together(api_key=self.api_key)
         logger.info(f"[{self.model_name}] Initialized TogetherAI client for model: {self.model_name}")
 
-    async def generate_response(self, prompt: str) -> str:
+    async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
         """
         Generates a response from the Together AI model.
         """
         logger.debug(f"[{self.model_name}] Generating response with prompt (first 100 chars): {prompt[:100]}...")
-        
+
+        system_prompt_content, prompt_with_cta = self._request_texts(prompt, inject_random_seed)
+
         messages = [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": prompt},
+            {"role": "system", "content": system_prompt_content},
+            {"role": "user", "content": prompt_with_cta},
         ]
 
         try:
+            if self.stream_responses:
+                # Together reports usage in the last chunk without needing stream_options
+                return (await self._collect_stream(_openai_chat_chunks(
+                    self.client, include_usage=False, model=self.model_name, messages=messages,
+                    temperature=temperature, max_tokens=self.max_tokens,
+                ))).strip()
+
             # Ensure the model name used here is the one intended for the API,
             # which is self.model_name as set by BaseModelClient.__init__
             response = await self.client.chat.completions.create(
                 model=self.model_name,
                 messages=messages,
-                # Consider adding max_tokens, temperature, etc. as needed
-                # max_tokens=2048, # Example
+                temperature=temperature,
+                max_tokens=self.max_tokens,
             )
+            record_usage(response)
             
             if response.choices and response.choices[0].message and response.choices[0].message.content is not None:
                 content = response.choices[0].message.content
@@ -1185,14 +1234,144 @@ class TogetherAIClient(BaseModelClient):
             else:
                 logger.warning(f"[{self.model_name}] No content in response from Together AI or response structure unexpected: {response}")
                 return ""
-        except TogetherAPIError as e:
-            logger.error(f"[{self.model_name}] Together AI API error: {e}", exc_info=True)
-            return f"Error: Together AI API error - {str(e)}" # Return a string with error info
         except Exception as e:
+            if is_transient_error(e):
+                raise  # Retried with backoff by the shared rate limiter in run_llm_and_log
+            if isinstance(e, TogetherAPIError):
+                logger.error(f"[{self.model_name}] Together AI API error: {e}", exc_info=True)
+                return f"Error: Together AI API error - {str(e)}" # Return a string with error info
             logger.error(f"[{self.model_name}] Unexpected error in TogetherAIClient: {e}", exc_info=True)
             return f"Error: Unexpected error - {str(e)}" # Return a string with error info
 
 
+# Parsed replay logs, keyed by (absolute path, (file, mtime, size) of every log segment); one parse per log per process
+_replay_log_cache: Dict[Tuple[str, Tuple], Dict[Tuple[str, str, str], Tuple[str, ...]]] = {}
+
+
+class ReplayClient(BaseModelClient):
+    """
+    Serves responses recorded in a previous run's llm_responses.csv instead of
+    calling a provider. Responses are keyed by (power, phase, response_type) and
+    handed out in recorded order, so a full game can be re-run offline to
+    profile or regression-test the orchestration code.
+
+    Selected with a model id of the form ``replay:<results_dir>`` (or
+    ``replay:<path/to/llm_responses.csv>``). Compressed and rotated logs
+    written with --llm_log_format are read as well (see llm_log.py).
+
+    Synthetic latency is controlled by environment variables:
+      AI_DIPLOMACY_REPLAY_LATENCY  - "0" (default), "fixed:<s>", "uniform:<lo>,<hi>",
+                                     "lognormal:<mu>,<sigma>" or "exponential:<mean>"
+      AI_DIPLOMACY_REPLAY_SEED     - seed for the latency RNG (default 0)
+
+    With --stream_responses the recorded text is handed out in
+    STREAM_CHUNK_CHARS-sized chunks through the same streaming path as the
+    provider clients, so early stopping can be exercised offline.
+    """
+
+    provider = "replay"
+    STREAM_CHUNK_CHARS = 64
+
+    # run_llm_and_log response_type -> response_type written to llm_responses.csv
+    RESPONSE_TYPE_ALIASES = {
+        "order": "order_generation",
+        "negotiation": "negotiation_message",
+        "negotiation_diary_raw": "negotiation_diary",
+        "initialization": "initial_state_setup",
+    }
+
+    def __init__(self, model_name: str, replay_path: str):
+        super().__init__(model_name)
+        if not find_llm_log_files(replay_path):
+            raise ValueError(f"ReplayClient: no recorded responses found at {replay_path}")
+        self.replay_path = replay_path
+        # Each client consumes its own copy of the recorded responses
+        self.responses = {key: deque(rows) for key, rows in self._load_responses(replay_path).items()}
+        self.latency_spec = os.environ.get("AI_DIPLOMACY_REPLAY_LATENCY", "0")
+        self.rng = random.Random(int(os.environ.get("AI_DIPLOMACY_REPLAY_SEED", "0")))
+        self.misses = 0
+        logger.info(
+            f"[{self.model_name}] Loaded {sum(len(q) for q in self.responses.values())} recorded responses "
+            f"from {replay_path} (latency: {self.latency_spec})"
+        )
+
+    @staticmethod
+    def _load_responses(replay_path: str) -> Dict[Tuple[str, str, str], Tuple[str, ...]]:
+        files = find_llm_log_files(replay_path)
+        signature = tuple((f, st.st_mtime_ns, st.st_size) for f, st in ((f, os.stat(f)) for f in files))
+        cache_key = (os.path.abspath(replay_path), signature)
+        cached = _replay_log_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        responses = defaultdict(list)
+        for row in iter_llm_log_rows(replay_path):
+            key = (row.get("power") or "game", row.get("phase") or "", row.get("response_type") or "")
+            responses[key].append(row.get("raw_response") or "")
+        parsed = {key: tuple(rows) for key, rows in responses.items()}
+        # A rewritten log gets a new signature; drop the stale parse of the same path
+        for stale_key in [k for k in _replay_log_cache if k[0] == cache_key[0]]:
+            del _replay_log_cache[stale_key]
+        _replay_log_cache[cache_key] = parsed
+        return parsed
+
+    def _sample_latency(self) -> float:
+        kind, _, params = self.latency_spec.partition(":")
+        try:
+            values = [float(v) for v in params.split(",") if v.strip()]
+            if kind == "fixed":
+                return values[0]
+            if kind == "uniform":
+                return self.rng.uniform(values[0], values[1])
+            if kind == "lognormal":
+                return self.rng.lognormvariate(values[0], values[1])
+            if kind == "exponential":
+                return self.rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+            return float(kind)
+        except (ValueError, IndexError, ZeroDivisionError):
+            logger.warning(f"[{self.model_name}] Invalid replay latency spec '{self.latency_spec}'; using 0.")
+            self.latency_spec = "0"
+            return 0.0
+
+    def _pop_response(self, power_name: str, phase: str, response_type: str) -> Optional[str]:
+        candidates = [self.RESPONSE_TYPE_ALIASES.get(response_type, response_type), response_type]
+        for candidate in candidates:
+            queue = self.responses.get((power_name, phase, candidate))
+            if queue:
+                return queue.popleft()
+        # State updates are logged under several outcome-specific types (state_update_json_error, ...)
+        for (p, ph, rtype), queue in self.responses.items():
+            if p == power_name and ph == phase and queue and rtype.startswith(candidates[0]):
+                return queue.popleft()
+        return None
+
+    async def generate_response(self, prompt: str, temperature: float = 0.0, inject_random_seed: bool = True) -> str:
+        context = llm_call_context.get() or {}
+        power_name = context.get("power_name") or "game"
+        phase = context.get("phase") or ""
+        response_type = context.get("response_type") or ""
+
+        latency = self._sample_latency()
+        if latency > 0:
+            await asyncio.sleep(latency)
+        mark_first_byte()
+
+        response = self._pop_response(power_name, phase, response_type)
+        if response is None:
+            self.misses += 1
+            logger.warning(
+                f"[{self.model_name}] No recorded response for {power_name}/{phase}/{response_type}; returning empty response."
+            )
+            return ""
+        if self.stream_responses:
+            return await self._collect_stream(self._stream_chunks(response))
+        return response
+
+    async def _stream_chunks(self, response: str) -> AsyncIterator[str]:
+        for start in range(0, len(response), self.STREAM_CHUNK_CHARS):
+            yield response[start:start + self.STREAM_CHUNK_CHARS]
+            await asyncio.sleep(0)
+
+
 ##############################################################################
 # 3) Factory to Load Model Client
 ##############################################################################
@@ -1207,12 +1386,16 @@ def load_model_client(model_id: str) -> BaseModelClient:
     
     Example usage:
        client = load_model_client("claude-3-5-sonnet-20241022")
+       client = load_model_client("replay:results/20250522_210700")  # offline replay
     """
     # Basic pattern matching or direct mapping
     lower_id = model_id.lower()
     
+    # Replay a previously recorded run (checked first: the path may contain "/")
+    if lower_id.startswith("replay:"):
+        return ReplayClient(model_id, model_id.split(":", 1)[1])
     # Check for o3-pro model specifically - it needs the Responses API
-    if lower_id == "o3-pro":
+    elif lower_id == "o3-pro":
         return OpenAIResponsesClient(model_id)
     # Check for OpenRouter first to handle prefixed models like openrouter-deepseek
     elif model_id.startswith("together-"):
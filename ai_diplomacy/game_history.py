@@ -2,7 +2,8 @@ from dotenv import load_dotenv
 import logging
 from collections import defaultdict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from heapq import merge
+from typing import Any, Dict, List, Optional, Tuple
 
 logger = logging.getLogger("utils")
 logger.setLevel(logging.INFO)
@@ -17,6 +18,66 @@ class Message:
     content: str
 
 
+# Recipients that make a message public rather than a private conversation
+BROADCAST_RECIPIENTS = ("GLOBAL", "ALL")
+
+
+def _message_fields(msg: Any) -> Tuple[str, str, str]:
+    """(sender, recipient, content) of a Message or of a message dict (as loaded from saved games)."""
+    if isinstance(msg, Message):
+        return msg.sender, msg.recipient, msg.content
+    return msg["sender"], msg["recipient"], msg.get("content", "")
+
+
+class _MessageIndex:
+    """
+    Positions of a phase's messages, grouped the way the accessors read them. Built
+    incrementally as messages are appended, so each message is indexed once.
+    Rendered views (global text, per-power conversations and inboxes) are memoized
+    until the next message arrives, so past phases are formatted only once.
+    """
+
+    def __init__(self):
+        self.source: Optional[list] = None  # The messages list this index describes
+        self.count = 0  # How many of its messages are indexed
+        self.fields: List[Tuple[str, str, str]] = []  # (sender, recipient, content) per position
+        self.global_positions: List[int] = []  # recipient == "GLOBAL"
+        self.private_positions: Dict[str, List[int]] = defaultdict(list)  # non-GLOBAL messages sent or received
+        self.to_positions: Dict[str, List[int]] = defaultdict(list)  # non-GLOBAL messages received
+        self.sent_private: Dict[str, List[int]] = defaultdict(list)  # sent to a single power
+        self.pairs: Dict[Tuple[str, str], List[int]] = defaultdict(list)  # (sender, recipient)
+        self.broadcasts_by_sender: Dict[str, List[str]] = defaultdict(list)  # GLOBAL/ALL contents per sender
+        self.replies: Dict[Tuple[str, str], bool] = {}  # memoized has_reply() results
+        self.views: Dict[Tuple[str, str], Any] = {}  # memoized rendered views, keyed by (view, power)
+
+    def add(self, position: int, msg: Any) -> None:
+        sender, recipient, content = _message_fields(msg)
+        self.fields.append((sender, recipient, content))
+        if recipient == "GLOBAL":
+            self.global_positions.append(position)
+        else:
+            self.private_positions[sender].append(position)
+            if recipient != sender:
+                self.private_positions[recipient].append(position)
+            self.to_positions[recipient].append(position)
+        if recipient in BROADCAST_RECIPIENTS:
+            self.broadcasts_by_sender[sender].append(content)
+        else:
+            self.sent_private[sender].append(position)
+        self.pairs[(sender, recipient)].append(position)
+        self.replies.clear()
+        self.views.clear()
+
+    def has_reply(self, responder: str, to_power: str) -> bool:
+        """Whether responder wrote to to_power directly, or publicly mentioning to_power's name."""
+        key = (responder, to_power)
+        if key not in self.replies:
+            self.replies[key] = bool(self.pairs.get(key)) or any(
+                to_power in content for content in self.broadcasts_by_sender.get(responder, ())
+            )
+        return self.replies[key]
+
+
 @dataclass
 class Phase:
     name: str  # e.g. "SPRING 1901"
@@ -32,6 +93,36 @@ class Phase:
     phase_summaries: Dict[str, str] = field(default_factory=dict)
     # NEW: Store experience/journal updates from each power for this phase
     experience_updates: Dict[str, str] = field(default_factory=dict)
+    # Per-power planning outcome: {"status": ..., "latency_s": ...}
+    plan_stats: Dict[str, Dict[str, object]] = field(default_factory=dict)
+    _index: _MessageIndex = field(default_factory=_MessageIndex, init=False, repr=False, compare=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable copy of this phase (used by checkpoint.py)."""
+        return {
+            "name": self.name,
+            "plans": dict(self.plans),
+            "messages": [{"sender": m.sender, "recipient": m.recipient, "content": m.content} for m in self.messages],
+            "orders_by_power": {p: list(o) for p, o in self.orders_by_power.items()},
+            "results_by_power": {p: [list(r) for r in res] for p, res in self.results_by_power.items()},
+            "phase_summaries": dict(self.phase_summaries),
+            "experience_updates": dict(self.experience_updates),
+            "plan_stats": {p: dict(stats) for p, stats in self.plan_stats.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Phase":
+        phase = cls(
+            name=data["name"],
+            plans=dict(data.get("plans", {})),
+            messages=[Message(**m) for m in data.get("messages", [])],
+            phase_summaries=dict(data.get("phase_summaries", {})),
+            experience_updates=dict(data.get("experience_updates", {})),
+            plan_stats=dict(data.get("plan_stats", {})),
+        )
+        phase.orders_by_power.update(data.get("orders_by_power", {}))
+        phase.results_by_power.update(data.get("results_by_power", {}))
+        return phase
 
     def add_plan(self, power_name: str, plan: str):
         self.plans[power_name] = plan
@@ -40,6 +131,18 @@ class Phase:
         self.messages.append(
             Message(sender=sender, recipient=recipient, content=content)
         )
+        self.message_index()
+
+    def message_index(self) -> _MessageIndex:
+        """The index over self.messages, catching up with messages appended (or a list assigned) directly."""
+        index = self._index
+        if index.source is not self.messages or index.count > len(self.messages):
+            index = self._index = _MessageIndex()
+            index.source = self.messages
+        for position in range(index.count, len(self.messages)):
+            index.add(position, self.messages[position])
+        index.count = len(self.messages)
+        return index
 
     def add_orders(self, power: str, orders: List[str], results: List[List[str]]):
         self.orders_by_power[power].extend(orders)
@@ -49,20 +152,62 @@ class Phase:
         self.results_by_power[power].extend(results)
 
     def get_global_messages(self) -> str:
-        result = ""
-        for msg in self.messages:
-            if msg.recipient == "GLOBAL":
-                result += f" {msg.sender}: {msg.content}\n"
+        index = self.message_index()
+        result = index.views.get(("global", ""))
+        if result is None:
+            fields = index.fields
+            result = "".join(f" {fields[p][0]}: {fields[p][2]}\n" for p in index.global_positions)
+            index.views[("global", "")] = result
         return result
 
     def get_private_messages(self, power: str) -> Dict[str, str]:
-        conversations = defaultdict(str)
-        for msg in self.messages:
-            if msg.sender == power and msg.recipient != "GLOBAL":
-                conversations[msg.recipient] += f"  {power}: {msg.content}\n"
-            elif msg.recipient == power:
-                conversations[msg.sender] += f"  {msg.sender}: {msg.content}\n"
-        return conversations
+        index = self.message_index()
+        cached = index.views.get(("private", power))
+        if cached is None:
+            conversations: Dict[str, List[str]] = defaultdict(list)
+            for position in index.private_positions.get(power, ()):
+                sender, recipient, content = index.fields[position]
+                if sender == power:
+                    conversations[recipient].append(f"  {power}: {content}\n")
+                else:
+                    conversations[sender].append(f"  {sender}: {content}\n")
+            cached = {other: "".join(lines) for other, lines in conversations.items()}
+            index.views[("private", power)] = cached
+        return defaultdict(str, cached)
+
+    def get_history_messages_block(self, power: str) -> str:
+        """The GLOBAL and PRIVATE MESSAGES sections of this phase in get_previous_phases_history ("" if none)."""
+        index = self.message_index()
+        block = index.views.get(("history", power))
+        if block is None:
+            block = ""
+            global_msgs = self.get_global_messages()
+            if global_msgs:
+                block += "\n  GLOBAL MESSAGES:\n"
+                block += "".join([f"    {line}\n" for line in global_msgs.strip().split('\n')])
+
+            private_msgs = self.get_private_messages(power)
+            if private_msgs:
+                block += "\n  PRIVATE MESSAGES:\n"
+                for other_power, messages in private_msgs.items():
+                    block += f"    Conversation with {other_power}:\n"
+                    block += "".join([f"      {line}\n" for line in messages.strip().split('\n')])
+            index.views[("history", power)] = block
+        return block
+
+    def get_messages_to_power(self, power: str) -> List[Any]:
+        """Messages this power should read, in order: private ones sent to it and GLOBAL ones from others."""
+        index = self.message_index()
+        positions = index.views.get(("inbox", power))
+        if positions is None:
+            fields = index.fields
+            positions = list(merge(
+                (p for p in index.to_positions.get(power, ()) if fields[p][0] != power),
+                (p for p in index.global_positions if fields[p][0] != power),
+            ))
+            index.views[("inbox", power)] = positions
+        messages = self.messages
+        return [messages[p] for p in positions]
 
     def get_all_orders_formatted(self) -> str:
         if not self.orders_by_power:
@@ -86,21 +231,44 @@ class Phase:
 @dataclass
 class GameHistory:
     phases: List[Phase] = field(default_factory=list)
+    # phase name -> index into self.phases (latest phase with that name); see _phase_lookup
+    _phase_index: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _indexed_phases: List[Phase] = field(default_factory=list, init=False, repr=False, compare=False)
 
     def add_phase(self, phase_name: str):
         # Avoid adding duplicate phases
         if not self.phases or self.phases[-1].name != phase_name:
             self.phases.append(Phase(name=phase_name))
+            self._phase_lookup()
             logger.debug(f"Added new phase: {phase_name}")
         else:
             logger.warning(f"Phase {phase_name} already exists. Not adding again.")
 
+    def _phase_lookup(self) -> Dict[str, int]:
+        """
+        The phase-name index, extended for phases appended since the last call and
+        rebuilt if self.phases was replaced or edited some other way.
+        """
+        indexed = self._indexed_phases
+        phases = self.phases
+        count = len(indexed)
+        if count > len(phases) or (count and phases[count - 1] is not indexed[-1]) or (count and phases[0] is not indexed[0]):
+            self._phase_index, self._indexed_phases = {}, []
+            indexed, count = self._indexed_phases, 0
+        for position in range(count, len(phases)):
+            self._phase_index[phases[position].name] = position
+            indexed.append(phases[position])
+        return self._phase_index
+
+    def _find_phase(self, phase_name: str) -> Optional[Phase]:
+        position = self._phase_lookup().get(phase_name)
+        return self.phases[position] if position is not None else None
+
     def _get_phase(self, phase_name: str) -> Optional[Phase]:
-        for phase in reversed(self.phases):
-            if phase.name == phase_name:
-                return phase
-        logger.error(f"Phase {phase_name} not found in history.")
-        return None
+        phase = self._find_phase(phase_name)
+        if phase is None:
+            logger.error(f"Phase {phase_name} not found in history.")
+        return phase
 
     def add_plan(self, phase_name: str, power_name: str, plan: str):
         phase = self._get_phase(phase_name)
@@ -108,15 +276,17 @@ class GameHistory:
             phase.plans[power_name] = plan
             logger.debug(f"Added plan for {power_name} in {phase_name}")
 
+    def add_plan_stats(self, phase_name: str, power_name: str, status: str, latency_s: float):
+        phase = self._get_phase(phase_name)
+        if phase:
+            phase.plan_stats[power_name] = {"status": status, "latency_s": round(latency_s, 3)}
+
     def add_message(
         self, phase_name: str, sender: str, recipient: str, message_content: str
     ):
         phase = self._get_phase(phase_name)
         if phase:
-            message = Message(
-                sender=sender, recipient=recipient, content=message_content
-            )
-            phase.messages.append(message)
+            phase.add_message(sender, recipient, message_content)
             logger.debug(f"Added message from {sender} to {recipient} in {phase_name}")
 
     def add_orders(self, phase_name: str, power_name: str, orders: List[str]):
@@ -151,13 +321,14 @@ class GameHistory:
             return {}
         return self.phases[-1].plans
 
+    def get_messages_by_phase(self, phase_name: str) -> List[Message]:
+        """All messages recorded in phase_name, in the order they were sent ([] if the phase is unknown)."""
+        phase = self._find_phase(phase_name)
+        return list(phase.messages) if phase else []
+
     # NEW METHOD
     def get_messages_this_round(self, power_name: str, current_phase_name: str) -> str:
-        current_phase: Optional[Phase] = None
-        for phase_obj in self.phases:
-            if phase_obj.name == current_phase_name:
-                current_phase = phase_obj
-                break
+        current_phase = self._find_phase(current_phase_name)
 
         if not current_phase:
             return f"\n(No messages found for current phase: {current_phase_name})\n"
@@ -198,19 +369,16 @@ class GameHistory:
         # Get the most recent 2 phases including current phase
         recent_phases = self.phases[-2:] if len(self.phases) >= 2 else self.phases[-1:]
         
-        # Collect all messages sent TO this power
+        # Collect all messages sent TO this power: private ones and global messages from others
         messages_to_power = []
         for phase in recent_phases:
-            for msg in phase.messages:
-                # Personal messages to this power or global messages from others
-                if msg.recipient == power_name or (msg.recipient == "GLOBAL" and msg.sender != power_name):
-                    # Skip if sender is this power (don't need to respond to own messages)
-                    if msg.sender != power_name:
-                        messages_to_power.append({
-                            'sender': msg.sender,
-                            'content': msg.content,
-                            'phase': phase.name
-                        })
+            for msg in phase.get_messages_to_power(power_name):
+                sender, _, content = _message_fields(msg)
+                messages_to_power.append({
+                    'sender': sender,
+                    'content': content,
+                    'phase': phase.name
+                })
         
         # Add debug logging
         logger.info(f"Found {len(messages_to_power)} messages to {power_name} across {len(recent_phases)} phases")
@@ -236,50 +404,18 @@ class GameHistory:
         if not recent_phases:
             return ignored_by_power
         
+        # Each phase's index keeps who wrote to whom, so a reply check is a lookup rather than a scan
+        indexes = [phase.message_index() for phase in recent_phases]
         for i, phase in enumerate(recent_phases):
-            # Get messages sent by sender to specific powers (not global)
-            sender_messages = []
-            for msg in phase.messages:
-                # Handle both Message objects and dict objects
-                if isinstance(msg, Message):
-                    if msg.sender == sender_name and msg.recipient not in ['GLOBAL', 'ALL']:
-                        sender_messages.append(msg)
-                else:  # Assume dict
-                    if msg['sender'] == sender_name and msg['recipient'] not in ['GLOBAL', 'ALL']:
-                        sender_messages.append(msg)
-            
-            # Check for responses in this and next phases
-            for msg in sender_messages:
-                # Handle both Message objects and dict objects
-                if isinstance(msg, Message):
-                    recipient = msg.recipient
-                    msg_content = msg.content
-                else:
-                    recipient = msg['recipient']
-                    msg_content = msg['content']
-                
-                # Look for responses in current phase and next phases
-                found_response = False
-                
-                # Check remaining phases starting from current
-                for check_phase in recent_phases[i:min(i+2, len(recent_phases))]:
-                    # Look for messages FROM the recipient TO the sender (direct response)
-                    # or FROM the recipient to GLOBAL/ALL that might acknowledge sender
-                    response_msgs = []
-                    for m in check_phase.messages:
-                        if isinstance(m, Message):
-                            if m.sender == recipient and (m.recipient == sender_name or 
-                               (m.recipient in ['GLOBAL', 'ALL'] and sender_name in m.content)):
-                                response_msgs.append(m)
-                        else:  # Assume dict
-                            if m['sender'] == recipient and (m['recipient'] == sender_name or 
-                               (m['recipient'] in ['GLOBAL', 'ALL'] and sender_name in m.get('content', ''))):
-                                response_msgs.append(m)
-                    
-                    if response_msgs:
-                        found_response = True
-                        break
-                
+            # Messages sent by sender to specific powers (not global)
+            for position in indexes[i].sent_private.get(sender_name, ()):
+                _, recipient, msg_content = indexes[i].fields[position]
+
+                # A direct reply, or a global message mentioning the sender, in this or the next phase
+                found_response = any(
+                    index.has_reply(recipient, sender_name) for index in indexes[i:min(i + 2, len(indexes))]
+                )
+
                 if not found_response:
                     if recipient not in ignored_by_power:
                         ignored_by_power[recipient] = []
@@ -297,7 +433,9 @@ class GameHistory:
         if not self.phases:
             return "\n(No game history available)\n"
 
-        relevant_phases = [p for p in self.phases if p.name != current_phase_name]
+        # Phase names are unique, so the last num_prev_phases + 1 phases hold every phase that can be reported
+        candidate_phases = self.phases[-(num_prev_phases + 1):] if num_prev_phases > 0 else self.phases
+        relevant_phases = [p for p in candidate_phases if p.name != current_phase_name]
 
         if not relevant_phases:
             return "\n(No previous game history before this round)\n"
@@ -311,21 +449,9 @@ class GameHistory:
 
         for phase_idx, phase in enumerate(phases_to_report):
             phase_content_str = f"\nPHASE: {phase.name}\n"
-            current_phase_has_content = False
-
-            global_msgs = phase.get_global_messages()
-            if global_msgs:
-                phase_content_str += "\n  GLOBAL MESSAGES:\n"
-                phase_content_str += "".join([f"    {line}\n" for line in global_msgs.strip().split('\n')])
-                current_phase_has_content = True
-
-            private_msgs = phase.get_private_messages(power_name)
-            if private_msgs:
-                phase_content_str += "\n  PRIVATE MESSAGES:\n"
-                for other_power, messages in private_msgs.items():
-                    phase_content_str += f"    Conversation with {other_power}:\n"
-                    phase_content_str += "".join([f"      {line}\n" for line in messages.strip().split('\n')])
-                current_phase_has_content = True
+            messages_block = phase.get_history_messages_block(power_name)
+            phase_content_str += messages_block
+            current_phase_has_content = bool(messages_block)
 
             if phase.orders_by_power:
                 phase_content_str += "\n  ORDERS:\n"
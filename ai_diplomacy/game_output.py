@@ -0,0 +1,166 @@
+"""
+Incremental game output: one JSON line per completed phase.
+
+lm_game.py used to keep everything in memory and write lmvsgame.json once, at
+the end of the game, so a crash lost the whole run. GameOutputStream appends a
+record to lmvsgame.jsonl as soon as each phase has been processed and its
+diaries and state updates are done:
+
+  {"type": "header", "id": ..., "map": ..., "rules": [...]}
+  {"type": "phase", "phase": {name, state, orders, results, messages, summary, agent_relationships, ...}}
+  ...
+  {"type": "final", "phase": {...current phase...}, "phase_summaries": {...}, "final_agent_states": {...}}
+
+Every line is flushed when it is written. compact_game_stream() turns a stream
+back into the lmvsgame.json schema read by ai_animation and the analysis
+scripts (same structure as to_saved_game_format plus phase_summaries,
+per-phase summary / agent_relationships and final_agent_states). Phases are
+written one at a time, so memory use stays at one phase. A stream without its
+"final" record (a crashed run) still compacts to a valid game holding every
+completed phase:
+
+    python -m ai_diplomacy.game_output results/<run>/lmvsgame.jsonl -o lmvsgame.json
+"""
+import argparse
+import json
+import logging
+import os
+import textwrap
+from typing import Any, Dict, Iterator, Optional
+
+from diplomacy.utils.export import RULES_TO_SKIP
+
+logger = logging.getLogger(__name__)
+
+
+def phase_to_dict(game: Any, phase_data: Any, rules: list) -> Dict[str, Any]:
+    """GamePhaseData -> dict, with the state fields to_saved_game_format adds."""
+    phase = phase_data.to_dict()
+    phase["state"]["game_id"] = game.game_id
+    phase["state"]["map"] = game.map_name
+    phase["state"]["rules"] = rules
+    return phase
+
+
+class GameOutputStream:
+    """Appends the header, each completed phase and the final state of a game to a JSONL file."""
+
+    def __init__(self, path: str, game: Any):
+        self.path = path
+        self.game = game
+        self.rules = [rule for rule in game.rules if rule not in RULES_TO_SKIP]
+        self.phases_written = 0
+        self._file = open(path, "w", encoding="utf-8")
+        self._write({"type": "header", "id": game.game_id, "map": game.map_name, "rules": self.rules})
+        logger.info(f"Streaming game output to {path}")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def write_phase(self, phase_name: str, agent_relationships: Optional[Dict[str, Any]] = None) -> None:
+        """Appends a processed phase (state, orders, results, messages, summary) from the game's history."""
+        phase = phase_to_dict(self.game, self.game.get_phase_from_history(phase_name), self.rules)
+        if agent_relationships is not None:
+            phase["agent_relationships"] = agent_relationships
+        self._write({"type": "phase", "phase": phase})
+        self.phases_written += 1
+
+    def write_final(self, final_agent_states: Dict[str, Any]) -> None:
+        """Appends the current (unprocessed) phase, every phase summary and the final agent states."""
+        self._write({
+            "type": "final",
+            "phase": phase_to_dict(self.game, self.game.get_phase_data(), self.rules),
+            "phase_summaries": dict(getattr(self.game, "phase_summaries", {})),
+            "final_agent_states": final_agent_states,
+        })
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def iter_game_stream(path: str) -> Iterator[Dict[str, Any]]:
+    """Yields the records of a game stream; a truncated last line (crash mid-write) is skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"{path}:{line_number}: skipping unreadable record (truncated write?)")
+
+
+def _read_final(path: str) -> Optional[Dict[str, Any]]:
+    final = None
+    for record in iter_game_stream(path):
+        if record.get("type") == "final":
+            final = record
+    return final
+
+
+def compact_game_stream(stream_path: str, output_path: str) -> int:
+    """
+    Writes the lmvsgame.json for a game stream; returns the number of phases written.
+    The output is what json.dump(saved_game, f, indent=4) produced at the end of lm_game.py.
+    """
+    final = _read_final(stream_path)
+    phase_summaries = final["phase_summaries"] if final else {}
+    header = None
+    phase_count = 0
+    collected_summaries: Dict[str, str] = {}
+
+    def prepare(phase: Dict[str, Any]) -> str:
+        name = phase.get("name")
+        if name in phase_summaries:
+            phase["summary"] = phase_summaries[name]
+        elif phase.get("summary"):
+            collected_summaries[name] = phase["summary"]
+        return textwrap.indent(json.dumps(phase, indent=4), " " * 8)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, "w") as out:
+        for record in iter_game_stream(stream_path):
+            kind = record.get("type")
+            if kind == "header":
+                header = record
+                out.write("{\n")
+                for key in ("id", "map", "rules"):
+                    out.write(f'    {json.dumps(key)}: {textwrap.indent(json.dumps(record[key], indent=4), "    ").lstrip()},\n')
+                out.write('    "phases": [')
+            elif kind == "phase" and header is not None:
+                out.write(",\n" if phase_count else "\n")
+                out.write(prepare(record["phase"]))
+                phase_count += 1
+        if header is None:
+            raise ValueError(f"{stream_path}: no header record, not a game stream")
+        if final is not None:
+            out.write(",\n" if phase_count else "\n")
+            out.write(prepare(final["phase"]))
+            phase_count += 1
+        out.write("\n    ]" if phase_count else "]")
+        summaries = phase_summaries if final is not None else collected_summaries
+        final_agent_states = final["final_agent_states"] if final is not None else {}
+        for key, value in (("phase_summaries", summaries), ("final_agent_states", final_agent_states)):
+            out.write(f',\n    {json.dumps(key)}: {textwrap.indent(json.dumps(value, indent=4), "    ").lstrip()}')
+        out.write("\n}")
+    os.replace(tmp_path, output_path)
+    if final is None:
+        logger.warning(f"{stream_path} has no final record (interrupted run); compacted {phase_count} completed phases")
+    logger.info(f"Compacted {stream_path} into {output_path} ({phase_count} phases)")
+    return phase_count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compact a streamed lmvsgame.jsonl into lmvsgame.json.")
+    parser.add_argument("stream", help="Path to lmvsgame.jsonl")
+    parser.add_argument("-o", "--output", help="Output path (default: the stream path with a .json extension)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    output = args.output or os.path.splitext(args.stream)[0] + ".json"
+    compact_game_stream(args.stream, output)
+
+
+if __name__ == "__main__":
+    main()
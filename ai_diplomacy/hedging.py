@@ -0,0 +1,200 @@
+"""
+Hedged requests and per-call deadlines for LLM calls.
+
+run_llm_and_log hands every call to hedged_call(). With the default
+configuration this is a plain await. When configured (see the --hedge_* and
+--llm_deadlines flags in lm_game.py):
+
+  - Hedging: if the primary request has not finished after the p-th percentile
+    of recent latencies for that (model, response_type), a duplicate request is
+    sent to the same model or to a configured secondary model. Whichever finishes
+    first wins and the other is cancelled.
+  - Deadlines: if no request has finished by the response_type's deadline, all
+    of them are cancelled and "" is returned, so callers use their usual
+    fallbacks (e.g. fallback_orders).
+
+Outcomes are counted per model in the run's model_error_stats as
+hedges_fired, hedges_won and deadline_timeouts. lm_game.py registers that dict
+through model_error_stats_var.
+"""
+import asyncio
+import logging
+import math
+import time
+import weakref
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from .telemetry import note_hedge, note_status
+
+logger = logging.getLogger(__name__)
+
+# The running game's model_error_stats (a ContextVar so concurrent games keep separate stats)
+model_error_stats_var: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar("model_error_stats", default=None)
+
+
+def _count(model_name: str, key: str) -> None:
+    stats = model_error_stats_var.get()
+    if stats is None:
+        return
+    stats[model_name].setdefault(key, 0)
+    stats[model_name][key] += 1
+
+
+class HedgingPolicy:
+    """Process-wide hedging/deadline configuration plus the latency history it is based on."""
+
+    def __init__(self):
+        self.hedge_percentile = 0.0  # 0 disables hedging
+        self.min_samples = 5
+        self.min_hedge_delay = 1.0
+        self.deadlines: Dict[str, float] = {}
+        self.secondary_models: Dict[str, str] = {}
+        # One secondary per primary client (i.e. per power and game): the secondary carries its primary's
+        # system prompt and max_tokens, so two powers must never share one
+        self._secondary_clients: "weakref.WeakKeyDictionary[object, object]" = weakref.WeakKeyDictionary()
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = defaultdict(lambda: deque(maxlen=200))
+
+    def configure(
+        self,
+        hedge_percentile: float = 0.0,
+        min_hedge_delay: float = 1.0,
+        min_samples: int = 5,
+        deadlines: Optional[Dict[str, float]] = None,
+        secondary_models: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.deadlines = dict(deadlines or {})
+        self.secondary_models = dict(secondary_models or {})
+        self._secondary_clients.clear()
+
+    def record_latency(self, model_name: str, response_type: str, seconds: float) -> None:
+        self._latencies[(model_name, response_type)].append(seconds)
+
+    def hedge_delay(self, model_name: str, response_type: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off or there is too little history."""
+        if self.hedge_percentile <= 0:
+            return None
+        samples = self._latencies.get((model_name, response_type))
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(self.hedge_percentile * len(ordered)) - 1))
+        return max(self.min_hedge_delay, ordered[index])
+
+    def deadline(self, response_type: str) -> Optional[float]:
+        return self.deadlines.get(response_type, self.deadlines.get("default"))
+
+    def hedge_client_for(self, client):
+        """The client used for the duplicate request: the configured secondary, else the primary itself."""
+        secondary_id = self.secondary_models.get(client.model_name)
+        if not secondary_id:
+            return client
+        if client not in self._secondary_clients:
+            from .clients import load_model_client  # Local import: clients imports utils, which imports us
+            try:
+                self._secondary_clients[client] = load_model_client(secondary_id)
+            except Exception as e:
+                logger.error(f"Could not load secondary model {secondary_id} for {client.model_name}: {e}")
+                self._secondary_clients[client] = None  # Hedge to the primary; a weak key must not map to itself
+        secondary = self._secondary_clients[client]
+        if secondary is None:
+            return client
+        # The hedge must answer the same prompt as the primary
+        secondary.system_prompt = client.system_prompt
+        secondary.max_tokens = client.max_tokens
+        return secondary
+
+
+hedging = HedgingPolicy()
+
+
+def configure_hedging(**kwargs) -> None:
+    """Configures the shared policy; see HedgingPolicy.configure."""
+    hedging.configure(**kwargs)
+
+
+def parse_key_values(spec: str, value_type=str) -> Dict[str, object]:
+    """Parses "a=1,b=2" style CLI values."""
+    result = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid entry '{item}'; expected key=value")
+        result[key.strip()] = value_type(value.strip())
+    return result
+
+
+async def hedged_call(
+    client,
+    response_type: str,
+    attempt: Callable[[object], Awaitable[str]],
+    deadline: Optional[float] = None,
+) -> Tuple[str, object]:
+    """
+    Runs attempt(client) with optional hedging and a deadline.
+    Returns (response, client_that_answered). Exceptions from the primary are
+    re-raised if no other request succeeded.
+    """
+    deadline = deadline if deadline is not None else hedging.deadline(response_type)
+    hedge_delay = hedging.hedge_delay(client.model_name, response_type)
+    start = time.monotonic()
+
+    if deadline is None and hedge_delay is None:
+        response = await attempt(client)
+        hedging.record_latency(client.model_name, response_type, time.monotonic() - start)
+        return response, client
+
+    tasks: Dict[asyncio.Task, object] = {asyncio.create_task(attempt(client)): client}
+    hedge_task = None
+    first_error: Optional[BaseException] = None
+    try:
+        while tasks:
+            now = time.monotonic() - start
+            waits = []
+            if hedge_task is None and hedge_delay is not None:
+                waits.append(hedge_delay - now)
+            if deadline is not None:
+                waits.append(deadline - now)
+            timeout = max(0.0, min(waits)) if waits else None
+
+            done, _ = await asyncio.wait(tasks.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                answered_by = tasks.pop(task)
+                if task.exception() is not None:
+                    first_error = first_error or task.exception()
+                    continue
+                latency = time.monotonic() - start
+                hedging.record_latency(answered_by.model_name, response_type, latency)
+                if task is hedge_task:
+                    _count(client.model_name, "hedges_won")
+                    logger.info(f"[{client.model_name}] Hedged {response_type} request won via {answered_by.model_name} after {latency:.1f}s")
+                return task.result(), answered_by
+
+            elapsed = time.monotonic() - start
+            if deadline is not None and elapsed >= deadline:
+                _count(client.model_name, "deadline_timeouts")
+                note_status("timeout")
+                logger.warning(f"[{client.model_name}] {response_type} call exceeded its {deadline:g}s deadline; falling back.")
+                return "", client
+            if hedge_task is None and hedge_delay is not None and elapsed >= hedge_delay:
+                hedge_client = hedging.hedge_client_for(client)
+                hedge_task = asyncio.create_task(attempt(hedge_client))
+                tasks[hedge_task] = hedge_client
+                _count(client.model_name, "hedges_fired")
+                note_hedge()
+                logger.info(f"[{client.model_name}] {response_type} still pending after {elapsed:.1f}s; hedging with {hedge_client.model_name}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            # Let the losers unwind (close their streams, release rate-limiter slots, finish telemetry) before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Every request failed
+    if first_error is not None:
+        raise first_error
+    return "", client
@@ -11,6 +11,7 @@ if False: # TYPE_CHECKING
 from .agent import ALL_POWERS, ALLOWED_RELATIONSHIPS
 from .utils import run_llm_and_log, log_llm_response
 from .prompt_constructor import build_context_prompt
+from .phase_context import get_phase_context
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +40,9 @@ async def initialize_agent_state_ext(
                          f"IMPORTANT: For each relationship, you MUST use exactly one of the following labels: {allowed_labels_str}. " \
                          f"Format your response as a JSON object with two keys: 'initial_goals' (a list of strings) and 'initial_relationships' (a dictionary mapping power names to one of the allowed relationship strings)."
 
-        board_state = game.get_state() if game else {}
-        possible_orders = game.get_all_possible_orders() if game else {}
+        phase_context = get_phase_context(game) if game else None
+        board_state = phase_context.board_state if phase_context else {}
+        possible_orders = phase_context.all_possible_orders if phase_context else {}
 
         logger.debug(f"[{power_name}] Preparing context for initial state. Board state type: {type(board_state)}, possible_orders type: {type(possible_orders)}, game_history type: {type(game_history)}")
         # Ensure agent.client and its methods can handle None for game/board_state/etc. if that's a possibility
@@ -57,6 +59,8 @@ async def initialize_agent_state_ext(
             agent_goals=None, 
             agent_relationships=None, 
             agent_private_diary=formatted_diary, 
+            token_budget=agent.client.prompt_token_budget,
+            reserved_text=agent.client.system_prompt + initial_prompt,
         )
         full_prompt = initial_prompt + "\n\n" + context
 
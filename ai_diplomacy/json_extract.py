@@ -0,0 +1,307 @@
+"""
+Single-pass extraction of JSON objects from LLM responses.
+
+LLM outputs wrap their JSON in many ways: fenced ```json blocks, a
+"PARSABLE OUTPUT:" marker, ```{{ ... }}``` templates, bare objects in the
+middle of long reasoning text, or an object truncated at max_tokens.
+Instead of trying one regex per format over the whole response, scan_json_candidates()
+walks the text once: prose is skipped with str.find and only the structural
+characters inside objects ({, }, quotes, backslashes, ``` fences) are visited,
+with a single precompiled pattern. It yields every balanced top-level object
+together with where it was found. Parsing then
+tries json, a light cleanup (comments, trailing commas, single-quoted keys) and
+json_repair, in that order, per candidate.
+
+Used by DiplomacyAgent._extract_json_from_text and BaseModelClient._extract_moves;
+JsonStreamDetector applies the same scan to streamed responses.
+benchmark_json_extraction.py compares it with the previous regex cascades on
+recorded llm_responses.csv files.
+"""
+import ast
+import json
+import logging
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator, List, Optional
+
+import json_repair
+
+logger = logging.getLogger(__name__)
+
+# The characters the scanner has to look at inside an object
+_OBJECT_TOKEN_RE = re.compile(r'[{}"\\`]')
+_MARKER_RE = re.compile(r"(?:PARSABLE OUTPUT\W*|JSON:\s*)$", re.IGNORECASE)
+_MARKER_LOOKBACK = 40
+
+# Cleanup applied only when plain json.loads fails
+_STRING_OR_COMMENT_RE = re.compile(r'"(?:[^"\\]|\\.)*"|//[^\n]*|/\*.*?\*/', re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SINGLE_QUOTED_KEY_RE = re.compile(r"'(\w+)'\s*:")
+_ORDERS_LIST_RE = re.compile(r'["\']orders["\']\s*:\s*\[([^\]]*)\]')
+
+
+@dataclass
+class JsonCandidate:
+    text: str
+    start: int
+    fenced: bool = False  # inside a ``` block
+    after_marker: bool = False  # right after "PARSABLE OUTPUT:" / "JSON:"
+    complete: bool = True  # False for an object still open at the end of the text
+
+    @property
+    def priority(self) -> int:
+        return 0 if self.after_marker else 1 if self.fenced else 2 if self.complete else 3
+
+
+def scan_json_candidates(text: str) -> List[JsonCandidate]:
+    """
+    Returns every top-level {...} object in `text`, in document order, in one
+    linear pass. Prose between objects is skipped with str.find; inside an
+    object only braces, quotes, backslashes and backticks are visited, so braces
+    inside JSON strings are ignored. A ``` fence while an object is open
+    abandons that object (the model never closed it).
+    """
+    candidates: List[JsonCandidate] = []
+    if not text:
+        return candidates
+    fences = []
+    fence = text.find("```")
+    while fence != -1:
+        fences.append(fence)
+        fence = text.find("```", fence + 3)
+
+    pos = text.find("{")
+    while pos != -1:
+        start, depth, in_string, skip_until = pos, 0, False, -1
+        resume = None
+        nested = []  # depth-2 objects, used if this one never closes (e.g. a stray "{" in prose)
+        for match in _OBJECT_TOKEN_RE.finditer(text, start):
+            at = match.start()
+            if at < skip_until:
+                continue
+            token = match.group()
+            if token == "`":
+                if text.startswith("```", at):
+                    resume = at + 3
+                    break
+            elif in_string:
+                if token == "\\":
+                    skip_until = at + 2  # the escaped character can't end the string
+                elif token == '"':
+                    in_string = False
+            elif token == '"':
+                in_string = True
+            elif token == "{":
+                depth += 1
+                if depth == 2:
+                    nested_start = at
+            elif token == "}":
+                depth -= 1
+                if depth == 1:
+                    nested.append((nested_start, at + 1))
+                elif depth == 0:
+                    candidates.append(_candidate(text, start, at + 1, fences))
+                    resume = at + 1
+                    break
+        if resume is None:
+            # Still open at the end of the text, e.g. cut off by max_tokens
+            candidates.extend(_candidate(text, a, b, fences) for a, b in nested)
+            candidates.append(_candidate(text, start, len(text), fences, complete=False))
+            break
+        pos = text.find("{", resume)
+    return candidates
+
+
+def _candidate(text: str, start: int, end: int, fences: List[int], complete: bool = True) -> JsonCandidate:
+    prefix = text[max(0, start - _MARKER_LOOKBACK):start]
+    return JsonCandidate(
+        text=text[start:end],
+        start=start,
+        fenced=bisect_right(fences, start) % 2 == 1,
+        after_marker=bool(_MARKER_RE.search(prefix)),
+        complete=complete,
+    )
+
+
+def clean_json_text(text: str) -> str:
+    """Strips comments (outside strings), trailing commas and quotes single-quoted keys."""
+    text = text.replace("\ufeff", "").replace("\u200b", "")
+    text = _STRING_OR_COMMENT_RE.sub(lambda m: m.group() if m.group().startswith('"') else "", text)
+    text = _TRAILING_COMMA_RE.sub(r"\1", text)
+    text = _SINGLE_QUOTED_KEY_RE.sub(r'"\1":', text)
+    return text.strip()
+
+
+def loads_lenient(text: str) -> Any:
+    """json.loads, then json.loads after clean_json_text, then json_repair. Raises ValueError if all fail."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    cleaned = clean_json_text(text)
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+    try:
+        result = json_repair.loads(cleaned)
+    except Exception as e:
+        raise ValueError(f"json_repair failed: {e}") from e
+    # json_repair returns "" for text it cannot make sense of
+    if result == "" and cleaned:
+        raise ValueError("json_repair could not parse the candidate")
+    return result
+
+
+def iter_json_objects(text: str, required_key: Optional[str] = None) -> Iterator[dict]:
+    """
+    Parsed dicts from `text`, most explicit candidates first (marker, fenced, bare, truncated).
+    With `required_key`, only dicts containing that key are yielded, and candidates whose
+    text does not even mention it are skipped without parsing (e.g. "{like this}" in prose,
+    which would otherwise go through json_repair).
+    """
+    for candidate in sorted(scan_json_candidates(text), key=lambda c: (c.priority, c.start)):
+        body = candidate.text
+        if required_key is not None and required_key not in body:
+            continue
+        # ```{{ ... }}``` templates: unwrap one brace level
+        if body.startswith("{{") and body.endswith("}}"):
+            body = body[1:-1]
+        try:
+            result = loads_lenient(body)
+        except ValueError as e:
+            logger.debug(f"JSON candidate at offset {candidate.start} did not parse: {e}")
+            continue
+        if isinstance(result, dict) and (required_key is None or required_key in result):
+            yield result
+
+
+def extract_json_object(text: str, required_key: Optional[str] = None) -> Optional[dict]:
+    """The first dict in `text` (containing `required_key`, if given), or None."""
+    return next(iter_json_objects(text, required_key), None)
+
+
+def extract_orders(text: str) -> Optional[List[str]]:
+    """
+    The "orders" list from an order-generation response, or None. Falls back to
+    reading a bare "orders": [...] list when no surrounding object parses.
+    """
+    data = extract_json_object(text, required_key="orders")
+    if data is not None:
+        return data.get("orders")
+    match = _ORDERS_LIST_RE.search(text)
+    if match:
+        try:
+            moves = ast.literal_eval("[" + match.group(1).strip() + "]")
+            if isinstance(moves, list):
+                return moves
+        except (ValueError, SyntaxError) as e:
+            logger.debug(f"Bare orders list did not parse: {e}")
+    return None
+
+
+
+class JsonStreamDetector:
+    """
+    Incremental counterpart of scan_json_candidates for streamed responses.
+
+    feed() takes the response chunk by chunk and returns True once the first
+    object after a "PARSABLE OUTPUT:" / "JSON:" marker has closed and parses
+    to a dict containing one of `stop_keys`. That object is what
+    iter_json_objects / extract_orders would pick from the full response
+    (marker candidates come first, in document order), so nothing the model
+    writes after it can change the parsed result. If the first marker object
+    does not qualify, detection stops and the response is read to the end.
+    Like the scanner, only braces, quotes, backslashes and backticks inside
+    objects are visited and state carries across chunk boundaries, so the cost
+    is linear in the response length.
+    """
+
+    def __init__(self, stop_keys: Iterable[str]):
+        self.stop_keys = tuple(stop_keys)
+        self.result: Optional[dict] = None
+        self.done = False  # a result was found, or the first marker object did not qualify
+        self._offset = 0  # chars consumed before the current chunk
+        self._before = ""  # the last _MARKER_LOOKBACK chars before the scan position
+        self._parts: List[str] = []  # text of the open object
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False  # the previous chunk ended on a backslash inside a string
+        self._tick_run = 0
+        self._last_tick = -2
+        self._after_marker = False
+
+    def feed(self, chunk: str) -> bool:
+        """Consumes the next chunk; True once the response can be cut after the parsable object."""
+        pos = 0
+        while not self.done and pos < len(chunk):
+            if self._depth == 0:
+                brace = chunk.find("{", pos)
+                end = brace if brace != -1 else len(chunk)
+                self._before = (self._before + chunk[pos:end])[-_MARKER_LOOKBACK:]
+                if brace == -1:
+                    break
+                self._after_marker = bool(_MARKER_RE.search(self._before))
+                pos = brace
+            pos = self._scan_object(chunk, pos)
+        self._offset += len(chunk)
+        return self.result is not None
+
+    def _scan_object(self, chunk: str, start: int) -> int:
+        """Scans chunk[start:] inside an object; returns where the search for the next object resumes."""
+        skip_until = -1
+        if self._escaped:
+            self._escaped = False
+            skip_until = start + 1
+        for match in _OBJECT_TOKEN_RE.finditer(chunk, start):
+            at = match.start()
+            if at < skip_until:
+                continue
+            token = match.group()
+            if token == "`":
+                absolute = self._offset + at
+                self._tick_run = self._tick_run + 1 if absolute == self._last_tick + 1 else 1
+                self._last_tick = absolute
+                if self._tick_run == 3:
+                    # A fence while the object is open abandons it, as in scan_json_candidates
+                    abandoned = "".join(self._parts) + chunk[start:at + 1]
+                    self._before = abandoned[-_MARKER_LOOKBACK:]
+                    self._depth, self._in_string, self._parts = 0, False, []
+                    return at + 1
+            elif self._in_string:
+                if token == "\\":
+                    skip_until = at + 2
+                    self._escaped = skip_until > len(chunk)
+                elif token == '"':
+                    self._in_string = False
+            elif token == '"':
+                self._in_string = True
+            elif token == "{":
+                self._depth += 1
+            elif token == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    body = "".join(self._parts) + chunk[start:at + 1]
+                    self._parts = []
+                    self._before = body[-_MARKER_LOOKBACK:]
+                    if self._after_marker:
+                        self._check(body)
+                    return at + 1
+        self._parts.append(chunk[start:])
+        return len(chunk)
+
+    def _check(self, body: str) -> None:
+        self.done = True
+        if body.startswith("{{") and body.endswith("}}"):
+            body = body[1:-1]
+        try:
+            result = json.loads(body)
+        except json.JSONDecodeError:
+            try:
+                result = json.loads(clean_json_text(body))
+            except json.JSONDecodeError:
+                # json_repair may still read it, but only from the complete response
+                return
+        if isinstance(result, dict) and any(key in result for key in self.stop_keys):
+            self.result = result
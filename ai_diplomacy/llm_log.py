@@ -0,0 +1,276 @@
+"""
+Buffered background writer for the LLM response log (llm_responses.csv).
+
+utils.log_llm_response is called after every LLM call with the full prompt and
+response. When a writer is registered for the log path (lm_game.py starts one
+per game), that call only puts the row on an asyncio.Queue. One background task
+batches rows, flushing when a batch reaches max_batch_rows / max_batch_bytes or
+flush_interval seconds have passed, and writes each batch from a worker thread.
+
+Formats (--llm_log_format):
+  csv       plain llm_responses.csv, same as before (default; read by the analysis scripts)
+  csv.gz    gzip CSV          llm_responses.csv.gz
+  jsonl.gz  gzip JSON lines   llm_responses.jsonl.gz
+  csv.xz / jsonl.xz  LZMA; its multi-MB dictionary spans many calls, so repeated
+                     prompt context is stored once per window (typically >10x smaller)
+
+With rotate_mb > 0, compressed logs are split into numbered segments
+(llm_responses.00000.jsonl.gz, ...). gzip output is flushed after every batch.
+xz segments are only complete once rotated or closed. aclose() drains the queue
+at shutdown; an atexit hook writes anything still queued if the event loop
+died first.
+
+iter_llm_log_rows() reads every format and segment back in order.
+"""
+import asyncio
+import atexit
+import csv
+import glob
+import gzip
+import io
+import json
+import logging
+import lzma
+import os
+import re
+import sys
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FIELDNAMES = ["model", "power", "phase", "response_type", "raw_input", "raw_response", "success"]
+LOG_FORMATS = ("csv", "csv.gz", "csv.xz", "jsonl", "jsonl.gz", "jsonl.xz")
+
+_STOP = object()
+_SEGMENT_RE = re.compile(r"\.(\d{5})\.(csv|jsonl)(\.gz|\.xz)?$")
+
+
+def _open_text(path: str, mode: str):
+    """Opens a plain, .gz or .xz file in text mode ("r" or "a")."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    if path.endswith(".xz"):
+        return lzma.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+class LLMResponseLogWriter:
+    """Queue-fed writer for one game's LLM response log."""
+
+    def __init__(
+        self,
+        log_file_path: str,
+        fmt: str = "csv",
+        max_batch_rows: int = 256,
+        max_batch_bytes: int = 4 * 1024 * 1024,
+        flush_interval: float = 2.0,
+        rotate_mb: float = 0,
+    ):
+        if fmt not in LOG_FORMATS:
+            raise ValueError(f"Unknown LLM log format '{fmt}'; expected one of {', '.join(LOG_FORMATS)}")
+        self.log_file_path = log_file_path
+        self.fmt = fmt
+        self.max_batch_rows = max_batch_rows
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        # Plain CSV stays a single file so existing readers keep working
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024) if fmt != "csv" else 0
+        self.base_path = os.path.splitext(log_file_path)[0] if log_file_path.endswith(".csv") else log_file_path
+        self.rows_written = 0
+        self._segment_index = 0
+        self._segment_bytes = 0
+        self._handle = None
+        self._csv_writer = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        log_dir = os.path.dirname(log_file_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        if self.rotate_bytes:
+            # A resumed game (lm_game.py --resume) continues after the segments it already wrote
+            while os.path.exists(self._segment_path()):
+                self._segment_index += 1
+
+    # -- hot path ----------------------------------------------------------
+    def submit(self, row: Dict[str, str]) -> None:
+        """Queues one row; never blocks or touches the disk."""
+        if self._closed:
+            self._write_batch([row])
+            return
+        self._queue.put_nowait(row)
+
+    # -- lifecycle ---------------------------------------------------------
+    def start(self) -> "LLMResponseLogWriter":
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"llm-log-writer:{self.log_file_path}")
+        return self
+
+    async def aclose(self) -> None:
+        """Writes everything still queued and closes the current segment."""
+        if self._closed:
+            return
+        if self._task is not None and not self._task.done():
+            self._queue.put_nowait(_STOP)
+            await self._task
+        self._closed = True
+        self._drain_sync()
+        await asyncio.to_thread(self._close_segment)
+
+    def _drain_sync(self) -> None:
+        rows = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not _STOP:
+                rows.append(row)
+        if rows:
+            self._write_batch(rows)
+
+    def close_sync(self) -> None:
+        """Last-chance flush for interpreter shutdown (see atexit below)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._drain_sync()
+        self._close_segment()
+
+    # -- background task ---------------------------------------------------
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            batch_bytes = len(row.get("raw_input") or "") + len(row.get("raw_response") or "")
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch_rows and batch_bytes < self.max_batch_bytes:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        row = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    row = self._queue.get_nowait()
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+                batch_bytes += len(row.get("raw_input") or "") + len(row.get("raw_response") or "")
+            await asyncio.to_thread(self._write_batch, batch)
+
+    # -- file handling (runs in a worker thread) ---------------------------
+    def _segment_path(self) -> str:
+        if self.fmt == "csv":
+            return self.log_file_path
+        if self.rotate_bytes:
+            return f"{self.base_path}.{self._segment_index:05d}.{self.fmt}"
+        return f"{self.base_path}.{self.fmt}"
+
+    def _open_segment(self) -> None:
+        path = self._segment_path()
+        is_new = not os.path.isfile(path) or os.path.getsize(path) == 0
+        # Appending to a compressed file adds a new member/stream, which readers handle transparently
+        self._handle = _open_text(path, "a")
+        self._segment_bytes = 0
+        if self.fmt.startswith("csv"):
+            self._csv_writer = csv.DictWriter(self._handle, fieldnames=FIELDNAMES)
+            if is_new:
+                self._csv_writer.writeheader()
+
+    def _close_segment(self) -> None:
+        if self._handle is not None:
+            try:
+                self._handle.close()
+            except Exception as e:
+                logger.error(f"Failed to close LLM log segment {self._segment_path()}: {e}")
+            self._handle = None
+            self._csv_writer = None
+
+    def _write_batch(self, rows: List[Dict[str, str]]) -> None:
+        try:
+            if self._handle is None:
+                self._open_segment()
+            if self._csv_writer is not None:
+                buffer = io.StringIO()
+                csv.DictWriter(buffer, fieldnames=FIELDNAMES).writerows(rows)
+                data = buffer.getvalue()
+            else:
+                data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            self._handle.write(data)
+            self._handle.flush()
+            self.rows_written += len(rows)
+            self._segment_bytes += len(data)
+            if self.rotate_bytes and self._segment_bytes >= self.rotate_bytes:
+                self._close_segment()
+                self._segment_index += 1
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} LLM log rows to {self._segment_path()}: {e}", exc_info=True)
+
+
+_writers: Dict[str, LLMResponseLogWriter] = {}
+
+
+def start_llm_log_writer(log_file_path: str, **kwargs) -> LLMResponseLogWriter:
+    """Creates and starts the writer for `log_file_path`; must be called inside the running loop."""
+    writer = LLMResponseLogWriter(log_file_path, **kwargs).start()
+    _writers[os.path.abspath(log_file_path)] = writer
+    return writer
+
+
+def get_llm_log_writer(log_file_path: str) -> Optional[LLMResponseLogWriter]:
+    writer = _writers.get(os.path.abspath(log_file_path))
+    return writer if writer is not None and not writer._closed else None
+
+
+async def close_llm_log_writer(log_file_path: str) -> None:
+    writer = _writers.pop(os.path.abspath(log_file_path), None)
+    if writer is not None:
+        await writer.aclose()
+        logger.info(f"LLM log: {writer.rows_written} rows written ({writer.fmt}) for {log_file_path}")
+
+
+@atexit.register
+def _flush_writers_at_exit() -> None:
+    for writer in list(_writers.values()):
+        writer.close_sync()
+
+
+def find_llm_log_files(path: str) -> List[str]:
+    """
+    All files of an LLM response log in read order. `path` may be a results
+    directory, the llm_responses.csv path, or any one segment.
+    """
+    if os.path.isdir(path):
+        base = os.path.join(path, "llm_responses")
+    else:
+        base = path
+        match = _SEGMENT_RE.search(base)
+        if match:
+            base = base[: match.start()]
+        else:
+            for fmt in sorted(LOG_FORMATS, key=len, reverse=True):
+                if base.endswith("." + fmt):
+                    base = base[: -len(fmt) - 1]
+                    break
+    files = [f"{base}.{fmt}" for fmt in LOG_FORMATS if os.path.isfile(f"{base}.{fmt}")]
+    files += sorted(f for f in glob.glob(glob.escape(base) + ".[0-9][0-9][0-9][0-9][0-9].*") if _SEGMENT_RE.search(f))
+    return files
+
+
+def iter_llm_log_rows(path: str) -> Iterator[Dict[str, str]]:
+    """Yields the rows of an LLM response log in any supported format."""
+    # Recorded prompts/responses routinely exceed the csv module's default field limit
+    csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+    for file_path in find_llm_log_files(path):
+        with _open_text(file_path, "r") as f:
+            if ".jsonl" in os.path.basename(file_path):
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(f)
@@ -6,17 +6,24 @@ Usage: simply import `ai_diplomacy.narrative` *before* the game loop starts
 `diplomacy.engine.game.Game._generate_phase_summary` so that:
 
 1. The original (statistical) summary logic still runs.
-2. The returned text is stored in `GamePhaseData.statistical_summary`.
-3. A short narrative is produced via OpenAI `o3` and saved as the main
-   `.summary`.
+2. The returned text is stored in `GamePhaseData.statistical_summary` and, for
+   now, as the phase summary.
+
+The narrative itself is no longer produced inside `game.process()`. After
+processing, the game loop calls `schedule_phase_narrative()`, which asks the
+OpenAI model for a short narrative on a background task using the pooled async
+client. When it finishes, the narrative replaces the statistical text in
+`game.phase_summaries` (and `GamePhaseData.summary`). Consumers that need the
+narrative await `get_phase_summary()`; `wait_for_narratives()` flushes all
+pending work before the game is saved.
 """
 from __future__ import annotations
 
 import logging
 import os
-from typing import Callable
+import asyncio
+from typing import Callable, Dict, Optional, Tuple
 
-from openai import OpenAI  # Import the new OpenAI client
 from diplomacy.engine.game import Game
 
 LOGGER = logging.getLogger(__name__)
@@ -24,17 +31,20 @@ LOGGER = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
-OPENAI_MODEL = os.getenv("AI_DIPLOMACY_NARRATIVE_MODEL", "gpt-o3")
+OPENAI_MODEL = os.getenv("AI_DIPLOMACY_NARRATIVE_MODEL", "o3")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 if not OPENAI_API_KEY:
     LOGGER.warning("OPENAI_API_KEY not set – narrative summaries will be stubbed.")
 
+# Pending narrative tasks keyed by (id(game), phase_key)
+_pending: Dict[Tuple[int, str], asyncio.Task] = {}
+
 # ---------------------------------------------------------------------------
-# Helper to call the model synchronously
+# Helper to call the model asynchronously
 # ---------------------------------------------------------------------------
 
-def _call_openai(statistical_summary: str, phase_key: str) -> str:
+async def _call_openai(statistical_summary: str, phase_key: str) -> str:
     """Return a 2–4 sentence spectator-friendly narrative."""
     if not OPENAI_API_KEY:
         return "(Narrative generation disabled – missing API key)."
@@ -47,12 +57,12 @@ def _call_openai(statistical_summary: str, phase_key: str) -> str:
     user = f"PHASE {phase_key}\n\nSTATISTICAL SUMMARY:\n{statistical_summary}\n\nNow narrate this phase for spectators."
 
     try:
-        # Initialize the OpenAI client with the API key
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        
-        # Use the new API format
-        resp = client.chat.completions.create(
-            model="o3",
+        # Shared, pooled async client (see client_pool.py)
+        from .client_pool import get_async_openai
+        client = get_async_openai(api_key=OPENAI_API_KEY)
+
+        resp = await client.chat.completions.create(
+            model=OPENAI_MODEL,
             messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
         )
         return resp.choices[0].message.content.strip()
@@ -73,7 +83,6 @@ def _patched_generate_phase_summary(self: Game, phase_key, summary_callback=None
     LOGGER.debug(f"[{phase_key}] Original summary returned: {statistical!r}")
 
     # 2) Persist statistical summary separately
-    phase_data = None
     try:
         phase_data = self.get_phase_from_history(str(phase_key))
         if hasattr(phase_data, "statistical_summary"):
@@ -84,22 +93,62 @@ def _patched_generate_phase_summary(self: Game, phase_key, summary_callback=None
     except Exception as exc:
         LOGGER.warning("Could not retrieve phase_data or store statistical_summary for %s: %s", phase_key, exc)
 
-    # 3) Generate narrative summary
-    narrative = _call_openai(statistical, phase_key)
+    # 3) The narrative is generated asynchronously by schedule_phase_narrative()
+    return statistical
+
+
+async def _generate_and_store(game: Game, phase_key: str, statistical: str, phase_data=None) -> str:
+    narrative = await _call_openai(statistical, phase_key)
 
-    # 4) Save narrative as the canonical summary
+    # Save narrative as the canonical summary
     try:
-        if phase_data:
+        game.phase_summaries[phase_key] = narrative  # type: ignore[attr-defined]
+        if phase_data is not None:
             phase_data.summary = narrative  # type: ignore[attr-defined]
-            self.phase_summaries[str(phase_key)] = narrative  # type: ignore[attr-defined]
-            LOGGER.debug(f"[{phase_key}] Narrative summary stored successfully.")
-        else:
-             LOGGER.warning(f"[{phase_key}] Cannot store narrative summary because phase_data is None.")
+        LOGGER.debug(f"[{phase_key}] Narrative summary stored successfully.")
     except Exception as exc:
         LOGGER.warning("Could not store narrative summary for %s: %s", phase_key, exc)
-
     return narrative
 
+
+def schedule_phase_narrative(game: Game, phase_key: str, phase_data=None) -> Optional[asyncio.Task]:
+    """
+    Starts narrative generation for a processed phase in the background.
+    Must be called from the running event loop, after game.process() returned.
+    `phase_data` is the GamePhaseData returned by process(), updated in place when done.
+    """
+    phase_key = str(phase_key)
+    statistical = game.phase_summaries.get(phase_key, "")  # type: ignore[attr-defined]
+    if not statistical:
+        LOGGER.warning(f"[{phase_key}] No statistical summary available; skipping narrative.")
+        return None
+    task = asyncio.create_task(_generate_and_store(game, phase_key, statistical, phase_data))
+    _pending[(id(game), phase_key)] = task
+    return task
+
+
+async def get_phase_summary(game: Game, phase_key: str, default: str = "") -> str:
+    """Returns the phase summary, waiting for its narrative if one is still being generated."""
+    phase_key = str(phase_key)
+    task = _pending.pop((id(game), phase_key), None)
+    if task is not None:
+        await task
+    return game.phase_summaries.get(phase_key, default)  # type: ignore[attr-defined]
+
+
+async def wait_for_narratives(game: Game) -> None:
+    """Waits for every pending narrative of `game` (e.g. before saving it)."""
+    keys = [key for key in _pending if key[0] == id(game)]
+    tasks = [_pending.pop(key) for key in keys]
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def cancel_narratives(game: Game) -> None:
+    """Cancels every pending narrative of `game` (a game that failed; keys are id(game), which may be reused)."""
+    for key in [key for key in _pending if key[0] == id(game)]:
+        _pending.pop(key).cancel()
+
 # Monkey-patch
 Game._generate_phase_summary = _patched_generate_phase_summary  # type: ignore[assignment]
 
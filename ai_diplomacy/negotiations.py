@@ -8,6 +8,7 @@ from diplomacy.engine.message import Message, GLOBAL
 from .agent import DiplomacyAgent
 from .clients import load_model_client
 from .utils import gather_possible_orders, load_prompt
+from .phase_context import get_phase_context
 
 if TYPE_CHECKING:
     from .game_history import GameHistory
@@ -67,7 +68,7 @@ async def conduct_negotiations(
             if not possible_orders:
                 logger.info(f"No orderable locations for {power_name}; skipping message generation.")
                 continue
-            board_state = game.get_state()
+            board_state = get_phase_context(game).board_state
 
             # Append the coroutine to the tasks list
             tasks.append(
@@ -0,0 +1,145 @@
+"""
+Per-phase snapshot of the engine-derived inputs shared by every prompt.
+
+Within one phase the same board is turned into prompt text many times: per
+power, per negotiation round, for orders, plans, diaries and the state update.
+PhaseContext computes each engine-derived piece once, on first use:
+game.get_state(), game.get_all_possible_orders(), each power's possible orders,
+the rich order context for a power, and the units/centers listings used by
+build_context_prompt.
+
+get_phase_context(game) returns the context for the game's current board.
+A context is keyed by the phase name plus the units, retreats and centers of
+every power. Any board change (processing, rollback, set_units) produces a new
+context the next time it is requested. The memoized values are shared between
+callers and must be treated as read-only.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .possible_order_context import generate_rich_order_context, own_unit_orders
+
+logger = logging.getLogger(__name__)
+
+
+def board_key(game: Any) -> Tuple:
+    """Cheap fingerprint of everything the cached values depend on."""
+    return (
+        game.get_current_phase(),
+        tuple(
+            (name, tuple(power.units), tuple(sorted(power.retreats.items())), tuple(power.centers))
+            for name, power in game.powers.items()
+        ),
+    )
+
+
+def format_units_and_centers(game: Any, board_state: dict) -> Tuple[str, str]:
+    """The units and supply-center listings of the context prompt, with eliminated powers marked."""
+    units_lines = []
+    for p, u in board_state["units"].items():
+        if game.powers[p].is_eliminated():
+            units_lines.append(f"  {p}: {u} [ELIMINATED]")
+        else:
+            units_lines.append(f"  {p}: {u}")
+
+    centers_lines = []
+    for p, c in board_state["centers"].items():
+        if game.powers[p].is_eliminated():
+            centers_lines.append(f"  {p}: {c} [ELIMINATED]")
+        else:
+            centers_lines.append(f"  {p}: {c}")
+    return "\n".join(units_lines), "\n".join(centers_lines)
+
+
+class PhaseContext:
+    """Lazily memoized, read-only view of one board position."""
+
+    def __init__(self, game: Any, key: Tuple):
+        self.game = game
+        self.key = key
+        self.phase_name: str = key[0]
+        self._board_state: Optional[dict] = None
+        self._all_possible_orders: Optional[Dict[str, List[str]]] = None
+        self._possible_orders: Dict[str, Dict[str, List[str]]] = {}
+        self._rich_order_context: Dict[Tuple, str] = {}
+        self._units_and_centers: Optional[Tuple[str, str]] = None
+
+    @property
+    def board_state(self) -> dict:
+        if self._board_state is None:
+            self._board_state = self.game.get_state()
+        return self._board_state
+
+    @property
+    def all_possible_orders(self) -> Dict[str, List[str]]:
+        if self._all_possible_orders is None:
+            self._all_possible_orders = self.game.get_all_possible_orders()
+        return self._all_possible_orders
+
+    def possible_orders(self, power_name: str) -> Dict[str, List[str]]:
+        """Orderable location -> valid orders for `power_name` (what gather_possible_orders returns)."""
+        result = self._possible_orders.get(power_name)
+        if result is None:
+            # Game.get_possible_orders is backed by the engine's per-board cache of get_all_possible_orders
+            result = self.game.get_possible_orders(power_name)
+            self._possible_orders[power_name] = result
+        return result
+
+    def own_unit_orders(self, power_name: str) -> Dict[str, List[str]]:
+        """Possible orders for each of power_name's units, orderable this phase or not."""
+        return own_unit_orders(self.board_state, power_name, self.all_possible_orders)
+
+    def rich_order_context(
+        self, power_name: str, possible_orders: Dict[str, List[str]], summarize_other_units: bool = False
+    ) -> str:
+        """generate_rich_order_context for this board, memoized per power and possible-orders set."""
+        cache_key = (
+            power_name,
+            summarize_other_units,
+            tuple((loc, tuple(orders)) for loc, orders in possible_orders.items()),
+        )
+        text = self._rich_order_context.get(cache_key)
+        if text is None:
+            text = generate_rich_order_context(
+                self.game,
+                power_name,
+                possible_orders,
+                board_state=self.board_state,
+                summarize_other_units=summarize_other_units,
+            )
+            self._rich_order_context[cache_key] = text
+        return text
+
+    @property
+    def units_repr(self) -> str:
+        return self._get_units_and_centers()[0]
+
+    @property
+    def centers_repr(self) -> str:
+        return self._get_units_and_centers()[1]
+
+    def _get_units_and_centers(self) -> Tuple[str, str]:
+        if self._units_and_centers is None:
+            self._units_and_centers = format_units_and_centers(self.game, self.board_state)
+        return self._units_and_centers
+
+
+# One current context per live game, keyed by id(game); Game uses __slots__ without weakref support
+_contexts: Dict[int, PhaseContext] = {}
+
+
+def get_phase_context(game: Any) -> PhaseContext:
+    """The PhaseContext for the game's current board, reusing the cached one while the board is unchanged."""
+    key = board_key(game)
+    context = _contexts.get(id(game))
+    if context is None or context.game is not game or context.key != key:
+        context = PhaseContext(game, key)
+        _contexts[id(game)] = context
+    return context
+
+
+def release_phase_context(game: Any) -> None:
+    """Drops the cached context (and its reference to `game`) once a game is finished."""
+    context = _contexts.get(id(game))
+    if context is not None and context.game is game:
+        del _contexts[id(game)]
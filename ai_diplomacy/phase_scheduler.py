@@ -0,0 +1,172 @@
+"""
+Per-phase task-graph executor used by lm_game.py.
+
+A phase is modelled as a set of named nodes (e.g. "orders:FRANCE",
+"process", "state_update:FRANCE") with explicit dependencies. Every node
+starts as soon as all of its own dependencies have finished, so one slow power
+no longer gates every other power at every stage; only nodes that genuinely
+need all powers (negotiation rounds, game.process()) wait for everyone.
+
+Failures follow the existing asyncio.gather(..., return_exceptions=True)
+convention: an exception is logged and recorded on the node, and its
+dependents still run.
+
+Per-node timings and the critical path are available after run() and are
+appended to phase_timings.jsonl by lm_game.py.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from .telemetry import telemetry_scope
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TaskNode:
+    name: str
+    func: Callable[[], Awaitable[Any]]
+    deps: List[str] = field(default_factory=list)
+    stage: str = ""
+    power: Optional[str] = None
+    start: Optional[float] = None
+    end: Optional[float] = None
+    status: str = "pending"  # pending | running | ok | error
+    error: Optional[str] = None
+    result: Any = None
+
+    @property
+    def duration(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class PhaseTaskGraph:
+    """Runs a DAG of async nodes for one game phase and records their timings."""
+
+    def __init__(self, phase_name: str):
+        self.phase_name = phase_name
+        self.nodes: Dict[str, TaskNode] = {}
+        self._origin: Optional[float] = None
+        self.wall_time = 0.0
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        deps: Sequence[str] = (),
+        stage: str = "",
+        power: Optional[str] = None,
+    ) -> str:
+        """Adds a node; `func` is a zero-argument coroutine function. Returns the node name."""
+        if name in self.nodes:
+            raise ValueError(f"Duplicate task node '{name}' in phase {self.phase_name}")
+        self.nodes[name] = TaskNode(name=name, func=func, deps=list(deps), stage=stage or name.split(":", 1)[0], power=power)
+        return name
+
+    def result(self, name: str, default: Any = None) -> Any:
+        node = self.nodes.get(name)
+        return node.result if node is not None and node.status == "ok" else default
+
+    def _validate(self) -> None:
+        for node in self.nodes.values():
+            missing = [dep for dep in node.deps if dep not in self.nodes]
+            if missing:
+                raise ValueError(f"Task node '{node.name}' depends on unknown node(s): {missing}")
+        # Kahn's algorithm to reject cycles before anything starts
+        indegree = {name: len(node.deps) for name, node in self.nodes.items()}
+        dependents: Dict[str, List[str]] = {name: [] for name in self.nodes}
+        for node in self.nodes.values():
+            for dep in node.deps:
+                dependents[dep].append(node.name)
+        ready = [name for name, degree in indegree.items() if degree == 0]
+        visited = 0
+        while ready:
+            current = ready.pop()
+            visited += 1
+            for child in dependents[current]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+        if visited != len(self.nodes):
+            raise ValueError(f"Task graph for phase {self.phase_name} contains a cycle")
+
+    async def run(self) -> None:
+        """Runs every node once all of its dependencies have finished."""
+        self._validate()
+        self._origin = time.monotonic()
+        done_events = {name: asyncio.Event() for name in self.nodes}
+
+        async def _run_node(node: TaskNode) -> None:
+            try:
+                for dep in node.deps:
+                    await done_events[dep].wait()
+                node.status = "running"
+                node.start = time.monotonic() - self._origin
+                # Attributes the node's LLM calls to this phase/stage (task-local, so nodes don't interfere)
+                telemetry_scope.set((self.phase_name, node.stage))
+                node.result = await node.func()
+                node.status = "ok"
+            except Exception as e:
+                node.status = "error"
+                node.error = f"{type(e).__name__}: {e}"
+                logger.error(f"[{self.phase_name}] Task '{node.name}' failed: {e}", exc_info=e)
+            finally:
+                if node.start is None:
+                    node.start = time.monotonic() - self._origin
+                node.end = time.monotonic() - self._origin
+                done_events[node.name].set()
+
+        await asyncio.gather(*(_run_node(node) for node in self.nodes.values()))
+        self.wall_time = time.monotonic() - self._origin
+
+    def critical_path(self) -> List[str]:
+        """
+        The chain of nodes that determined the phase's wall time: starting from the
+        last node to finish, repeatedly follow the dependency that finished last.
+        """
+        finished = [node for node in self.nodes.values() if node.end is not None]
+        if not finished:
+            return []
+        node = max(finished, key=lambda n: n.end)
+        path = [node.name]
+        while node.deps:
+            node = max((self.nodes[dep] for dep in node.deps), key=lambda n: n.end or 0.0)
+            path.append(node.name)
+        return list(reversed(path))
+
+    def timings(self) -> Dict[str, Any]:
+        path = self.critical_path()
+        return {
+            "phase": self.phase_name,
+            "wall_s": round(self.wall_time, 3),
+            "critical_path": path,
+            "critical_path_busy_s": round(sum(self.nodes[name].duration for name in path), 3),
+            "nodes": [
+                {
+                    "node": node.name,
+                    "stage": node.stage,
+                    "power": node.power,
+                    "deps": node.deps,
+                    "start_s": round(node.start, 3) if node.start is not None else None,
+                    "end_s": round(node.end, 3) if node.end is not None else None,
+                    "duration_s": round(node.duration, 3),
+                    "status": node.status,
+                    "error": node.error,
+                }
+                for node in self.nodes.values()
+            ],
+        }
+
+    def write_timings(self, path: str) -> None:
+        """Appends this phase's timings as one JSON line."""
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.timings()) + "\n")
+        except Exception as e:
+            logger.error(f"Failed to write phase timings to {path}: {e}")
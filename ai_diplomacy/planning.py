@@ -1,11 +1,12 @@
 from dotenv import load_dotenv
+import asyncio
 import logging
-import concurrent.futures
-from typing import Dict
+import time
+from typing import Dict, Optional
 
-from .clients import load_model_client
 from .game_history import GameHistory
 from .agent import DiplomacyAgent
+from .phase_context import get_phase_context
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +16,18 @@ async def planning_phase(
     game_history: GameHistory, 
     model_error_stats,
     log_file_path: str,
+    max_concurrency: Optional[int] = None,
 ):
     """
     Lets each power generate a strategic plan using their DiplomacyAgent.
+
+    Plans are requested concurrently as asyncio tasks. Every call goes through
+    run_llm_and_log, so the shared rate limiter applies exactly as it does for
+    negotiations; `max_concurrency` additionally caps how many plans are in flight.
+    Per-power status and latency are recorded in game_history (Phase.plan_stats).
     """
-    logger.info(f"Starting planning phase for {game.current_short_phase}...")
+    current_phase = game.current_short_phase
+    logger.info(f"Starting planning phase for {current_phase}...")
     active_powers = [
         p_name for p_name, p_obj in game.powers.items() if not p_obj.is_eliminated()
     ]
@@ -33,66 +41,66 @@ async def planning_phase(
     else:
         logger.info("No eliminated powers yet.")
     
-    board_state = game.get_state()
+    board_state = get_phase_context(game).board_state
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def _plan_for(power_name: str, agent: DiplomacyAgent):
+        start = time.monotonic()
+        coro = agent.client.get_plan(
+            game,
+            board_state,
+            power_name,
+            game_history,
+            log_file_path,
+            agent_goals=agent.goals,
+            agent_relationships=agent.relationships,
+            agent_private_diary_str=agent.format_private_diary_for_prompt(),
+        )
+        if semaphore is None:
+            result = await coro
+        else:
+            async with semaphore:
+                result = await coro
+        return result, time.monotonic() - start
+
+    power_names = []
+    tasks = []
+    for power_name in active_powers:
+        if power_name not in agents:
+            logger.warning(f"Agent for {power_name} not found in planning phase. Skipping.")
+            continue
+        power_names.append(power_name)
+        tasks.append(asyncio.create_task(_plan_for(power_name, agents[power_name])))
+
+    logger.info(f"Waiting for {len(tasks)} planning results...")
+    results = await asyncio.gather(*tasks, return_exceptions=True)
 
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=len(active_powers)
-    ) as executor: 
-        futures = {}
-        for power_name in active_powers:
-            if power_name not in agents:
-                logger.warning(f"Agent for {power_name} not found in planning phase. Skipping.")
-                continue
-            agent = agents[power_name]
-            client = agent.client
-            
-            future = executor.submit(
-                client.get_plan,
-                game,
-                board_state,
-                power_name,
-                gather_possible_orders(game, power_name),
-                game_history,
-                agent_goals=agent.goals,
-                agent_relationships=agent.relationships,
-                log_file_path=log_file_path,
-                agent_private_diary_str=agent.format_private_diary_for_prompt(),
-            )
-            futures[future] = power_name
-            logger.debug(f"Submitted get_plan task for {power_name}.")
+    for power_name, result in zip(power_names, results):
+        agent = agents[power_name]
+        model_name = agent.client.model_name
+        if isinstance(result, Exception):
+            logger.error(f"Exception during planning for {power_name}: {result}", exc_info=result)
+            model_error_stats[model_name].setdefault('planning_execution_errors', 0)
+            model_error_stats[model_name]['planning_execution_errors'] += 1
+            game_history.add_plan_stats(current_phase, power_name, "exception", 0.0)
+            continue
 
-        logger.info(f"Waiting for {len(futures)} planning results...")
-        for future in concurrent.futures.as_completed(futures):
-            power_name = futures[future]
-            try:
-                plan_result = future.result()
-                logger.info(f"Received planning result from {power_name}.")
-                
-                if plan_result.startswith("Error:"):
-                     logger.warning(f"Agent {power_name} reported an error during planning: {plan_result}")
-                     if power_name in model_error_stats:
-                        model_error_stats[power_name].setdefault('planning_generation_errors', 0)
-                        model_error_stats[power_name]['planning_generation_errors'] += 1
-                     else:
-                        model_error_stats.setdefault(f'{power_name}_planning_generation_errors', 0)
-                        model_error_stats[f'{power_name}_planning_generation_errors'] += 1
-                elif plan_result:
-                    agent.add_journal_entry(f"Generated plan for {game.current_short_phase}: {plan_result[:100]}...")
-                    game_history.add_plan(
-                        game.current_short_phase, power_name, plan_result
-                    )
-                    logger.debug(f"Added plan for {power_name} to history.")
-                else:
-                    logger.warning(f"Agent {power_name} returned an empty plan.")
+        plan_result, latency = result
+        logger.info(f"Received planning result from {power_name} in {latency:.2f}s.")
+        if plan_result.startswith("Error:"):
+            logger.warning(f"Agent {power_name} reported an error during planning: {plan_result}")
+            model_error_stats[model_name].setdefault('planning_generation_errors', 0)
+            model_error_stats[model_name]['planning_generation_errors'] += 1
+            status = "error"
+        elif plan_result:
+            agent.add_journal_entry(f"Generated plan for {current_phase}: {plan_result[:100]}...")
+            game_history.add_plan(current_phase, power_name, plan_result)
+            logger.debug(f"Added plan for {power_name} to history.")
+            status = "ok"
+        else:
+            logger.warning(f"Agent {power_name} returned an empty plan.")
+            status = "empty"
+        game_history.add_plan_stats(current_phase, power_name, status, latency)
 
-            except Exception as e:
-                logger.error(f"Exception during planning result processing for {power_name}: {e}")
-                if power_name in model_error_stats:
-                    model_error_stats[power_name].setdefault('planning_execution_errors', 0)
-                    model_error_stats[power_name]['planning_execution_errors'] += 1
-                else:
-                     model_error_stats.setdefault(f'{power_name}_planning_execution_errors', 0)
-                     model_error_stats[f'{power_name}_planning_execution_errors'] += 1
-        
     logger.info("Planning phase processing complete.")
-    return game_history
\ No newline at end of file
+    return game_history
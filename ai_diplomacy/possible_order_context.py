@@ -5,6 +5,9 @@ from typing import Dict, List, Callable, Optional, Any, Set, Tuple
 from diplomacy.engine.map import Map as GameMap
 from diplomacy.engine.game import Game as BoardState
 import logging
+import threading
+
+import numpy as np
 
 # Placeholder for actual map type from diplomacy.engine.map.Map
 # GameMap = Any 
@@ -87,6 +90,119 @@ def build_diplomacy_graph(game_map: GameMap) -> Dict[str, Dict[str, List[str]]]:
     return graph
 
 
+class MapGraph:
+    """
+    Movement graph plus all-pairs shortest paths for one map, built once and shared
+    (see get_map_graph). Provinces are indexed by their sorted short names. For each
+    unit type ('ARMY', 'FLEET'):
+      dist[unit_type][i, j] - number of moves from province i to j (-1 if unreachable)
+      pred[unit_type][i, j] - province before j on the shortest path from i (-1 for j == i)
+    Paths follow the same BFS tie-breaking as bfs_shortest_path (neighbours in sorted
+    order), so the generated context is unchanged.
+    """
+
+    def __init__(self, game_map: GameMap):
+        self.game_map = game_map
+        self.graph = build_diplomacy_graph(game_map)
+        self.provinces: List[str] = sorted(self.graph)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.provinces)}
+        self.dist: Dict[str, np.ndarray] = {}
+        self.pred: Dict[str, np.ndarray] = {}
+        for unit_type in ("ARMY", "FLEET"):
+            self.dist[unit_type], self.pred[unit_type] = self._all_pairs_bfs(unit_type)
+        # Supply centers in map order, with their province index and name rank for tie-breaking
+        self.scs: List[str] = [sc for sc in game_map.scs if sc in self.index]
+        self.sc_index = np.array([self.index[sc] for sc in self.scs], dtype=np.int64)
+        self.sc_name_rank = np.argsort(np.argsort(np.array(self.scs, dtype=object)))
+        self._unit_moves: Dict[Tuple[str, str], List[str]] = {}
+
+    def unit_moves(self, unit_char: str, loc_full: str) -> List[str]:
+        """
+        Short names of the provinces a unit ('A'/'F') at loc_full (coast included, e.g. 'STP/SC')
+        can move to. Unlike `graph`, which is per province, this respects the unit's coast.
+        """
+        key = (unit_char, loc_full)
+        moves = self._unit_moves.get(key)
+        if moves is None:
+            game_map = self.game_map
+            destinations = set()
+            for dest in game_map.abut_list(loc_full, incl_no_coast=True):
+                dest_short = dest[:3].upper()
+                variants = game_map.loc_coasts.get(dest_short, [dest_short])
+                if any(game_map.abuts(unit_char, loc_full, '-', variant) for variant in variants):
+                    destinations.add(dest_short)
+            moves = sorted(destinations)
+            self._unit_moves[key] = moves
+        return moves
+
+    def _all_pairs_bfs(self, unit_type: str) -> Tuple[np.ndarray, np.ndarray]:
+        size = len(self.provinces)
+        neighbours = [[self.index[n] for n in self.graph[p][unit_type] if n in self.index] for p in self.provinces]
+        dist = np.full((size, size), -1, dtype=np.int16)
+        pred = np.full((size, size), -1, dtype=np.int16)
+        for source in range(size):
+            dist[source, source] = 0
+            queue = deque([source])
+            while queue:
+                current = queue.popleft()
+                for nxt in neighbours[current]:
+                    if dist[source, nxt] < 0:
+                        dist[source, nxt] = dist[source, current] + 1
+                        pred[source, nxt] = current
+                        queue.append(nxt)
+        return dist, pred
+
+    def path(self, unit_type: str, source: int, target: int) -> List[str]:
+        """Shortest path of short province names from source to target (inclusive)."""
+        pred = self.pred[unit_type][source]
+        nodes = [target]
+        while nodes[-1] != source:
+            nodes.append(int(pred[nodes[-1]]))
+        return [self.provinces[i] for i in reversed(nodes)]
+
+
+_map_graphs: Dict[str, MapGraph] = {}
+_map_graphs_lock = threading.Lock()
+
+
+def get_map_graph(game_map: GameMap) -> MapGraph:
+    """Cached MapGraph for `game_map` (maps are immutable and shared per name by the engine)."""
+    key = game_map.name
+    map_graph = _map_graphs.get(key)
+    if map_graph is None:
+        with _map_graphs_lock:
+            map_graph = _map_graphs.get(key)
+            if map_graph is None:
+                map_graph = MapGraph(game_map)
+                _map_graphs[key] = map_graph
+    return map_graph
+
+
+def _province_short(loc_full: str) -> str:
+    """'STP/SC' -> 'STP', 'VIE' -> 'VIE'."""
+    return loc_full[:3]
+
+
+def _unit_index(board_state: BoardState) -> Dict[str, str]:
+    """Location -> unit string ('A PAR (FRANCE)'), matching get_unit_at_location's first-match order."""
+    units: Dict[str, str] = {}
+    for power, unit_list in board_state.get('units', {}).items():
+        for unit_str in unit_list:
+            parts = unit_str.split(" ")
+            if len(parts) == 2:
+                units.setdefault(parts[1], f"{parts[0]} {parts[1]} ({power})")
+    return units
+
+
+def _sc_owners(board_state: BoardState) -> Dict[str, str]:
+    """SC province -> controlling power, matching get_sc_controller's first-match order."""
+    owners: Dict[str, str] = {}
+    for power, sc_list in board_state.get('centers', {}).items():
+        for sc in sc_list:
+            owners.setdefault(sc, power)
+    return owners
+
+
 def bfs_shortest_path(
     graph: Dict[str, Dict[str, List[str]]], 
     board_state: BoardState, 
@@ -194,90 +310,94 @@ def get_shortest_path_to_friendly_unit(
 
 def get_nearest_enemy_units(
     board_state: BoardState, 
-    graph: Dict[str, Dict[str, List[str]]],
-    game_map: GameMap, # Added game_map
+    map_graph: MapGraph,
     power_name: str, 
     start_unit_loc_full: str, 
     start_unit_type: str, 
-    n: int = 3
+    n: int = 3,
+    unit_index: Optional[Dict[str, str]] = None,
 ) -> List[Tuple[str, List[str]]]:
     """Finds up to N nearest enemy units, sorted by path length."""
-    enemy_paths: List[Tuple[str, List[str]]] = [] # (enemy_unit_str, path_short_names)
-    
-    all_enemy_unit_locations_full: List[Tuple[str,str]] = [] # (loc_full, unit_str_full)
-    # board_state.get("units", {}) has format: { "POWER_NAME": ["A PAR", "F BRE"], ... }
+    start = map_graph.index.get(_province_short(start_unit_loc_full))
+    if start is None:
+        logger.warning(f"Start province for {start_unit_loc_full} not in graph. Pathfinding may fail.")
+        return []
+    if unit_index is None:
+        unit_index = _unit_index(board_state)
+
+    # (unit string, province index) for every enemy unit, in board_state order
+    enemy_units: List[str] = []
+    enemy_provinces: List[int] = []
     for p_name, unit_list_for_power in board_state.get("units", {}).items():
-        if p_name != power_name: # If it's an enemy power
-            for unit_repr_from_state in unit_list_for_power: # e.g., "A PAR" or "F STP/SC"
-                parts = unit_repr_from_state.split(" ")
-                if len(parts) == 2:
-                    # unit_type_char = parts[0] # 'A' or 'F'
-                    loc_full = parts[1]       # 'PAR' or 'STP/SC'
-                    
-                    # Use get_unit_at_location to get the consistent full unit string like "A PAR (POWER_NAME)"
-                    full_unit_str_with_power = get_unit_at_location(board_state, loc_full)
-                    if full_unit_str_with_power: # Should find the unit if iteration is correct
-                         all_enemy_unit_locations_full.append((loc_full, full_unit_str_with_power))
-
-    for target_enemy_loc_full, enemy_unit_str in all_enemy_unit_locations_full:
-        target_enemy_loc_short = game_map.loc_name.get(target_enemy_loc_full, target_enemy_loc_full)
-        if '/' in target_enemy_loc_short:
-            target_enemy_loc_short = target_enemy_loc_short[:3]
-        if '/' not in target_enemy_loc_full:
-            target_enemy_loc_short = target_enemy_loc_full[:3]
-        else:
-            target_enemy_loc_short = target_enemy_loc_full[:3]
-            
-        def is_specific_enemy_loc(loc_short: str, current_board_state: BoardState) -> bool:
-            # Check if loc_short corresponds to target_enemy_loc_full
-            return loc_short == target_enemy_loc_short
-
-        path_short_names = bfs_shortest_path(graph, board_state, game_map, start_unit_loc_full, start_unit_type, is_specific_enemy_loc)
-        if path_short_names:
-            enemy_paths.append((enemy_unit_str, path_short_names))
-    
-    enemy_paths.sort(key=lambda x: len(x[1])) # Sort by path length
-    return enemy_paths[:n]
+        if p_name == power_name:
+            continue
+        for unit_repr_from_state in unit_list_for_power: # e.g., "A PAR" or "F STP/SC"
+            parts = unit_repr_from_state.split(" ")
+            if len(parts) != 2 or parts[1] not in unit_index:
+                continue
+            province = map_graph.index.get(_province_short(parts[1]))
+            if province is not None:
+                enemy_units.append(unit_index[parts[1]])
+                enemy_provinces.append(province)
+    if not enemy_units:
+        return []
+
+    distances = map_graph.dist[start_unit_type][start, np.array(enemy_provinces)]
+    reachable = np.flatnonzero(distances >= 0)
+    # Stable sort keeps board_state order between equally distant units
+    nearest = reachable[np.argsort(distances[reachable], kind="stable")][:n]
+    return [
+        (enemy_units[k], map_graph.path(start_unit_type, start, enemy_provinces[k]))
+        for k in nearest
+    ]
 
 
 def get_nearest_uncontrolled_scs(
     game_map: GameMap, 
     board_state: BoardState, 
-    graph: Dict[str, Dict[str, List[str]]], 
+    map_graph: MapGraph, 
     power_name: str, 
     start_unit_loc_full: str, 
     start_unit_type: str, 
-    n: int = 3
+    n: int = 3,
+    sc_owners: Optional[Dict[str, str]] = None,
 ) -> List[Tuple[str, int, List[str]]]: # (sc_name_short, distance, path_short_names)
     """Finds up to N nearest SCs not controlled by power_name, sorted by path length."""
-    uncontrolled_sc_paths: List[Tuple[str, int, List[str]]] = []
-
-    all_scs_short = game_map.scs # This is a list of short province names that are SCs
-
-    for sc_loc_short in all_scs_short:
-        controller = get_sc_controller(game_map, board_state, sc_loc_short)
-        if controller != power_name:
-            def is_target_sc(loc_short: str, current_board_state: BoardState) -> bool:
-                return loc_short == sc_loc_short
-            
-            path_short_names = bfs_shortest_path(graph, board_state, game_map, start_unit_loc_full, start_unit_type, is_target_sc)
-            if path_short_names:
-                # Path includes start, so distance is len - 1
-                uncontrolled_sc_paths.append((f"{sc_loc_short} (Ctrl: {controller or 'None'})", len(path_short_names) -1, path_short_names))
-    
-    # Sort by distance (path length - 1), then by SC name for tie-breaking
-    uncontrolled_sc_paths.sort(key=lambda x: (x[1], x[0]))
-    return uncontrolled_sc_paths[:n]
+    start = map_graph.index.get(_province_short(start_unit_loc_full))
+    if start is None or not map_graph.scs:
+        return []
+    if sc_owners is None:
+        sc_owners = _sc_owners(board_state)
+
+    not_ours = np.array([sc_owners.get(sc) != power_name for sc in map_graph.scs])
+    distances = map_graph.dist[start_unit_type][start, map_graph.sc_index]
+    candidates = np.flatnonzero(not_ours & (distances >= 0))
+    # Sort by distance, then by SC name for tie-breaking
+    nearest = candidates[np.lexsort((map_graph.sc_name_rank[candidates], distances[candidates]))][:n]
+    results = []
+    for k in nearest:
+        sc_loc_short = map_graph.scs[k]
+        controller = sc_owners.get(sc_loc_short)
+        path_short_names = map_graph.path(start_unit_type, start, int(map_graph.sc_index[k]))
+        results.append((f"{sc_loc_short} (Ctrl: {controller or 'None'})", int(distances[k]), path_short_names))
+    return results
 
 def get_adjacent_territory_details(
     game_map: GameMap, 
     board_state: BoardState, 
     unit_loc_full: str, # The location of the unit whose adjacencies we're checking
     unit_type: str, # ARMY or FLEET of the unit at unit_loc_full
-    graph: Dict[str, Dict[str, List[str]]]
+    graph: Dict[str, Dict[str, List[str]]],
+    unit_index: Optional[Dict[str, str]] = None,
+    sc_owners: Optional[Dict[str, str]] = None,
 ) -> str:
     """Generates a string describing adjacent territories and units that can interact with them."""
     output_lines: List[str] = []
+    # Per-board lookups, built once per call if the caller didn't pass them in
+    if unit_index is None:
+        unit_index = _unit_index(board_state)
+    if sc_owners is None:
+        sc_owners = _sc_owners(board_state)
     # Get adjacencies for the current unit's type
     # The graph already stores processed adjacencies (e.g. army can't go to sea)
     # For armies, graph[unit_loc_full]['ARMY'] gives short province names
@@ -311,11 +431,11 @@ def get_adjacent_territory_details(
         
         line = f"  {adj_loc_short} ({adj_loc_type_display})"
         
-        sc_controller = get_sc_controller(game_map, board_state, adj_loc_short)
+        sc_controller = sc_owners.get(adj_loc_short) if adj_loc_short in game_map.scs else None
         if sc_controller:
             line += f" SC Control: {sc_controller}"
         
-        unit_in_adj_loc = get_unit_at_location(board_state, adj_loc_short)
+        unit_in_adj_loc = unit_index.get(adj_loc_short)
         if unit_in_adj_loc:
             line += f" Units: {unit_in_adj_loc}"
         output_lines.append(line)
@@ -344,7 +464,7 @@ def get_adjacent_territory_details(
             unit_in_further_loc = ""
             full_variants_of_further_short = game_map.loc_coasts.get(further_adj_loc_short, [further_adj_loc_short])
             for fv_further in full_variants_of_further_short:
-                temp_unit = get_unit_at_location(board_state, fv_further)
+                temp_unit = unit_index.get(fv_further)
                 if temp_unit:
                     unit_in_further_loc = temp_unit
                     break # Found a unit in one of the coasts/base
@@ -361,22 +481,77 @@ def get_adjacent_territory_details(
     return "\n".join(output_lines)
 
 
+def own_unit_orders(board_state: BoardState, power_name: str, all_possible_orders: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Unit location -> possible orders for each of power_name's units (empty list if it has none this phase)."""
+    result: Dict[str, List[str]] = {}
+    for unit_str in board_state.get('units', {}).get(power_name, []):
+        parts = unit_str.split(" ")
+        if len(parts) == 2:
+            result[parts[1]] = all_possible_orders.get(parts[1], [])
+    return result
+
+
+def summarize_other_units_lines(
+    game_map: GameMap,
+    board_state: BoardState,
+    map_graph: MapGraph,
+    power_name: str,
+    sc_owners: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """
+    One line per unit of every other power: the unit, whether it sits on an SC, and where it can move,
+    e.g. 'A MUN (GERMANY) on SC (GERMANY), adj: BER, BOH, BUR, KIE, RUH, SIL, TYR'.
+    """
+    if sc_owners is None:
+        sc_owners = _sc_owners(board_state)
+    lines: List[str] = []
+    for p_name, unit_list in board_state.get('units', {}).items():
+        if p_name == power_name:
+            continue
+        for unit_str in unit_list:
+            parts = unit_str.split(" ")
+            if len(parts) != 2:
+                continue
+            unit_char = parts[0].lstrip('*')  # '*A PAR' marks a dislodged unit in retreat phases
+            province = _province_short(parts[1])
+            line = f"{parts[0]} {parts[1]} ({p_name})"
+            if province in game_map.scs:
+                line += f" on SC ({sc_owners.get(province) or 'None'})"
+            adjacent = map_graph.unit_moves(unit_char, parts[1])
+            line += f", adj: {', '.join(adjacent) if adjacent else 'None'}"
+            lines.append(line)
+    return lines
+
+
 # --- Main context generation function ---
-def generate_rich_order_context(game: Any, power_name: str, possible_orders_for_power: Dict[str, List[str]]) -> str:
+def generate_rich_order_context(
+    game: Any,
+    power_name: str,
+    possible_orders_for_power: Dict[str, List[str]],
+    board_state: Optional[BoardState] = None,
+    summarize_other_units: bool = False,
+) -> str:
     """
     Generates a strategic overview context string.
     Details units and SCs for power_name, including possible orders and simplified adjacencies for its units.
     Provides summaries of units and SCs for all other powers.
+    `board_state` defaults to game.get_state(); PhaseContext passes its cached copy.
+    With summarize_other_units, every other power's unit gets one line (see summarize_other_units)
+    instead of a full UnitContext block; pass only power_name's own units in possible_orders_for_power.
     """
-    board_state: BoardState = game.get_state()
+    if board_state is None:
+        board_state = game.get_state()
     game_map: GameMap = game.map
-    graph = build_diplomacy_graph(game_map)
+    map_graph = get_map_graph(game_map)
+    graph = map_graph.graph
+    unit_index = _unit_index(board_state)
+    sc_owners = _sc_owners(board_state)
     
     final_context_lines: List[str] = ["<PossibleOrdersContext>"]
 
     # Iterate through units that have orders (keys of possible_orders_for_power are unit locations)
     for unit_loc_full, unit_specific_possible_orders in possible_orders_for_power.items():
-        unit_str_full = get_unit_at_location(board_state, unit_loc_full)
+        unit_str_full = unit_index.get(unit_loc_full)
         if not unit_str_full: # Should not happen if unit_loc_full is from possible_orders keys
             continue 
 
@@ -413,7 +588,7 @@ def generate_rich_order_context(game: Any, power_name: str, possible_orders_for_
         current_unit_lines.append('    </PossibleMoves>')
         
         # Nearest enemy units section
-        enemy_units_info = get_nearest_enemy_units(board_state, graph, game_map, power_name, unit_loc_full, unit_type_long, n=3)
+        enemy_units_info = get_nearest_enemy_units(board_state, map_graph, power_name, unit_loc_full, unit_type_long, n=3, unit_index=unit_index)
         current_unit_lines.append('    <NearestEnemyUnits>')
         if enemy_units_info:
             current_unit_lines.append("      Nearest units (not ours):")
@@ -424,7 +599,7 @@ def generate_rich_order_context(game: Any, power_name: str, possible_orders_for_
         current_unit_lines.append('    </NearestEnemyUnits>')
 
         # Nearest supply centers (not controlled by us) section
-        uncontrolled_scs_info = get_nearest_uncontrolled_scs(game_map, board_state, graph, power_name, unit_loc_full, unit_type_long, n=3)
+        uncontrolled_scs_info = get_nearest_uncontrolled_scs(game_map, board_state, map_graph, power_name, unit_loc_full, unit_type_long, n=3, sc_owners=sc_owners)
         current_unit_lines.append('    <NearestUncontrolledSupplyCenters>')
         if uncontrolled_scs_info:
             current_unit_lines.append("      Nearest supply centers (not controlled by us):")
@@ -435,7 +610,7 @@ def generate_rich_order_context(game: Any, power_name: str, possible_orders_for_
         current_unit_lines.append('    </NearestUncontrolledSupplyCenters>')
 
         # Adjacent territories details section
-        adj_details_str = get_adjacent_territory_details(game_map, board_state, unit_loc_full, unit_type_long, graph)
+        adj_details_str = get_adjacent_territory_details(game_map, board_state, unit_loc_full, unit_type_long, graph, unit_index=unit_index, sc_owners=sc_owners)
         current_unit_lines.append('    <AdjacentTerritories>')
         if adj_details_str:
             current_unit_lines.append("      Adjacent territories (including units that can support/move to the adjacent territory):")
@@ -454,5 +629,12 @@ def generate_rich_order_context(game: Any, power_name: str, possible_orders_for_
         current_unit_lines.append('  </UnitContext>')
         final_context_lines.extend(current_unit_lines)
 
+    if summarize_other_units:
+        final_context_lines.append("  <OtherUnits>")
+        final_context_lines.extend(
+            f"    {line}" for line in summarize_other_units_lines(game_map, board_state, map_graph, power_name, sc_owners)
+        )
+        final_context_lines.append("  </OtherUnits>")
+
     final_context_lines.append("</PossibleOrdersContext>")
     return "\n".join(final_context_lines)
@@ -1,12 +1,22 @@
 """
 Module for constructing prompts for LLM interactions in the Diplomacy game.
+
+Context prompts can be fitted to a token budget (lm_game.py --prompt_token_budget):
+each placeholder of context_prompt.txt is a PromptSection with a priority and a
+truncation strategy, and assemble_prompt() shortens the lowest-priority sections
+first until the estimated size (estimate_tokens) fits. The estimated size and
+what was trimmed are attached to the LLM call's telemetry record.
 """
 import logging
-from typing import Dict, List, Optional, Any # Added Any for game type placeholder
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Any, Sequence # Added Any for game type placeholder
 
 from .utils import load_prompt
-from .possible_order_context import generate_rich_order_context
+from .prompt_registry import get_prompt_template
+from .phase_context import PhaseContext, format_units_and_centers, get_phase_context
 from .game_history import GameHistory # Assuming GameHistory is correctly importable
+from .telemetry import note_prompt_assembly
 
 # placeholder for diplomacy.Game to avoid circular or direct dependency if not needed for typehinting only
 # from diplomacy import Game # Uncomment if 'Game' type hint is crucial and available
@@ -14,6 +24,138 @@ from .game_history import GameHistory # Assuming GameHistory is correctly import
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG) # Or inherit from parent logger
 
+# Closing line of the order prompt; it follows the per-phase context
+ORDER_PROMPT_CLOSING = "RESPOND WITH YOUR REASONING AND ORDERS (within PARSABLE OUTPUT) BELOW"
+
+# == Token-budgeted assembly ==
+
+# Roughly what a BPE tokenizer turns into one token: a short word, a group of digits or a symbol
+_TOKEN_PIECE_RE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+TRIM_NOTE = "[... {tokens} tokens trimmed to fit the prompt budget ...]"
+_TRIM_NOTE_TOKENS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """Offline token estimate: words count one token per six letters, digits per three, symbols one each."""
+    return len(_TOKEN_PIECE_RE.findall(text)) if text else 0
+
+
+@dataclass
+class PromptSection:
+    """The value of one template placeholder and how it may be shortened to fit the budget."""
+    name: str
+    text: str
+    priority: int = 100  # Lower priorities are shortened first
+    strategy: str = "keep"  # keep | head (keep the start) | tail (keep the end) | ends (keep both) | drop
+    min_tokens: int = 0  # Truncation never goes below this
+    alternatives: Sequence[str] = ()  # Shorter renderings of the same content, tried before truncating
+
+
+@dataclass
+class AssembledPrompt:
+    text: str
+    tokens: int  # Estimated tokens of the whole prompt, reserved text included
+    budget: Optional[int]
+    trimmed: Dict[str, int] = field(default_factory=dict)  # Section name -> estimated tokens removed
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.tokens > self.budget
+
+
+def _take_lines(lines: List[str], costs: List[int], limit: int, from_end: bool) -> List[str]:
+    """Whole lines from the start (or end) within `limit` tokens; a first line that is too long is cut."""
+    order = range(len(lines) - 1, -1, -1) if from_end else range(len(lines))
+    kept, used = [], 0
+    for i in order:
+        if used + costs[i] > limit:
+            if not kept and limit > 0:
+                chars = len(lines[i]) * limit // costs[i]
+                kept.append(lines[i][-chars:] if from_end else lines[i][:chars])
+            break
+        kept.append(lines[i])
+        used += costs[i]
+    return kept[::-1] if from_end else kept
+
+
+def _truncate(text: str, strategy: str, target_tokens: int) -> str:
+    """Cuts `text` to about `target_tokens`, at line boundaries where possible, marking the cut."""
+    original = estimate_tokens(text)
+    keep = target_tokens - _TRIM_NOTE_TOKENS
+    if strategy == "drop" or keep <= 0:
+        return TRIM_NOTE.format(tokens=original)
+    lines = text.split("\n")
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    if strategy == "head":
+        head, tail = _take_lines(lines, costs, keep, from_end=False), []
+    elif strategy == "tail":
+        head, tail = [], _take_lines(lines, costs, keep, from_end=True)
+    else:  # ends: the first half of the budget for the start, the rest for the end
+        head = _take_lines(lines, costs, keep // 2, from_end=False)
+        rest = lines[len(head):]
+        tail = _take_lines(rest, costs[len(head):], keep - estimate_tokens("\n".join(head)), from_end=True)
+    head_text, tail_text = "\n".join(head), "\n".join(tail)
+    removed = max(original - estimate_tokens(head_text) - estimate_tokens(tail_text), 0)
+    return "\n".join(part for part in (head_text, TRIM_NOTE.format(tokens=removed), tail_text) if part)
+
+
+def assemble_prompt(
+    template: Any,
+    sections: List[PromptSection],
+    budget: Optional[int] = None,
+    reserved_text: str = "",
+    label: str = "prompt",
+    **fixed_values,
+) -> AssembledPrompt:
+    """
+    Fills `template` (a PromptTemplate) with the sections and fixed values.
+    With a budget, sections are shortened in priority order (lowest first):
+    first by their alternatives, then by their strategy, until the estimated
+    tokens of the prompt plus `reserved_text` (the parts the caller adds
+    around it) fit. Sections with strategy "keep" and no alternatives are never
+    changed, so a prompt can still end up over budget; that is logged.
+    """
+    overhead = estimate_tokens(reserved_text) + estimate_tokens(
+        template.format(**fixed_values, **{section.name: "" for section in sections})
+    )
+    values = {section.name: section.text for section in sections}
+    costs = {section.name: estimate_tokens(section.text) for section in sections}
+    trimmed: Dict[str, int] = {}
+    total = overhead + sum(costs.values())
+
+    if budget is not None and total > budget:
+        for section in sorted(sections, key=lambda s: s.priority):
+            if total <= budget:
+                break
+            original = costs[section.name]
+            for alternative in section.alternatives:
+                alternative_cost = estimate_tokens(alternative)
+                if alternative_cost < costs[section.name]:
+                    total -= costs[section.name] - alternative_cost
+                    values[section.name], costs[section.name] = alternative, alternative_cost
+                    if total <= budget:
+                        break
+            if total > budget and section.strategy != "keep":
+                target = max(section.min_tokens, costs[section.name] - (total - budget))
+                if target < costs[section.name]:
+                    values[section.name] = _truncate(values[section.name], section.strategy, target)
+                    new_cost = estimate_tokens(values[section.name])
+                    total -= costs[section.name] - new_cost
+                    costs[section.name] = new_cost
+            if costs[section.name] < original:
+                trimmed[section.name] = original - costs[section.name]
+
+    assembled = AssembledPrompt(template.format(**fixed_values, **values), total, budget, trimmed)
+    if trimmed:
+        logger.info(
+            f"{label}: trimmed {', '.join(f'{name} (-{n} tokens)' for name, n in trimmed.items())} "
+            f"to fit {budget} tokens; now ~{assembled.tokens}"
+        )
+    if assembled.over_budget:
+        logger.warning(f"{label}: ~{assembled.tokens} tokens is still over the budget of {budget} after trimming")
+    note_prompt_assembly(assembled.tokens, trimmed)
+    return assembled
+
 def build_context_prompt(
     game: Any, # diplomacy.Game object
     board_state: dict,
@@ -23,6 +165,9 @@ def build_context_prompt(
     agent_goals: Optional[List[str]] = None,
     agent_relationships: Optional[Dict[str, str]] = None,
     agent_private_diary: Optional[str] = None,
+    phase_context: Optional[PhaseContext] = None,
+    token_budget: Optional[int] = None,
+    reserved_text: str = "",
 ) -> str:
     """Builds the detailed context part of the prompt.
 
@@ -35,11 +180,17 @@ def build_context_prompt(
         agent_goals: Optional list of agent's goals.
         agent_relationships: Optional dictionary of agent's relationships with other powers.
         agent_private_diary: Optional string of agent's private diary.
+        phase_context: Cached engine-derived inputs for the current board; looked up from `game` if omitted.
+        token_budget: Estimated token budget of the whole prompt; None for no limit. Over budget,
+            the diary is trimmed first (keeping the consolidated summary and the newest entries),
+            then older messages, then other powers' units are cut to one line each, then the
+            possible orders lose their strategic annotations (see assemble_prompt).
+        reserved_text: The rest of the prompt the caller adds around the context, counted against the budget.
 
     Returns:
         A string containing the formatted context.
     """
-    context_template = load_prompt("context_prompt.txt")
+    context_template = get_prompt_template("context_prompt.txt").stripped()
 
     # === Agent State Debug Logging ===
     if agent_goals:
@@ -54,10 +205,15 @@ def build_context_prompt(
     # units_info = board_state["units"].get(power_name, [])
     # centers_info = board_state["centers"].get(power_name, [])
 
+    if phase_context is None:
+        phase_context = get_phase_context(game)
+    if board_state is None:
+        board_state = phase_context.board_state
+
     # Get the current phase
     year_phase = board_state["phase"]  # e.g. 'S1901M'
 
-    possible_orders_context_str = generate_rich_order_context(game, power_name, possible_orders)
+    possible_orders_context_str = phase_context.rich_order_context(power_name, possible_orders)
 
     messages_this_round_text = game_history.get_messages_this_round(
         power_name=power_name,
@@ -66,41 +222,62 @@ def build_context_prompt(
     if not messages_this_round_text.strip():
         messages_this_round_text = "\n(No messages this round)\n"
 
-    # Separate active and eliminated powers for clarity
-    active_powers = [p for p in game.powers.keys() if not game.powers[p].is_eliminated()]
-    eliminated_powers = [p for p in game.powers.keys() if game.powers[p].is_eliminated()]
-    
-    # Build units representation with power status
-    units_lines = []
-    for p, u in board_state["units"].items():
-        if game.powers[p].is_eliminated():
-            units_lines.append(f"  {p}: {u} [ELIMINATED]")
-        else:
-            units_lines.append(f"  {p}: {u}")
-    units_repr = "\n".join(units_lines)
-    
-    # Build centers representation with power status  
-    centers_lines = []
-    for p, c in board_state["centers"].items():
-        if game.powers[p].is_eliminated():
-            centers_lines.append(f"  {p}: {c} [ELIMINATED]")
-        else:
-            centers_lines.append(f"  {p}: {c}")
-    centers_repr = "\n".join(centers_lines)
-
-    context = context_template.format(
+    # Units and centers with power status; reuse the cached listing when the caller passed the snapshot's own state
+    if board_state is phase_context.board_state:
+        units_repr, centers_repr = phase_context.units_repr, phase_context.centers_repr
+    else:
+        units_repr, centers_repr = format_units_and_centers(game, board_state)
+
+    order_alternatives = []
+    if token_budget is not None:
+        own_orders = phase_context.own_unit_orders(power_name)
+        own_possible = {loc: orders for loc, orders in possible_orders.items() if loc in own_orders}
+        if own_possible and len(own_possible) < len(possible_orders):
+            # Our units in full, every other power's unit on one line
+            order_alternatives.append(
+                phase_context.rich_order_context(power_name, own_possible, summarize_other_units=True)
+            )
+        # Last resort: every possible order, without the strategic annotations
+        order_alternatives.append(
+            "<PossibleOrdersContext>\n"
+            + "\n".join(f"  {loc}: {', '.join(orders)}" for loc, orders in possible_orders.items())
+            + "\n</PossibleOrdersContext>"
+        )
+
+    sections = [
+        PromptSection(
+            "agent_private_diary",
+            agent_private_diary if agent_private_diary else "(No diary entries yet)",
+            priority=10,
+            strategy="ends",
+            min_tokens=300,
+        ),
+        PromptSection("messages_this_round", messages_this_round_text, priority=20, strategy="tail", min_tokens=400),
+        PromptSection("possible_orders", possible_orders_context_str, priority=30, alternatives=order_alternatives),
+    ]
+    assembled = assemble_prompt(
+        context_template,
+        sections,
+        budget=token_budget,
+        reserved_text=reserved_text,
+        label=f"[{power_name}] {year_phase} context",
         power_name=power_name,
         current_phase=year_phase,
         all_unit_locations=units_repr,
         all_supply_centers=centers_repr,
-        messages_this_round=messages_this_round_text,
-        possible_orders=possible_orders_context_str,
         agent_goals="\n".join(f"- {g}" for g in agent_goals) if agent_goals else "None specified",
         agent_relationships="\n".join(f"- {p}: {s}" for p, s in agent_relationships.items()) if agent_relationships else "None specified",
-        agent_private_diary=agent_private_diary if agent_private_diary else "(No diary entries yet)",
     )
 
-    return context
+    return assembled.text
+
+def order_prompt_prefix(system_prompt: str) -> str:
+    """
+    The start of every order prompt of a power: its system prompt and the order
+    instructions. It is byte-identical from phase to phase, so providers can
+    serve it from their prompt cache (see ClaudeClient's cache_control breakpoints).
+    """
+    return system_prompt + "\n\n" + load_prompt("order_instructions.txt") + "\n\n"
 
 def construct_order_generation_prompt(
     system_prompt: str,
@@ -112,6 +289,8 @@ def construct_order_generation_prompt(
     agent_goals: Optional[List[str]] = None,
     agent_relationships: Optional[Dict[str, str]] = None,
     agent_private_diary_str: Optional[str] = None,
+    phase_context: Optional[PhaseContext] = None,
+    token_budget: Optional[int] = None,
 ) -> str:
     """Constructs the final prompt for order generation.
 
@@ -125,13 +304,14 @@ def construct_order_generation_prompt(
         agent_goals: Optional list of agent's goals.
         agent_relationships: Optional dictionary of agent's relationships with other powers.
         agent_private_diary_str: Optional string of agent's private diary.
+        phase_context: Cached engine-derived inputs for the current board (see build_context_prompt).
+        token_budget: Estimated token budget of the whole prompt (see build_context_prompt).
 
     Returns:
-        A string containing the complete prompt for the LLM.
+        A string containing the complete prompt for the LLM: the static
+        order_prompt_prefix() first, then the context and the closing line.
     """
-    # Load prompts
-    _ = load_prompt("few_shot_example.txt") # Loaded but not used, as per original logic
-    instructions = load_prompt("order_instructions.txt")
+    prefix = order_prompt_prefix(system_prompt)
 
     # Build the context prompt
     context = build_context_prompt(
@@ -143,7 +323,11 @@ def construct_order_generation_prompt(
         agent_goals=agent_goals,
         agent_relationships=agent_relationships,
         agent_private_diary=agent_private_diary_str,
+        phase_context=phase_context,
+        token_budget=token_budget,
+        # The system prompt also goes out as the system message
+        reserved_text=system_prompt + prefix + ORDER_PROMPT_CLOSING,
     )
 
-    final_prompt = system_prompt + "\n\n" + context + "\n\n" + instructions
+    final_prompt = prefix + context + "\n\n" + ORDER_PROMPT_CLOSING
     return final_prompt
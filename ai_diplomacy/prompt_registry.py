@@ -0,0 +1,282 @@
+"""
+Registry of the prompt templates in ai_diplomacy/prompts/.
+
+Every .txt file under the prompts directory, including the
+flavor_system_prompts/ and standardized_system_prompts/ sets, is read once
+and kept in memory. Templates that the code fills in are compiled into
+segments at load time and their placeholders are checked against
+TEMPLATE_FIELDS, so a renamed or mistyped placeholder fails when the registry
+is loaded at startup rather than in the middle of a game.
+
+Two kinds of templates are filled in:
+  * "format" templates follow str.format rules ({{ and }} are literal braces);
+  * "placeholder" templates contain literal JSON examples, so only their
+    declared {placeholders} are substituted and every other brace is kept.
+All other files (system prompts, instructions) are plain text.
+
+With watch enabled (lm_game.py --watch_prompts), files are polled for
+changes at most once per `interval` seconds and changed templates are
+reloaded in place; a template that fails validation on reload is logged and
+the previous version is kept.
+"""
+import logging
+import os
+import re
+import string
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# Templates filled in with str.format semantics: name -> placeholders it must contain
+TEMPLATE_FIELDS: Dict[str, FrozenSet[str]] = {
+    "context_prompt.txt": frozenset({
+        "power_name", "current_phase", "all_unit_locations", "all_supply_centers", "messages_this_round",
+        "possible_orders", "agent_goals", "agent_relationships", "agent_private_diary",
+    }),
+    "state_update_prompt.txt": frozenset({
+        "power_name", "current_year", "current_phase", "board_state_str", "phase_summary", "other_powers",
+        "current_goals", "current_relationships",
+    }),
+    "phase_result_diary_prompt.txt": frozenset({
+        "power_name", "current_phase", "phase_summary", "all_orders_formatted", "your_negotiations",
+        "pre_phase_relationships", "agent_goals", "your_actual_orders",
+    }),
+    "diary_consolidation_prompt.txt": frozenset({
+        "power_name", "existing_summary", "full_diary_text", "max_summary_chars",
+    }),
+}
+
+# Templates with literal JSON braces: only these placeholders are substituted
+PLACEHOLDER_FIELDS: Dict[str, FrozenSet[str]] = {
+    "negotiation_diary_prompt.txt": frozenset({
+        "power_name", "current_phase", "messages_this_round", "agent_goals", "agent_relationships",
+        "board_state_str", "ignored_messages_context",
+    }),
+    "order_diary_prompt.txt": frozenset({
+        "power_name", "current_phase", "orders_list_str", "board_state_str", "agent_goals", "agent_relationships",
+    }),
+}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+_BRACED_IDENTIFIER_RE = re.compile(r"\{([A-Za-z_]\w*)\}")
+_CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+
+# (literal text, field name or None, format spec, conversion or None)
+Segment = Tuple[str, Optional[str], str, Optional[str]]
+
+
+class PromptTemplateError(ValueError):
+    """A prompt template is missing, unreadable or has unexpected placeholders."""
+
+
+class PromptTemplate:
+    """One prompt file, with its placeholders parsed once at load time."""
+
+    def __init__(self, name: str, path: str, text: str, mtime: float = 0.0):
+        self.name = name
+        self.path = path
+        self.text = text
+        self.mtime = mtime
+        if name in PLACEHOLDER_FIELDS:
+            self.kind = "placeholder"
+            self._segments = _compile_placeholders(name, text, PLACEHOLDER_FIELDS[name])
+        elif name in TEMPLATE_FIELDS:
+            self.kind = "format"
+            self._segments = _compile_format(name, text)
+        else:
+            self.kind = "text"
+            self._segments = [(text, None, "", None)]
+        self.fields: FrozenSet[str] = frozenset(seg[1] for seg in self._segments if seg[1] is not None)
+        self._stripped: Optional["PromptTemplate"] = None
+
+    def validate(self) -> None:
+        """Raises PromptTemplateError if the placeholders differ from the declared ones."""
+        expected = TEMPLATE_FIELDS.get(self.name) or PLACEHOLDER_FIELDS.get(self.name)
+        if expected is None:
+            return
+        missing = expected - self.fields
+        unexpected = self.fields - expected
+        if missing or unexpected:
+            raise PromptTemplateError(
+                f"{self.name}: missing placeholders {sorted(missing)}, unexpected placeholders {sorted(unexpected)}"
+            )
+
+    def format(self, **values) -> str:
+        """Fills in the placeholders; raises KeyError for a missing value, like str.format."""
+        parts = []
+        for literal, field, spec, conversion in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                if conversion:
+                    value = _CONVERSIONS[conversion](value)
+                parts.append(format(value, spec))
+        return "".join(parts)
+
+    def stripped(self) -> "PromptTemplate":
+        """The same template with surrounding whitespace removed (what load_prompt returns)."""
+        if self._stripped is None:
+            stripped_text = self.text.strip()
+            self._stripped = self if stripped_text == self.text else PromptTemplate(
+                self.name, self.path, stripped_text, self.mtime
+            )
+        return self._stripped
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate({self.name!r}, kind={self.kind!r}, fields={sorted(self.fields)})"
+
+
+def _compile_format(name: str, text: str) -> List[Segment]:
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError as e:
+        raise PromptTemplateError(f"{name}: {e}") from e
+    segments = []
+    for literal, field, spec, conversion in parsed:
+        if field is not None and not _IDENTIFIER_RE.match(field):
+            raise PromptTemplateError(f"{name}: unsupported placeholder {{{field}}} (escape literal braces as {{{{ }}}})")
+        if spec and "{" in spec:
+            raise PromptTemplateError(f"{name}: nested placeholders in format spec of {{{field}}} are not supported")
+        segments.append((literal, field, spec or "", conversion))
+    return segments
+
+
+def _compile_placeholders(name: str, text: str, fields: FrozenSet[str]) -> List[Segment]:
+    pattern = re.compile(r"\{(" + "|".join(re.escape(f) for f in sorted(fields)) + r")\}")
+    segments = []
+    pos = 0
+    for match in pattern.finditer(text):
+        segments.append((text[pos:match.start()], match.group(1), "", None))
+        pos = match.end()
+    segments.append((text[pos:], None, "", None))
+    # A braced identifier that is not declared is almost certainly a typo, not JSON
+    undeclared = sorted(set(_BRACED_IDENTIFIER_RE.findall(text)) - fields)
+    if undeclared:
+        raise PromptTemplateError(f"{name}: unexpected placeholders {undeclared}")
+    return segments
+
+
+def _read_template(name: str, path: str) -> PromptTemplate:
+    try:
+        mtime = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        raise PromptTemplateError(f"{name}: could not read {path}: {e}") from e
+    template = PromptTemplate(name, path, text, mtime)
+    template.validate()
+    return template
+
+
+class PromptRegistry:
+    """All prompt templates of a prompts directory, keyed by path relative to it ("france_system_prompt.txt",
+    "flavor_system_prompts/france_system_prompt.txt")."""
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = os.path.abspath(prompts_dir)
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+        self._watch = False
+        self._watch_interval = 1.0
+        self._last_check = 0.0
+
+    def load(self) -> "PromptRegistry":
+        """Reads and validates every template; raises PromptTemplateError listing every problem found."""
+        templates: Dict[str, PromptTemplate] = {}
+        errors: List[str] = []
+        for name, path in self._discover():
+            try:
+                templates[name] = _read_template(name, path)
+            except PromptTemplateError as e:
+                errors.append(str(e))
+        for name in sorted((set(TEMPLATE_FIELDS) | set(PLACEHOLDER_FIELDS)) - set(templates)):
+            if not any(err.startswith(f"{name}:") for err in errors):
+                errors.append(f"{name}: required template not found in {self.prompts_dir}")
+        if errors:
+            raise PromptTemplateError("Invalid prompt templates:\n  " + "\n  ".join(errors))
+        with self._lock:
+            self._templates = templates
+            self._last_check = time.monotonic()
+        logger.info(f"Loaded {len(templates)} prompt templates from {self.prompts_dir}")
+        return self
+
+    def _discover(self) -> List[Tuple[str, str]]:
+        found = []
+        for root, _, files in os.walk(self.prompts_dir):
+            for filename in files:
+                if filename.endswith(".txt"):
+                    path = os.path.join(root, filename)
+                    found.append((os.path.relpath(path, self.prompts_dir).replace(os.sep, "/"), path))
+        return sorted(found)
+
+    def watch(self, enabled: bool = True, interval: float = 1.0) -> None:
+        """Development aid: reload changed files (polled at most every `interval` seconds) on access."""
+        self._watch = enabled
+        self._watch_interval = interval
+
+    def reload_if_changed(self) -> List[str]:
+        """Reloads templates whose files changed or appeared; returns their names."""
+        reloaded = []
+        with self._lock:
+            self._last_check = time.monotonic()
+            for name, path in self._discover():
+                current = self._templates.get(name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                if current is not None and current.mtime == mtime:
+                    continue
+                try:
+                    self._templates[name] = _read_template(name, path)
+                    reloaded.append(name)
+                except PromptTemplateError as e:
+                    logger.error(f"Not reloading prompt template: {e}")
+        if reloaded:
+            logger.info(f"Reloaded prompt templates: {', '.join(reloaded)}")
+        return reloaded
+
+    def _maybe_reload(self) -> None:
+        if self._watch and time.monotonic() - self._last_check >= self._watch_interval:
+            self.reload_if_changed()
+
+    def get(self, name: str) -> Optional[PromptTemplate]:
+        """The template registered under `name`, or None."""
+        self._maybe_reload()
+        return self._templates.get(name)
+
+    def name_for_path(self, path: str) -> Optional[str]:
+        """Registry name of a file path inside the prompts directory, else None."""
+        rel = os.path.relpath(os.path.abspath(path), self.prompts_dir)
+        if rel.startswith(os.pardir):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def names(self) -> List[str]:
+        return sorted(self._templates)
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """The process-wide registry for ai_diplomacy/prompts/, loaded on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = PromptRegistry().load()
+    return _registry
+
+
+def get_prompt_template(name: str) -> Optional[PromptTemplate]:
+    """Shortcut for get_prompt_registry().get(name); logs an error if there is no such template."""
+    template = get_prompt_registry().get(name)
+    if template is None:
+        logger.error(f"Prompt template not found: {name}")
+    return template
@@ -0,0 +1,290 @@
+"""
+Shared rate limiting for all model clients.
+
+Every LLM call made through utils.run_llm_and_log goes through the process-wide
+RateLimiterRegistry, which provides:
+  - a token bucket per provider/model for requests-per-minute (RPM) and
+    tokens-per-minute (TPM) budgets,
+  - a concurrency cap per provider/model plus an optional global cap,
+  - retries with exponential backoff and full jitter that honour Retry-After
+    for rate-limit (429) and transient provider errors,
+  - per-model counters that lm_game.py writes to overview.jsonl.
+
+Limits default to "unlimited" (only backoff is active) and are configured with
+configure_rate_limits(), which lm_game.py calls from its CLI flags.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from .telemetry import note_queue_wait, note_retry
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to estimate TPM usage before a call
+CHARS_PER_TOKEN = 4
+
+
+class RateLimitError(Exception):
+    """Raised by clients when a provider rejects a request because of rate limits."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None) or getattr(exc, "http_status", None) or getattr(exc, "status", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Best-effort detection of 429 / quota errors across provider SDKs."""
+    if isinstance(exc, RateLimitError) or "RateLimit" in type(exc).__name__:
+        return True
+    if _status_code(exc) == 429:
+        return True
+    message = str(exc).lower()
+    return "429" in message or "rate limit" in message or "resource exhausted" in message or "resource_exhausted" in message
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Errors worth retrying: rate limits, 5xx responses, timeouts and dropped connections."""
+    if is_rate_limit_error(exc):
+        return True
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = _status_code(exc)
+    if status is not None and status >= 500:
+        return True
+    name = type(exc).__name__
+    return any(marker in name for marker in ("Timeout", "APIConnectionError", "ServiceUnavailable", "InternalServerError"))
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Reads a Retry-After hint from the exception or its HTTP response, if present."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                retry_after = headers.get("retry-after") or headers.get("Retry-After")
+            except Exception:
+                retry_after = None
+    try:
+        return max(0.0, float(retry_after)) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    async def acquire(self, amount: float) -> float:
+        """Waits until `amount` units are available and takes them. Returns seconds waited."""
+        # A single request larger than the whole budget can only wait for a full bucket
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) * 60.0 / self.per_minute
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def consume(self, amount: float) -> None:
+        """Charges usage discovered after the fact (e.g. output tokens); may go negative."""
+        self._refill()
+        self.tokens -= amount
+
+
+class ProviderLimiter:
+    """RPM/TPM buckets and a concurrency cap for one provider/model key."""
+
+    def __init__(self, key: str, rpm: float = 0, tpm: float = 0, max_concurrency: int = 0):
+        self.key = key
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
+
+class RateLimiterRegistry:
+    """Process-wide registry of limiters, shared by every client and every game in the process."""
+
+    def __init__(self):
+        self.default_limits: Tuple[float, float, int] = (0, 0, 0)
+        self.overrides: Dict[str, Tuple[float, float, int]] = {}
+        self.max_retries = 5
+        self.base_delay = 1.0
+        self.max_delay = 60.0
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self.stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {
+                "requests": 0,
+                "rate_limited": 0,
+                "transient_errors": 0,
+                "retries": 0,
+                "failures": 0,
+                "wait_seconds": 0.0,
+                "backoff_seconds": 0.0,
+                "estimated_tokens": 0,
+            }
+        )
+
+    def configure(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_concurrency: int = 0,
+        global_max_concurrency: int = 0,
+        overrides: Optional[Dict[str, Tuple[float, float, int]]] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ) -> None:
+        self.default_limits = (rpm, tpm, max_concurrency)
+        self.overrides = dict(overrides or {})
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._global_semaphore = asyncio.Semaphore(global_max_concurrency) if global_max_concurrency > 0 else None
+        self._limiters.clear()
+
+    @staticmethod
+    def key_for(client) -> str:
+        return f"{getattr(client, 'provider', 'generic')}/{client.model_name}"
+
+    def limiter_for(self, client) -> ProviderLimiter:
+        key = self.key_for(client)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            provider = key.split("/", 1)[0]
+            # Most specific override wins: "provider/model", then "provider", then defaults
+            limits = self.overrides.get(key) or self.overrides.get(provider) or self.default_limits
+            limiter = ProviderLimiter(key, *limits)
+            self._limiters[key] = limiter
+        return limiter
+
+    def _backoff_delay(self, attempt: int, exc: BaseException) -> float:
+        retry_after = retry_after_seconds(exc)
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    async def call(self, client, make_call: Callable[[], Awaitable[str]], prompt_chars: int = 0) -> str:
+        """
+        Runs `make_call` under the client's limits, retrying rate-limit and transient
+        errors with exponential backoff. Re-raises the last error once retries run out.
+        """
+        limiter = self.limiter_for(client)
+        stats = self.stats[client.model_name]
+        estimated_tokens = prompt_chars // CHARS_PER_TOKEN
+        attempt = 0
+        while True:
+            waited = 0.0
+            if limiter.requests is not None:
+                waited += await limiter.requests.acquire(1)
+            if limiter.tokens is not None:
+                waited += await limiter.tokens.acquire(estimated_tokens)
+            stats["wait_seconds"] += waited
+            note_queue_wait(waited)
+            stats["requests"] += 1
+            stats["estimated_tokens"] += estimated_tokens
+            try:
+                if limiter.semaphore is not None:
+                    async with limiter.semaphore:
+                        response = await self._call_global(make_call)
+                else:
+                    response = await self._call_global(make_call)
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    stats["rate_limited"] += 1
+                elif is_transient_error(e):
+                    stats["transient_errors"] += 1
+                else:
+                    stats["failures"] += 1
+                    raise
+                if attempt >= self.max_retries:
+                    stats["failures"] += 1
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                attempt += 1
+                stats["retries"] += 1
+                stats["backoff_seconds"] += delay
+                note_retry()
+                logger.warning(
+                    f"[{client.model_name}] {type(e).__name__} ({e}); retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            if limiter.tokens is not None and response:
+                output_tokens = len(response) // CHARS_PER_TOKEN
+                limiter.tokens.consume(output_tokens)
+                stats["estimated_tokens"] += output_tokens
+            return response
+
+    async def _call_global(self, make_call: Callable[[], Awaitable[str]]) -> str:
+        if self._global_semaphore is None:
+            return await make_call()
+        async with self._global_semaphore:
+            return await make_call()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            model: {name: round(value, 3) if isinstance(value, float) else value for name, value in counters.items()}
+            for model, counters in self.stats.items()
+        }
+
+
+rate_limiter = RateLimiterRegistry()
+
+
+def parse_rate_limit_overrides(spec: str) -> Dict[str, Tuple[float, float, int]]:
+    """
+    Parses "key=rpm:tpm[:concurrency],..." into limiter overrides. Keys are either a
+    provider ("openrouter") or "provider/model" ("anthropic/claude-opus-4-20250514").
+    Empty fields mean unlimited, e.g. "openai=500::8".
+    """
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, values = item.partition("=")
+        fields = (values.split(":") + ["", "", ""])[:3]
+        try:
+            rpm, tpm, concurrency = (float(fields[0] or 0), float(fields[1] or 0), int(fields[2] or 0))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit override '{item}'; expected key=rpm:tpm[:concurrency]")
+        overrides[key.strip()] = (rpm, tpm, concurrency)
+    return overrides
+
+
+def configure_rate_limits(**kwargs) -> None:
+    """Configures the shared registry; see RateLimiterRegistry.configure."""
+    rate_limiter.configure(**kwargs)
@@ -0,0 +1,136 @@
+"""
+Content-addressed on-disk cache for LLM responses.
+
+Responses are keyed by a hash of (model, system prompt, user prompt,
+temperature, max_tokens). The random seed block that clients inject into the
+system prompt is never part of the key, so byte-identical requests from reruns,
+resumed games or analysis passes hit the cache regardless of the seed.
+
+The store is a single SQLite file with size-based LRU eviction. The cache is
+opt-in (see --response_cache in lm_game.py) because live games rely on the
+injected seed for sampling variety.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Matches the block produced by utils.generate_random_seed()
+_RANDOM_SEED_RE = re.compile(r"<RANDOM SEED PLEASE IGNORE>.*?</RANDOM SEED>\s*", re.DOTALL)
+
+
+def strip_random_seed(text: str) -> str:
+    """Removes any injected random seed block from a prompt."""
+    if not text or "<RANDOM SEED" not in text:
+        return text or ""
+    return _RANDOM_SEED_RE.sub("", text)
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with size-based LRU eviction and hit/miss counters.
+    get/put block on SQLite; async callers run them in a worker thread (asyncio.to_thread).
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 512 * 1024 * 1024):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        )
+        logger.info(f"Response cache at {db_path} ({self._total_bytes / 1e6:.1f} MB, limit {max_bytes / 1e6:.1f} MB)")
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, prompt: str, temperature: float, max_tokens: Optional[int]) -> str:
+        payload = json.dumps(
+            [model, strip_random_seed(system_prompt), strip_random_seed(prompt), float(temperature), max_tokens],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, model: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats[model]["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.stats[model]["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self.stats[model]["stores"] += 1
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, model, size FROM responses ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for key, model, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.stats[model]["evictions"] += 1
+                if self._total_bytes <= self.max_bytes:
+                    return
+
+    def summary(self) -> Dict:
+        totals = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        for counters in self.stats.values():
+            for name, value in counters.items():
+                totals[name] += value
+        return {
+            "path": self.db_path,
+            "size_bytes": self._total_bytes,
+            "totals": totals,
+            "by_model": dict(self.stats),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
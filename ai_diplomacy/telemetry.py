@@ -0,0 +1,431 @@
+"""
+Structured telemetry for LLM calls.
+
+run_llm_and_log opens one LLMCallRecord per call (see track_call) and stores it
+in a ContextVar. Clients and the shared rate limiter fill it in as the call
+progresses:
+  - clients call record_usage(response) with the raw SDK response to capture
+    input/output token counts, how many input tokens were served from the
+    provider's prompt cache (and written to it, for Anthropic), and the time
+    to first byte if not yet marked,
+  - clients that see the response headers before the body (the Responses API
+    client) call mark_first_byte() as soon as the headers arrive, and streamed
+    responses (--stream_responses) mark it on the first text chunk, so ttfb_s
+    is the time to first token,
+  - BaseModelClient._collect_stream calls note_stream() when it read a
+    streamed response, with early_stopped=True if it stopped reading once the
+    parsable JSON block was complete (token counts are then usually missing),
+  - prompt_constructor.assemble_prompt calls note_prompt_assembly() with the
+    estimated prompt size and the sections it trimmed to fit the budget; the
+    next call record opened in the same task picks them up,
+  - the rate limiter calls note_retry() / note_queue_wait(), and hedging calls
+    note_hedge() / note_status().
+
+Finished records go to the TelemetryRecorder registered for the running game
+(telemetry_recorder_var). The recorder aggregates them per model and per
+(phase, stage) and buffers their JSON lines, which are appended to
+llm_metrics.jsonl in one write per phase (write_phase_breakdown) or when the
+buffer fills, and by close() at the end of the game. lm_game.py combines the
+aggregates with the PhaseTaskGraph timings into phase_metrics.jsonl.
+
+PhaseTaskGraph sets telemetry_scope for each node it runs, so calls are
+attributed to the scheduler phase and stage that issued them. Calls outside the
+graph (initialization, for example) get a stage derived from the response type.
+"""
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Scheduler stages grouped into the categories reported per phase
+STAGE_CATEGORIES = {
+    "negotiation": "negotiation",
+    "planning": "planning",
+    "orders": "orders",
+    "negotiation_diary": "diaries",
+    "order_diary": "diaries",
+    "phase_result_diary": "diaries",
+    "consolidation": "diaries",
+    "process": "process",
+    "record": "process",
+    "phase_summary": "process",
+    "state_update": "state_update",
+}
+
+
+def stage_for_response_type(response_type: str) -> str:
+    """Best-effort stage for calls made outside a PhaseTaskGraph."""
+    response_type = response_type or ""
+    if response_type in ("negotiation", "negotiation_message"):
+        return "negotiation"
+    if response_type == "diary_consolidation":
+        return "consolidation"
+    if response_type.startswith("negotiation_diary"):
+        return "negotiation_diary"
+    if response_type.startswith("order_diary"):
+        return "order_diary"
+    if "diary" in response_type:
+        return "phase_result_diary"
+    if response_type.startswith("order"):
+        return "orders"
+    if response_type.startswith("state_update"):
+        return "state_update"
+    if "plan" in response_type:
+        return "planning"
+    if response_type.startswith("initial"):
+        return "initialization"
+    return response_type or "other"
+
+
+@dataclass
+class LLMCallRecord:
+    model: str
+    provider: str
+    power: Optional[str]
+    phase: Optional[str]
+    response_type: str
+    stage: str
+    scope_phase: Optional[str]
+    prompt_chars: int
+    started_at: float = field(default_factory=time.time)
+    status: str = "pending"  # ok | empty | error | timeout | cache_hit
+    response_chars: int = 0
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_input_tokens: Optional[int] = None  # Part of input_tokens read from the provider's prompt cache
+    cache_write_tokens: Optional[int] = None  # Part of input_tokens written to the prompt cache (Anthropic)
+    ttfb_s: Optional[float] = None
+    latency_s: Optional[float] = None
+    queue_wait_s: float = 0.0
+    retries: int = 0
+    hedged: bool = False
+    prompt_tokens_est: Optional[int] = None  # Estimated by the prompt assembler, if it built the prompt
+    prompt_trimmed: Optional[Dict[str, int]] = None  # Section -> estimated tokens trimmed to fit the budget
+    streamed: bool = False
+    early_stopped: bool = False  # Stream closed after the parsable JSON block, before the model finished
+    error: Optional[str] = None
+    _t0: float = field(default_factory=time.monotonic, repr=False)
+
+    def to_json(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("_t0", None)
+        for key in ("ttfb_s", "latency_s", "queue_wait_s"):
+            if data[key] is not None:
+                data[key] = round(data[key], 4)
+        return data
+
+
+# (phase_name, stage) of the PhaseTaskGraph node currently running, if any
+telemetry_scope: ContextVar[Optional[Tuple[str, str]]] = ContextVar("telemetry_scope", default=None)
+_current_call: ContextVar[Optional[LLMCallRecord]] = ContextVar("llm_call_record", default=None)
+# (estimated tokens, trimmed sections) of the last prompt assembled in this task, until a call record takes it
+_pending_prompt: ContextVar[Optional[Tuple[int, Dict[str, int]]]] = ContextVar("pending_prompt_assembly", default=None)
+
+
+def _new_bucket() -> Dict[str, float]:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "cache_hits": 0,
+        "timeouts": 0,
+        "retries": 0,
+        "early_stops": 0,
+        "prompts_trimmed": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cached_input_tokens": 0,
+        "prompt_chars": 0,
+        "response_chars": 0,
+        "latency_s": 0.0,
+        "queue_wait_s": 0.0,
+    }
+
+
+def _add(bucket: Dict[str, float], record: LLMCallRecord) -> None:
+    bucket["calls"] += 1
+    bucket["errors"] += record.status in ("error", "empty")
+    bucket["cache_hits"] += record.status == "cache_hit"
+    bucket["timeouts"] += record.status == "timeout"
+    bucket["retries"] += record.retries
+    bucket["early_stops"] += record.early_stopped
+    bucket["prompts_trimmed"] += bool(record.prompt_trimmed)
+    bucket["input_tokens"] += record.input_tokens or 0
+    bucket["output_tokens"] += record.output_tokens or 0
+    bucket["cached_input_tokens"] += record.cached_input_tokens or 0
+    bucket["prompt_chars"] += record.prompt_chars
+    bucket["response_chars"] += record.response_chars
+    bucket["latency_s"] += record.latency_s or 0.0
+    bucket["queue_wait_s"] += record.queue_wait_s
+
+
+def _rounded(bucket: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(value, 3) if isinstance(value, float) else value for name, value in bucket.items()}
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+class TelemetryRecorder:
+    """Collects the LLM call records of one game and writes them as JSONL."""
+
+    def __init__(self, metrics_path: Optional[str] = None, max_buffered_records: int = 500):
+        self.metrics_path = metrics_path
+        self.max_buffered_records = max_buffered_records
+        self._buffer: List[str] = []
+        self._by_model: Dict[str, Dict[str, float]] = defaultdict(_new_bucket)
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._ttfbs: Dict[str, List[float]] = defaultdict(list)
+        self._by_phase: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(lambda: defaultdict(_new_bucket))
+
+    def emit(self, record: LLMCallRecord) -> None:
+        model_key = f"{record.provider}/{record.model}"
+        _add(self._by_model[model_key], record)
+        if record.status != "cache_hit":
+            if record.latency_s is not None:
+                self._latencies[model_key].append(record.latency_s)
+            if record.ttfb_s is not None:
+                self._ttfbs[model_key].append(record.ttfb_s)
+        _add(self._by_phase[record.scope_phase or record.phase or "unknown"][record.stage], record)
+        if self.metrics_path:
+            # Emitted on the event loop after every call; the file is written per phase, not per call
+            self._buffer.append(json.dumps(record.to_json()) + "\n")
+            if len(self._buffer) >= self.max_buffered_records:
+                self.flush()
+
+    def flush(self) -> None:
+        """Appends the buffered call records to llm_metrics.jsonl."""
+        if not self._buffer:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            with open(self.metrics_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        except Exception as e:
+            logger.error(f"Failed to write LLM metrics to {self.metrics_path}: {e}")
+
+    def close(self) -> None:
+        self.flush()
+
+    def phase_breakdown(self, graph) -> Dict[str, Any]:
+        """
+        Per-category breakdown for one finished PhaseTaskGraph: wall time (first
+        start to last end), busy time (sum of node durations) and the LLM calls,
+        tokens, latency and retries attributed to the category.
+        """
+        llm_stages = self._by_phase.pop(graph.phase_name, {})
+        categories: Dict[str, Dict[str, Any]] = {}
+
+        def _category(name: str) -> Dict[str, Any]:
+            return categories.setdefault(name, {"wall_s": 0.0, "busy_s": 0.0, "nodes": 0, "llm": _new_bucket()})
+
+        spans: Dict[str, List[float]] = {}
+        for node in graph.nodes.values():
+            name = STAGE_CATEGORIES.get(node.stage, node.stage)
+            entry = _category(name)
+            entry["nodes"] += 1
+            entry["busy_s"] += node.duration
+            if node.start is not None and node.end is not None:
+                span = spans.setdefault(name, [node.start, node.end])
+                span[0], span[1] = min(span[0], node.start), max(span[1], node.end)
+        for name, (start, end) in spans.items():
+            categories[name]["wall_s"] = end - start
+        for stage, bucket in llm_stages.items():
+            llm = _category(STAGE_CATEGORIES.get(stage, stage))["llm"]
+            for key, value in bucket.items():
+                llm[key] += value
+
+        return {
+            "phase": graph.phase_name,
+            "wall_s": round(graph.wall_time, 3),
+            "categories": {
+                name: {
+                    "wall_s": round(entry["wall_s"], 3),
+                    "busy_s": round(entry["busy_s"], 3),
+                    "nodes": entry["nodes"],
+                    "llm": _rounded(entry["llm"]),
+                }
+                for name, entry in categories.items()
+            },
+        }
+
+    def write_phase_breakdown(self, graph, path: str) -> None:
+        """Appends the phase breakdown as one JSON line and flushes the phase's call records."""
+        self.flush()
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.phase_breakdown(graph)) + "\n")
+        except Exception as e:
+            logger.error(f"Failed to write phase metrics to {path}: {e}")
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per provider/model totals plus latency percentiles and output throughput."""
+        result = {}
+        for model_key, bucket in self._by_model.items():
+            latencies = sorted(self._latencies.get(model_key, []))
+            ttfbs = sorted(self._ttfbs.get(model_key, []))
+            entry = _rounded(bucket)
+            entry["latency_p50_s"] = _percentile(latencies, 0.5)
+            entry["latency_p95_s"] = _percentile(latencies, 0.95)
+            entry["ttfb_p50_s"] = _percentile(ttfbs, 0.5)
+            entry["output_tokens_per_s"] = (
+                round(bucket["output_tokens"] / bucket["latency_s"], 2) if bucket["latency_s"] > 0 else None
+            )
+            entry["cached_input_share"] = (
+                round(bucket["cached_input_tokens"] / bucket["input_tokens"], 3) if bucket["input_tokens"] else None
+            )
+            result[model_key] = entry
+        return result
+
+
+# The running game's recorder (a ContextVar so concurrent games record separately)
+telemetry_recorder_var: ContextVar[Optional[TelemetryRecorder]] = ContextVar("telemetry_recorder", default=None)
+
+
+@contextmanager
+def track_call(client, power_name: Optional[str], phase: Optional[str], response_type: str, prompt_chars: int) -> Iterator[LLMCallRecord]:
+    """Opens a call record for the duration of the block and emits it on exit."""
+    scope = telemetry_scope.get()
+    record = LLMCallRecord(
+        model=client.model_name,
+        provider=getattr(client, "provider", "generic"),
+        power=power_name,
+        phase=phase,
+        response_type=response_type,
+        stage=scope[1] if scope else stage_for_response_type(response_type),
+        scope_phase=scope[0] if scope else None,
+        prompt_chars=prompt_chars,
+    )
+    pending = _pending_prompt.get()
+    if pending is not None:
+        record.prompt_tokens_est, trimmed = pending
+        record.prompt_trimmed = trimmed or None
+        _pending_prompt.set(None)
+    token = _current_call.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record.status = "error"
+        record.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_call.reset(token)
+        if record.latency_s is None:
+            record.latency_s = time.monotonic() - record._t0
+        recorder = telemetry_recorder_var.get()
+        if recorder is not None:
+            recorder.emit(record)
+
+
+def finish_call(record: LLMCallRecord, response: str) -> None:
+    """Sets the final status of a record from the response text."""
+    record.latency_s = time.monotonic() - record._t0
+    record.response_chars = len(response or "")
+    if record.status == "pending":
+        if not response:
+            record.status = "empty"
+        elif response.startswith("Error:"):
+            record.status = "error"
+        else:
+            record.status = "ok"
+
+
+def current_call() -> Optional[LLMCallRecord]:
+    return _current_call.get()
+
+
+def mark_first_byte() -> None:
+    record = _current_call.get()
+    if record is not None and record.ttfb_s is None:
+        record.ttfb_s = time.monotonic() - record._t0
+
+
+def _usage_field(usage: Any, name: str) -> Any:
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+def _usage_value(usage: Any, *names: str) -> Optional[int]:
+    for name in names:
+        value = _usage_field(usage, name)
+        if isinstance(value, (int, float)):
+            return int(value)
+    return None
+
+
+def record_usage(response: Any) -> None:
+    """
+    Reads token counts from an SDK response (OpenAI-compatible `usage`, Anthropic
+    `usage`, Gemini `usage_metadata`, or a Responses API JSON dict). input_tokens
+    is the whole prompt, cached or not, for every provider.
+    """
+    record = _current_call.get()
+    if record is None or response is None:
+        return
+    mark_first_byte()
+    try:
+        usage = response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None)
+        if usage is None:
+            usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        record.input_tokens = _usage_value(usage, "prompt_tokens", "input_tokens", "prompt_token_count")
+        record.output_tokens = _usage_value(usage, "completion_tokens", "output_tokens", "candidates_token_count")
+        # Anthropic reports cache reads and writes apart from input_tokens
+        cache_read = _usage_value(usage, "cache_read_input_tokens")
+        cache_write = _usage_value(usage, "cache_creation_input_tokens")
+        if record.input_tokens is not None and (cache_read or cache_write):
+            record.input_tokens += (cache_read or 0) + (cache_write or 0)
+        record.cache_write_tokens = cache_write
+        if cache_read is None:
+            # DeepSeek, Gemini, then OpenAI chat completions / Responses API details
+            cache_read = _usage_value(usage, "prompt_cache_hit_tokens", "cached_content_token_count")
+        if cache_read is None:
+            details = _usage_field(usage, "prompt_tokens_details") or _usage_field(usage, "input_tokens_details")
+            if details is not None:
+                cache_read = _usage_value(details, "cached_tokens")
+        record.cached_input_tokens = cache_read
+    except Exception as e:
+        logger.debug(f"Could not read token usage from {type(response).__name__}: {e}")
+
+
+def note_retry() -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.retries += 1
+
+
+def note_queue_wait(seconds: float) -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.queue_wait_s += seconds
+
+
+def note_prompt_assembly(tokens: int, trimmed: Dict[str, int]) -> None:
+    _pending_prompt.set((tokens, dict(trimmed)))
+
+
+def note_stream(early_stopped: bool) -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.streamed = True
+        record.early_stopped = early_stopped
+
+
+def note_hedge() -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.hedged = True
+
+
+def note_status(status: str) -> None:
+    record = _current_call.get()
+    if record is not None:
+        record.status = status
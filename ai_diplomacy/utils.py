@@ -1,4 +1,5 @@
 from dotenv import load_dotenv
+import asyncio
 import logging
 import os
 from typing import Dict, List, Tuple, Set, Optional
@@ -7,6 +8,14 @@ import csv
 from typing import TYPE_CHECKING
 import random
 import string
+from contextvars import ContextVar
+
+from .rate_limit import rate_limiter
+from .hedging import hedged_call
+from .telemetry import track_call, finish_call
+from .llm_log import FIELDNAMES as LLM_LOG_FIELDNAMES, get_llm_log_writer
+from .phase_context import PhaseContext, get_phase_context
+from .prompt_registry import get_prompt_registry
 
 # Avoid circular import for type hinting
 if TYPE_CHECKING:
@@ -20,6 +29,11 @@ logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
+# Describes the LLM call currently in flight (power_name, phase, response_type).
+# Set by run_llm_and_log so clients that need to know *what* is being asked
+# (e.g. ReplayClient) can look it up without changing generate_response().
+llm_call_context: ContextVar[Optional[Dict[str, Optional[str]]]] = ContextVar("llm_call_context", default=None)
+
 
 def assign_models_to_powers() -> Dict[str, str]:
     """
@@ -64,14 +78,9 @@ def assign_models_to_powers() -> Dict[str, str]:
 def gather_possible_orders(game: Game, power_name: str) -> Dict[str, List[str]]:
     """
     Returns a dictionary mapping each orderable location to the list of valid orders.
+    Computed once per board via the phase context; the returned dict is the caller's own copy.
     """
-    orderable_locs = game.get_orderable_locations(power_name)
-    all_possible = game.get_all_possible_orders()
-
-    result = {}
-    for loc in orderable_locs:
-        result[loc] = all_possible.get(loc, [])
-    return result
+    return dict(get_phase_context(game).possible_orders(power_name))
 
 
 async def get_valid_orders(
@@ -87,6 +96,7 @@ async def get_valid_orders(
     agent_private_diary_str: Optional[str] = None, # Added new parameter
     log_file_path: str = None,
     phase: str = None,
+    phase_context: Optional[PhaseContext] = None,
 ) -> List[str]:
     """
     Tries up to 'max_retries' to generate and validate orders.
@@ -107,6 +117,7 @@ async def get_valid_orders(
         agent_private_diary_str=agent_private_diary_str, # Pass the diary string
         log_file_path=log_file_path,
         phase=phase,
+        phase_context=phase_context,
     )
     
     # Initialize list to track invalid order information
@@ -266,19 +277,20 @@ def normalize_and_compare_orders(
     return orders_not_accepted, orders_not_issued
 
 
-# Helper to load prompt text from file relative to the expected 'prompts' dir
+# Helper to load prompt text from the 'prompts' dir (served from the in-memory prompt registry)
 def load_prompt(filename: str) -> str:
-    """Helper to load prompt text from file"""
-    # Assuming execution from the root or that the path resolves correctly
-    # Consider using absolute paths or pkg_resources if needed for robustness
-    prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', filename)
-    try:
-        with open(prompt_path, "r", encoding='utf-8') as f: # Added encoding
+    """Helper to load prompt text, stripped of surrounding whitespace ("" if not found)"""
+    registry = get_prompt_registry()
+    name = registry.name_for_path(filename) if os.path.isabs(filename) else filename
+    template = registry.get(name) if name else None
+    if template is not None:
+        return template.stripped().text
+    if os.path.isabs(filename) and name is None and os.path.exists(filename):
+        # Outside the prompts directory: not registered, read it directly
+        with open(filename, "r", encoding='utf-8') as f:
             return f.read().strip()
-    except FileNotFoundError:
-        logger.error(f"Prompt file not found: {prompt_path}")
-        # Return an empty string or raise an error, depending on desired handling
-        return ""
+    logger.error(f"Prompt file not found: {filename}")
+    return ""
 
 
 # == New LLM Response Logging Function ==
@@ -292,7 +304,24 @@ def log_llm_response(
     raw_response: str,
     success: str,  # Changed from bool to str
 ):
-    """Appends a raw LLM response to a CSV log file."""
+    """
+    Appends a raw LLM response to the log. If a background writer is running for
+    this path (see llm_log.py) the row is only queued; otherwise it is appended
+    to the CSV synchronously.
+    """
+    row = {
+        "model": model_name,
+        "power": power_name if power_name else "game", # Use 'game' if no specific power
+        "phase": phase,
+        "response_type": response_type,
+        "raw_input": raw_input_prompt,
+        "raw_response": raw_response,
+        "success": success,
+    }
+    writer = get_llm_log_writer(log_file_path)
+    if writer is not None:
+        writer.submit(row)
+        return
     try:
         # Ensure the directory exists
         log_dir = os.path.dirname(log_file_path)
@@ -303,22 +332,12 @@ def log_llm_response(
         file_exists = os.path.isfile(log_file_path)
 
         with open(log_file_path, "a", newline="", encoding="utf-8") as csvfile:
-            # Added "raw_input" to fieldnames
-            fieldnames = ["model", "power", "phase", "response_type", "raw_input", "raw_response", "success"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            csv_writer = csv.DictWriter(csvfile, fieldnames=LLM_LOG_FIELDNAMES)
 
             if not file_exists:
-                writer.writeheader()  # Write header only if file is new
+                csv_writer.writeheader()  # Write header only if file is new
 
-            writer.writerow({
-                "model": model_name,
-                "power": power_name if power_name else "game", # Use 'game' if no specific power
-                "phase": phase,
-                "response_type": response_type,
-                "raw_input": raw_input_prompt, # Added raw_input to the row
-                "raw_response": raw_response,
-                "success": success,
-            })
+            csv_writer.writerow(row)
     except Exception as e:
         logger.error(f"Failed to log LLM response to {log_file_path}: {e}", exc_info=True)
 
@@ -332,15 +351,64 @@ async def run_llm_and_log(
     phase: str, # Kept for context, but not used for logging here
     response_type: str, # Kept for context, but not used for logging here
     temperature: float = 0.0,
+    deadline: Optional[float] = None,
+    cache_prefix_chars: int = 0,
 ) -> str:
-    """Calls the client's generate_response and returns the raw output. Logging is handled by the caller."""
+    """
+    Calls the client's generate_response and returns the raw output. Logging is handled by the caller.
+    `deadline` (seconds) overrides the configured per-response-type deadline; on timeout "" is returned
+    so the caller falls back. Slow calls may be hedged, see hedging.py.
+    `cache_prefix_chars` is the length of the start of `prompt` that is the same on every call (e.g.
+    order_prompt_prefix); clients with explicit prompt caching put a cache breakpoint there.
+    """
     raw_response = "" # Initialize in case of error
-    try:
-        raw_response = await client.generate_response(prompt, temperature=temperature)
-    except Exception as e:
-        # Log the API call error. The caller will decide how to log this in llm_responses.csv
-        logger.error(f"API Error during LLM call for {client.model_name}/{power_name}/{response_type} in phase {phase}: {e}", exc_info=True)
-        # raw_response remains "" indicating failure to the caller
+    prompt_chars = len(prompt) + len(getattr(client, "system_prompt", "") or "")
+    # One telemetry record per call (latency, tokens, retries); see telemetry.py
+    with track_call(client, power_name, phase, response_type, prompt_chars) as call_record:
+        response_cache = getattr(client, "response_cache", None)
+        cache_key = None
+        if response_cache is not None:
+            cache_key = response_cache.make_key(
+                client.model_name, client.system_prompt, prompt, temperature, getattr(client, "max_tokens", None)
+            )
+            # SQLite reads and commits run off the event loop (the cache serializes them with its own lock)
+            cached_response = await asyncio.to_thread(response_cache.get, cache_key, client.model_name)
+            if cached_response is not None:
+                logger.debug(f"Response cache hit for {client.model_name}/{power_name}/{response_type} in phase {phase}")
+                call_record.status = "cache_hit"
+                finish_call(call_record, cached_response)
+                return cached_response
+
+        context_token = llm_call_context.set(
+            {
+                "power_name": power_name,
+                "phase": phase,
+                "response_type": response_type,
+                "cache_prefix_chars": cache_prefix_chars,
+            }
+        )
+        try:
+            # All providers share one limiter registry: RPM/TPM buckets, concurrency caps and backoff on 429s
+            async def _attempt(target_client) -> str:
+                return await rate_limiter.call(
+                    target_client,
+                    lambda: target_client.generate_response(prompt, temperature=temperature),
+                    prompt_chars=len(prompt) + len(getattr(target_client, "system_prompt", "") or ""),
+                )
+
+            raw_response, answered_by = await hedged_call(client, response_type, _attempt, deadline=deadline)
+            # Never cache failures (they should be retried on the next run) or answers from a hedge model
+            if cache_key is not None and answered_by is client and raw_response and not raw_response.startswith("Error:"):
+                await asyncio.to_thread(response_cache.put, cache_key, client.model_name, raw_response)
+        except Exception as e:
+            # Log the API call error. The caller will decide how to log this in llm_responses.csv
+            logger.error(f"API Error during LLM call for {client.model_name}/{power_name}/{response_type} in phase {phase}: {e}", exc_info=True)
+            call_record.status = "error"
+            call_record.error = f"{type(e).__name__}: {e}"
+            # raw_response remains "" indicating failure to the caller
+        finally:
+            llm_call_context.reset(context_token)
+        finish_call(call_record, raw_response)
     return raw_response
 
 # This generates a few lines of random alphanum chars to inject into the 
@@ -0,0 +1,574 @@
+"""
+Benchmark for ai_diplomacy/json_extract.py.
+
+Replays the raw_response column of recorded llm_responses.csv files through the
+current extractors and through the regex cascades they replaced (copied below
+as legacy_*). Reports time per response and how many responses each version
+parses. Order-generation rows go to the order extractors; every other row goes
+to the JSON object extractors.
+
+Usage:
+    python benchmark_json_extraction.py results/*/llm_responses.csv
+    python benchmark_json_extraction.py --synthetic 500   # no recorded games at hand
+"""
+import argparse
+import ast
+import csv
+import glob
+import json
+import logging
+import random
+import re
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import json5
+import json_repair
+
+from ai_diplomacy.agent import DiplomacyAgent
+from ai_diplomacy.json_extract import extract_orders
+
+logger = logging.getLogger("benchmark_json_extraction")
+_NAME = "benchmark"
+
+ORDER_RESPONSE_TYPES = {"order_generation", "order"}
+
+
+##############################################################################
+# Previous implementations (DiplomacyAgent._extract_json_from_text,
+# DiplomacyAgent._clean_json_text and BaseModelClient._extract_moves)
+##############################################################################
+def legacy_extract_json(text: str) -> dict:
+    """Extract and parse JSON from text, handling common LLM response formats."""
+    if not text or not text.strip():
+        logger.warning(f"[{_NAME}] Empty text provided to JSON extractor")
+        return {}
+
+    # Store original text for debugging
+    original_text = text
+
+    # Preprocessing: Normalize common formatting issues
+    # This helps with the KeyError: '\n  "negotiation_summary"' problem
+    text = re.sub(r'\n\s+"(\w+)"\s*:', r'"\1":', text)  # Remove newlines before keys
+    # Fix specific patterns that cause trouble
+    problematic_patterns = [
+        'negotiation_summary', 'relationship_updates', 'updated_relationships',
+        'order_summary', 'goals', 'relationships', 'intent'
+    ]
+    for pattern in problematic_patterns:
+        text = re.sub(fr'\n\s*"{pattern}"', f'"{pattern}"', text)
+
+    # Try different patterns to extract JSON
+    # Order matters - try most specific patterns first
+    patterns = [
+        # Special handling for ```{{ ... }}``` format that some models use
+        r"```\s*\{\{\s*(.*?)\s*\}\}\s*```",
+        # JSON in code blocks with or without language specifier
+        r"```(?:json)?\s*\n(.*?)\n\s*```",
+        # JSON after "PARSABLE OUTPUT:" or similar
+        r"PARSABLE OUTPUT:\s*(\{.*?\})",
+        r"JSON:\s*(\{.*?\})",
+        # Any JSON object
+        r"(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})",
+        # Simple JSON in backticks
+        r"`(\{.*?\})`",
+    ]
+
+    # Try each pattern
+    for pattern_idx, pattern in enumerate(patterns):
+        matches = re.findall(pattern, text, re.DOTALL)
+        if matches:
+            for match_idx, match in enumerate(matches):
+                # Multiple attempts with different parsers
+                json_text = match.strip()
+
+                # Attempt 1: Standard JSON after basic cleaning
+                try:
+                    cleaned = legacy_clean_json_text(json_text)
+                    result = json.loads(cleaned)
+                    if isinstance(result, dict):
+                        logger.debug(f"[{_NAME}] Successfully parsed JSON object with pattern {pattern_idx}, match {match_idx}")
+                        return result
+                    else:
+                        logger.warning(f"[{_NAME}] Parsed JSON with pattern {pattern_idx}, match {match_idx}, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+                except json.JSONDecodeError as e_initial:
+                    logger.debug(f"[{_NAME}] Standard JSON parse failed: {e_initial}")
+
+                    # Attempt 1.5: Try surgical cleaning with original patterns if basic cleaning failed
+                    try:
+                        # Apply several different cleaning patterns from the old method
+                        cleaned_match_candidate = json_text
+
+                        # Pattern 1: Removes 'Sentence.' when followed by ',', '}', or ']'
+                        cleaned_match_candidate = re.sub(r'\s*([A-Z][\w\s,]*?\.(?:\s+[A-Z][\w\s,]*?\.)*)\s*(?=[,\}\]])', '', cleaned_match_candidate)
+
+                        # Pattern 2: Removes 'Sentence.' when it's at the very end, before the final '}' of the current scope
+                        cleaned_match_candidate = re.sub(r'\s*([A-Z][\w\s,]*?\.(?:\s+[A-Z][\w\s,]*?\.)*)\s*(?=\s*\}\s*$)', '', cleaned_match_candidate)
+
+                        # Pattern 3: Fix for newlines and spaces before JSON keys (common problem with LLMs)
+                        cleaned_match_candidate = re.sub(r'\n\s+"(\w+)"\s*:', r'"\1":', cleaned_match_candidate)
+
+                        # Pattern 4: Fix trailing commas in JSON objects
+                        cleaned_match_candidate = re.sub(r',\s*}', '}', cleaned_match_candidate)
+
+                        # Pattern 5: Handle specific known problematic patterns
+                        for pattern in problematic_patterns:
+                            cleaned_match_candidate = cleaned_match_candidate.replace(f'\n  "{pattern}"', f'"{pattern}"')
+
+                        # Pattern 6: Fix quotes - replace single quotes with double quotes for keys
+                        cleaned_match_candidate = re.sub(r"'(\w+)'\s*:", r'"\1":', cleaned_match_candidate)
+
+                        # Only try parsing if cleaning actually changed something
+                        if cleaned_match_candidate != json_text:
+                            logger.debug(f"[{_NAME}] Surgical cleaning applied. Attempting to parse modified JSON.")
+                            return json.loads(cleaned_match_candidate)
+                    except json.JSONDecodeError as e_surgical:
+                        logger.debug(f"[{_NAME}] Surgical cleaning didn't work: {e_surgical}")
+
+                # Attempt 2: json5 (more forgiving)
+                try:
+                    result = json5.loads(json_text)
+                    if isinstance(result, dict):
+                        logger.debug(f"[{_NAME}] Successfully parsed JSON object with json5")
+                        return result
+                    else:
+                        logger.warning(f"[{_NAME}] Parsed with json5, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+                except Exception as e:
+                    logger.debug(f"[{_NAME}] json5 parse failed: {e}")
+
+                # Attempt 3: json-repair
+                try:
+                    result = json_repair.loads(json_text)
+                    if isinstance(result, dict):
+                        logger.debug(f"[{_NAME}] Successfully parsed JSON object with json-repair")
+                        return result
+                    else:
+                        logger.warning(f"[{_NAME}] Parsed with json-repair, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+                except Exception as e:
+                    logger.debug(f"[{_NAME}] json-repair failed: {e}")
+
+    # New Strategy: Parse markdown-like key-value pairs
+    # Example: **key:** value
+    # This comes after trying to find fenced JSON blocks but before broad fallbacks.
+    if not matches: # Only try if previous patterns didn't yield a dict from a match
+        try:
+            markdown_data = {}
+            # Regex to find **key:** value, where value can be multi-line until next **key:** or end of string
+            md_pattern = r"\*\*(?P<key>[^:]+):\*\*\s*(?P<value>[\s\S]*?)(?=(?:\n\s*\*\*|$))"
+            for match in re.finditer(md_pattern, text, re.DOTALL):
+                key_name = match.group('key').strip()
+                value_str = match.group('value').strip()
+                try:
+                    # Attempt to evaluate the value string as a Python literal
+                    # This handles lists, strings, numbers, booleans, None
+                    actual_value = ast.literal_eval(value_str)
+                    markdown_data[key_name] = actual_value
+                except (ValueError, SyntaxError) as e_ast:
+                    # If ast.literal_eval fails, it might be a plain string that doesn't look like a literal
+                    # Or it could be genuinely malformed. We'll take it as a string if it's not empty.
+                    if value_str: # Only add if it's a non-empty string
+                        markdown_data[key_name] = value_str # Store as string
+                    logger.debug(f"[{_NAME}] ast.literal_eval failed for key '{key_name}', value '{value_str[:50]}...': {e_ast}. Storing as string if non-empty.")
+
+            if markdown_data: # If we successfully extracted any key-value pairs this way
+                # Check if essential keys are present, if needed, or just return if any data found
+                # For now, if markdown_data is populated, we assume it's the intended structure.
+                logger.debug(f"[{_NAME}] Successfully parsed markdown-like key-value format. Data: {str(markdown_data)[:200]}")
+                return markdown_data
+            else:
+                logger.debug(f"[{_NAME}] No markdown-like key-value pairs found or parsed using markdown strategy.")
+        except Exception as e_md_parse:
+            logger.error(f"[{_NAME}] Error during markdown-like key-value parsing: {e_md_parse}", exc_info=True)
+
+    # Fallback: Try to find ANY JSON-like structure
+    try:
+        # Find the first { and last }
+        start = text.find('{')
+        end = text.rfind('}') + 1  # Include the closing brace
+        if start != -1 and end > start:
+            potential_json = text[start:end]
+
+            # Try all parsers on this extracted text
+            for parser_name, parser_func in [
+                ("json", json.loads),
+                ("json5", json5.loads),
+                ("json_repair", json_repair.loads)
+            ]:
+                try:
+                    cleaned = legacy_clean_json_text(potential_json) if parser_name == "json" else potential_json
+                    result = parser_func(cleaned)
+                    if isinstance(result, dict):
+                        logger.debug(f"[{_NAME}] Fallback parse succeeded with {parser_name}, got dict.")
+                        return result
+                    else:
+                        logger.warning(f"[{_NAME}] Fallback parse with {parser_name} succeeded, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+                except Exception as e:
+                    logger.debug(f"[{_NAME}] Fallback {parser_name} failed: {e}")
+
+            # If standard parsers failed, try aggressive cleaning
+            try:
+                # Remove common non-JSON text that LLMs might add
+                cleaned_text = re.sub(r'[^{}[\]"\',:.\d\w\s_-]', '', potential_json)
+                # Replace single quotes with double quotes (common LLM error)
+                text_fixed = re.sub(r"'([^']*)':", r'"\1":', cleaned_text)
+                text_fixed = re.sub(r': *\'([^\']*)\'', r': "\1"', text_fixed)
+
+                result = json.loads(text_fixed)
+                if isinstance(result, dict):
+                    logger.debug(f"[{_NAME}] Aggressive cleaning worked, got dict.")
+                    return result
+                else:
+                    logger.warning(f"[{_NAME}] Aggressive cleaning worked, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+            except json.JSONDecodeError:
+                pass
+
+    except Exception as e:
+        logger.debug(f"[{_NAME}] Fallback extraction failed: {e}")
+
+    # Last resort: Try json-repair on the entire text
+    try:
+        result = json_repair.loads(text)
+        if isinstance(result, dict):
+            logger.warning(f"[{_NAME}] Last resort json-repair succeeded, got dict.")
+            return result
+        else:
+            logger.warning(f"[{_NAME}] Last resort json-repair succeeded, but got type {type(result)} instead of dict. Content: {str(result)[:200]}")
+            # If even the last resort doesn't give a dict, return empty dict
+            return {}
+    except Exception as e:
+        logger.error(f"[{_NAME}] All JSON extraction attempts failed. Original text: {original_text[:500]}...")
+        return {}
+
+
+def legacy_clean_json_text(text: str) -> str:
+    """Clean common JSON formatting issues from LLM responses."""
+    if not text:
+        return text
+
+    # Remove trailing commas
+    text = re.sub(r',\s*}', '}', text)
+    text = re.sub(r',\s*]', ']', text)
+
+    # Fix newlines before JSON keys
+    text = re.sub(r'\n\s+"(\w+)"\s*:', r'"\1":', text)
+
+    # Replace single quotes with double quotes for keys
+    text = re.sub(r"'(\w+)'\s*:", r'"\1":', text)
+
+    # Remove comments (if any)
+    text = re.sub(r'//.*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+
+    # Fix unescaped quotes in values (basic attempt)
+    # This is risky but sometimes helps with simple cases
+    text = re.sub(r':\s*"([^"]*)"([^",}\]]+)"', r': "\1\2"', text)
+
+    # Remove any BOM or zero-width spaces
+    text = text.replace('\ufeff', '').replace('\u200b', '')
+
+    return text.strip()
+
+
+def legacy_extract_moves(raw_response: str, power_name: str) -> Optional[List[str]]:
+    """
+    Attempt multiple parse strategies to find JSON array of moves.
+
+    1. Regex for PARSABLE OUTPUT lines.
+    2. If that fails, also look for fenced code blocks with { ... }.
+    3. Attempt bracket-based fallback if needed.
+
+    Returns a list of move strings or None if everything fails.
+    """
+    # 1) Regex for "PARSABLE OUTPUT:{...}"
+    pattern = r"PARSABLE OUTPUT:\s*(\{[\s\S]*\})"
+    matches = re.search(pattern, raw_response, re.DOTALL)
+
+    if not matches:
+        # Some LLMs might not put the colon or might have triple backtick fences.
+        logger.debug(
+            f"[{_NAME}] Regex parse #1 failed for {power_name}. Trying alternative patterns."
+        )
+
+        # 1b) Check for inline JSON after "PARSABLE OUTPUT"
+        pattern_alt = r"PARSABLE OUTPUT\s*\{(.*?)\}\s*$"
+        matches = re.search(pattern_alt, raw_response, re.DOTALL)
+
+    if not matches:
+        # 1c) Check for **PARSABLE OUTPUT:** pattern (with asterisks)
+        logger.debug(
+            f"[{_NAME}] Regex parse #2 failed for {power_name}. Trying asterisk-wrapped pattern."
+        )
+        pattern_asterisk = r"\*\*PARSABLE OUTPUT:\*\*\s*(\{[\s\S]*?\})"
+        matches = re.search(pattern_asterisk, raw_response, re.DOTALL)
+
+    if not matches:
+        logger.debug(
+            f"[{_NAME}] Regex parse #3 failed for {power_name}. Trying triple-backtick code fences."
+        )
+
+    # 2) If still no match, check for triple-backtick code fences containing JSON
+    if not matches:
+        code_fence_pattern = r"```json\n(.*?)\n```"
+        matches = re.search(code_fence_pattern, raw_response, re.DOTALL)
+        if matches:
+            logger.debug(
+                f"[{_NAME}] Found triple-backtick JSON block for {power_name}."
+            )
+
+    # 2b) Also try plain ``` code fences without json marker
+    if not matches:
+        code_fence_plain = r"```\n(.*?)\n```"
+        matches = re.search(code_fence_plain, raw_response, re.DOTALL)
+        if matches:
+            logger.debug(
+                f"[{_NAME}] Found plain triple-backtick block for {power_name}."
+            )
+
+    # 2c) Try to find bare JSON object anywhere in the response
+    if not matches:
+        logger.debug(
+            f"[{_NAME}] No explicit markers found for {power_name}. Looking for bare JSON."
+        )
+        # Look for a JSON object that contains "orders" key
+        bare_json_pattern = r'(\{[^{}]*"orders"\s*:\s*\[[^\]]*\][^{}]*\})'
+        matches = re.search(bare_json_pattern, raw_response, re.DOTALL)
+        if matches:
+            logger.debug(
+                f"[{_NAME}] Found bare JSON object with 'orders' key for {power_name}."
+            )
+
+    # 3) Attempt to parse JSON if we found anything
+    json_text = None
+    if matches:
+        # Add braces back around the captured group if needed
+        captured = matches.group(1).strip()
+        if captured.startswith(r"{{"):
+            json_text = captured[1:-1]
+        elif captured.startswith(r"{"):
+            json_text = captured
+        else:
+            json_text = "{%s}" % captured
+
+        json_text = json_text.strip()
+
+    if not json_text:
+        logger.debug(
+            f"[{_NAME}] No JSON text found in LLM response for {power_name}."
+        )
+        return None
+
+    # 3a) Try JSON loading
+    try:
+        data = json.loads(json_text)
+        return data.get("orders", None)
+    except json.JSONDecodeError as e:
+        logger.warning(
+            f"[{_NAME}] JSON decode failed for {power_name}: {e}. Trying to fix common issues."
+        )
+
+        # Try to fix common JSON issues
+        try:
+            # Remove trailing commas
+            fixed_json = re.sub(r',\s*([\}\]])', r'\1', json_text)
+            # Fix single quotes to double quotes
+            fixed_json = fixed_json.replace("'", '"')
+            # Try parsing again
+            data = json.loads(fixed_json)
+            logger.info(f"[{_NAME}] Successfully parsed JSON after fixes for {power_name}")
+            return data.get("orders", None)
+        except json.JSONDecodeError:
+            logger.warning(
+                f"[{_NAME}] JSON decode still failed after fixes for {power_name}. Trying to remove inline comments."
+            )
+
+            # Try to remove inline comments (// style)
+            try:
+                # Remove // comments from each line
+                lines = json_text.split('\n')
+                cleaned_lines = []
+                for line in lines:
+                    # Find // that's not inside quotes
+                    comment_pos = -1
+                    in_quotes = False
+                    escape_next = False
+                    for i, char in enumerate(line):
+                        if escape_next:
+                            escape_next = False
+                            continue
+                        if char == '\\':
+                            escape_next = True
+                            continue
+                        if char == '"' and not escape_next:
+                            in_quotes = not in_quotes
+                        if not in_quotes and line[i:i+2] == '//':
+                            comment_pos = i
+                            break
+
+                    if comment_pos >= 0:
+                        # Remove comment but keep any trailing comma
+                        cleaned_line = line[:comment_pos].rstrip()
+                    else:
+                        cleaned_line = line
+                    cleaned_lines.append(cleaned_line)
+
+                comment_free_json = '\n'.join(cleaned_lines)
+                # Also remove trailing commas after comment removal
+                comment_free_json = re.sub(r',\s*([\}\]])', r'\1', comment_free_json)
+
+                data = json.loads(comment_free_json)
+                logger.info(f"[{_NAME}] Successfully parsed JSON after removing inline comments for {power_name}")
+                return data.get("orders", None)
+            except json.JSONDecodeError:
+                logger.warning(
+                    f"[{_NAME}] JSON decode still failed after removing comments for {power_name}. Trying bracket fallback."
+                )
+
+    # 3b) Attempt bracket fallback: we look for the substring after "orders"
+    #     E.g. "orders: ['A BUD H']" and parse it. This is risky but can help with minor JSON format errors.
+    #     We only do this if we see something like "orders": ...
+    bracket_pattern = r'["\']orders["\']\s*:\s*\[([^\]]*)\]'
+    bracket_match = re.search(bracket_pattern, json_text, re.DOTALL)
+    if bracket_match:
+        try:
+            raw_list_str = "[" + bracket_match.group(1).strip() + "]"
+            moves = ast.literal_eval(raw_list_str)
+            if isinstance(moves, list):
+                return moves
+        except Exception as e2:
+            logger.warning(
+                f"[{_NAME}] Bracket fallback parse also failed for {power_name}: {e2}"
+            )
+
+    # If all attempts failed
+    return None
+
+
+##############################################################################
+# Corpus
+##############################################################################
+def load_corpus(paths: List[str]) -> List[Tuple[str, str]]:
+    """(response_type, raw_response) pairs from llm_responses.csv files."""
+    csv.field_size_limit(sys.maxsize)
+    corpus = []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                raw = row.get("raw_response") or ""
+                if raw.strip():
+                    corpus.append((row.get("response_type") or "", raw))
+    return corpus
+
+
+def synthetic_corpus(n: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """Responses in the formats models actually produce, padded with long reasoning text."""
+    rng = random.Random(seed)
+    words = "the fleet army support convoy hold move Paris Munich Vienna trust betray alliance".split()
+    orders = ["A PAR - BUR", "F BRE - MAO", "A MAR S A PAR - BUR", "F LON H"]
+    diary = {"negotiation_summary": "Agreed a DMZ in Burgundy.", "intent": "Hold the line {for now}",
+             "updated_relationships": {"GERMANY": "Friendly", "ENGLAND": "Neutral"}}
+    wrappers = [
+        lambda body: f"PARSABLE OUTPUT:\n{body}",
+        lambda body: f"```json\n{body}\n```",
+        lambda body: f"Here is my answer.\n```\n{body}\n```\nDone.",
+        lambda body: f"**PARSABLE OUTPUT:** {body}",
+        lambda body: body.replace('",', '", // note\n', 1),
+        lambda body: body[:-1] + ",}",
+        lambda body: body[: len(body) * 3 // 4],  # truncated at max_tokens
+    ]
+    corpus = []
+    for i in range(n):
+        reasoning = " ".join(rng.choice(words) for _ in range(rng.randint(50, 4000)))
+        if rng.random() < 0.3:
+            reasoning += " e.g. {like this} or {\"example\": true}"
+        if i % 2:
+            body = json.dumps({"orders": rng.sample(orders, 3)}, indent=2)
+            response_type = "order_generation"
+        else:
+            body = json.dumps(diary, indent=2)
+            response_type = "negotiation_diary"
+        corpus.append((response_type, f"{reasoning}\n\n{rng.choice(wrappers)(body)}"))
+    return corpus
+
+
+##############################################################################
+# Benchmark
+##############################################################################
+def _time(func: Callable[[str], object], texts: List[str], repeat: int) -> Tuple[List[object], List[float]]:
+    results, timings = [], []
+    for text in texts:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(text)
+            best = min(best, time.perf_counter() - start)
+        results.append(result)
+        timings.append(best)
+    return results, timings
+
+
+def _report(label: str, texts: List[str], legacy, current, repeat: int) -> None:
+    if not texts:
+        return
+    legacy_results, legacy_times = _time(legacy, texts, repeat)
+    current_results, current_times = _time(current, texts, repeat)
+    legacy_ok = sum(bool(r) for r in legacy_results)
+    current_ok = sum(bool(r) for r in current_results)
+    regressions = [i for i, (old, new) in enumerate(zip(legacy_results, current_results)) if old and not new]
+    identical = sum(old == new for old, new in zip(legacy_results, current_results))
+
+    print(f"\n== {label}: {len(texts)} responses, mean {statistics.mean(map(len, texts)):.0f} chars ==")
+    for name, ok, times in (("legacy", legacy_ok, legacy_times), ("current", current_ok, current_times)):
+        ordered = sorted(times)
+        print(
+            f"  {name:8s} parsed {ok:5d}  total {sum(times) * 1000:9.1f} ms  "
+            f"mean {statistics.mean(times) * 1e6:8.1f} us  p95 {ordered[int(0.95 * (len(ordered) - 1))] * 1e6:8.1f} us  "
+            f"max {ordered[-1] * 1e3:7.2f} ms"
+        )
+    print(f"  speedup {sum(legacy_times) / max(sum(current_times), 1e-9):.1f}x, identical results {identical}/{len(texts)}")
+    both = [i for i, (old, new) in enumerate(zip(legacy_results, current_results)) if old and new]
+    if both:
+        legacy_both = sum(legacy_times[i] for i in both)
+        current_both = sum(current_times[i] for i in both)
+        print(
+            f"  on the {len(both)} responses both parse: legacy {legacy_both * 1000:.1f} ms, "
+            f"current {current_both * 1000:.1f} ms ({legacy_both / max(current_both, 1e-9):.1f}x)"
+        )
+    if regressions:
+        print(f"  parsed by legacy only: {len(regressions)} (first indices: {regressions[:10]})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark JSON/order extraction on recorded LLM responses.")
+    parser.add_argument("csv_files", nargs="*", help="llm_responses.csv files (default: results/*/llm_responses.csv)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N synthetic responses to the corpus.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per response; the fastest is kept (default: 3).")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # The extractors log every failed attempt
+    paths = args.csv_files or glob.glob("results/*/llm_responses.csv")
+    corpus = load_corpus(paths)
+    if args.synthetic:
+        corpus += synthetic_corpus(args.synthetic)
+    if not corpus:
+        print("No responses found; pass llm_responses.csv files or --synthetic N.")
+        return
+    print(f"Corpus: {len(corpus)} responses from {len(paths)} file(s)" + (f" + {args.synthetic} synthetic" if args.synthetic else ""))
+
+    agent = SimpleNamespace(power_name=_NAME)
+    order_texts = [raw for response_type, raw in corpus if response_type in ORDER_RESPONSE_TYPES]
+    other_texts = [raw for response_type, raw in corpus if response_type not in ORDER_RESPONSE_TYPES]
+    _report("orders", order_texts, lambda t: legacy_extract_moves(t, _NAME), extract_orders, args.repeat)
+    _report(
+        "json objects",
+        other_texts,
+        legacy_extract_json,
+        lambda t: DiplomacyAgent._extract_json_from_text(agent, t),
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
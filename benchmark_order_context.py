@@ -0,0 +1,132 @@
+"""
+Benchmark for the scoped order context (summarize_other_units).
+
+generate_rich_order_context over every location on the board emits a full
+<UnitContext> block for each unit of all seven powers. The scoped variant keeps
+full detail for the power's own units and gives every other unit one line. It
+is the first fallback build_context_prompt uses when a prompt is over
+--prompt_token_budget, so the size columns are what that fallback saves in the
+prompts that are actually sent.
+
+The state update used to build the full context every phase for every power
+and then drop it (state_update_prompt.txt has no context placeholder), so for
+the state update the only saving was the build time in the "all locations"
+column; that dead call has since been removed.
+
+This script replays games and compares, per power and phase, the time to build
+each variant and its size in characters and estimated tokens (chars / 4).
+
+Usage:
+    python benchmark_order_context.py results/*/lmvsgame.json
+    python benchmark_order_context.py --random 20   # random orders, no recorded games at hand
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Iterator, List
+
+from diplomacy import Game
+
+from ai_diplomacy.possible_order_context import generate_rich_order_context, get_map_graph, own_unit_orders
+
+CHARS_PER_TOKEN = 4
+
+
+def replay_saved_game(path: str) -> Iterator[Game]:
+    """Yields the game at the start of every recorded phase, replaying the recorded orders."""
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    game = Game(map_name=saved.get("map", "standard"), rules=saved.get("rules", []))
+    for phase in saved.get("phases", []):
+        if phase.get("name") != game.get_current_phase():
+            print(f"{path}: replay diverged at {phase.get('name')} (engine at {game.get_current_phase()}); stopping")
+            return
+        yield game
+        for power_name, orders in (phase.get("orders") or {}).items():
+            if power_name in game.powers and orders:
+                game.set_orders(power_name, orders)
+        if game.is_game_done:
+            return
+        game.process()
+
+
+def random_game(num_phases: int, seed: int = 0) -> Iterator[Game]:
+    rng = random.Random(seed)
+    game = Game()
+    for _ in range(num_phases):
+        if game.is_game_done:
+            return
+        yield game
+        possible = game.get_all_possible_orders()
+        for power_name in game.powers:
+            orders = [rng.choice(possible[loc]) for loc in game.get_orderable_locations(power_name) if possible.get(loc)]
+            game.set_orders(power_name, orders)
+        game.process()
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def benchmark(games: Iterator[Game]) -> None:
+    full_times: List[float] = []
+    scoped_times: List[float] = []
+    full_sizes: List[int] = []
+    scoped_sizes: List[int] = []
+    phases = 0
+    for game in games:
+        phases += 1
+        get_map_graph(game.map)  # Built once per map; keep it out of the per-call numbers
+        board_state = game.get_state()
+        all_possible = game.get_all_possible_orders()
+        for power_name, power in game.powers.items():
+            if power.is_eliminated():
+                continue
+            full, full_s = _timed(lambda: generate_rich_order_context(game, power_name, all_possible, board_state=board_state))
+            scoped, scoped_s = _timed(lambda: generate_rich_order_context(
+                game,
+                power_name,
+                own_unit_orders(board_state, power_name, all_possible),
+                board_state=board_state,
+                summarize_other_units=True,
+            ))
+            full_times.append(full_s)
+            scoped_times.append(scoped_s)
+            full_sizes.append(len(full))
+            scoped_sizes.append(len(scoped))
+
+    if not full_times:
+        print("No phases to benchmark.")
+        return
+    print(f"{phases} phases, {len(full_times)} power contexts")
+    print(f"{'':<22}{'all locations':>16}{'scoped':>16}")
+    print(f"{'mean time (ms)':<22}{statistics.mean(full_times) * 1000:>16.2f}{statistics.mean(scoped_times) * 1000:>16.2f}")
+    print(f"{'mean size (chars)':<22}{statistics.mean(full_sizes):>16.0f}{statistics.mean(scoped_sizes):>16.0f}")
+    print(f"{'mean size (~tokens)':<22}{statistics.mean(full_sizes) / CHARS_PER_TOKEN:>16.0f}{statistics.mean(scoped_sizes) / CHARS_PER_TOKEN:>16.0f}")
+    print(f"{'total (~tokens)':<22}{sum(full_sizes) / CHARS_PER_TOKEN:>16.0f}{sum(scoped_sizes) / CHARS_PER_TOKEN:>16.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the full and the scoped (own units + one-line summary) order context.")
+    parser.add_argument("saved_games", nargs="*", help="Saved game JSON files (lm_game.py --output / lmvsgame.json).")
+    parser.add_argument("--random", type=int, default=0, help="Also benchmark N phases of a random-order game.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    def games() -> Iterator[Game]:
+        for path in args.saved_games:
+            yield from replay_saved_game(path)
+        if args.random:
+            yield from random_game(args.random, args.seed)
+
+    if not args.saved_games and not args.random:
+        parser.error("pass saved game files and/or --random N")
+    benchmark(games())
+
+
+if __name__ == "__main__":
+    main()
@@ -227,7 +227,7 @@ class Game(Jsonable):
                  'convoy_paths_dest', 'zobrist_hash', 'renderer', 'game_id', 'map_name', 'role', 'rules',
                  'message_history', 'state_history', 'result_history', 'status', 'timestamp_created', 'n_controls',
                  'deadline', 'registration_password', 'observer_level', 'controlled_powers', '_phase_wrapper_type',
-                 'phase_abbr', '_unit_owner_cache', 'daide_port', 'fixed_state', 'power_model_map', 'phase_summaries']
+                 'phase_abbr', '_unit_owner_cache', '_possible_orders_cache', 'daide_port', 'fixed_state', 'power_model_map', 'phase_summaries']
     zobrist_tables = {}
     rule_cache = ()
     model = {
@@ -301,6 +301,7 @@ class Game(Jsonable):
         self.phase_summaries = {}
         # Caches
         self._unit_owner_cache = None               # {(unit, coast_required): owner}
+        self._possible_orders_cache = None          # (board key, {loc: [possible orders]})
 
         # Remove rules from kwargs (if present), as we want to add them manually using self.add_rule().
         rules = kwargs.pop(strings.RULES, None)
@@ -1325,6 +1326,7 @@ class Game(Jsonable):
         """ Clears all caches """
         self.convoy_paths_possible, self.convoy_paths_dest = None, None
         self._unit_owner_cache = None
+        self._possible_orders_cache = None
 
     def set_current_phase(self, new_phase):
         """ Changes the phase to the specified new phase (e.g. 'S1901M') """
@@ -1729,8 +1731,38 @@ class Game(Jsonable):
     def get_all_possible_orders(self):
         """ Computes a list of all possible orders for all locations
 
+            The result is cached per board position (Zobrist hash, phase, retreat options and rules) and the
+            cache is dropped by clear_cache(), so repeated calls on an unchanged board are cheap.
+
             :return: A dictionary with locations as keys, and their respective list of possible orders as values
         """
+        return {loc: list(orders) for loc, orders in self._get_cached_possible_orders().items()}
+
+    def get_possible_orders(self, power_name):
+        """ Returns the possible orders for each location a power has to order this phase (cached like
+            get_all_possible_orders)
+
+            :param power_name: The name of the power (e.g. 'FRANCE')
+            :return: A dictionary with the power's orderable locations as keys (e.g. {'PAR': ['A PAR H', ...], ...})
+        """
+        all_possible_orders = self._get_cached_possible_orders()
+        return {loc: list(all_possible_orders.get(loc, [])) for loc in self.get_orderable_locations(power_name)}
+
+    def _get_possible_orders_key(self):
+        """ Returns the key identifying the board position the possible orders were computed for """
+        retreats = tuple((power.name, tuple(sorted((unit, tuple(locs)) for unit, locs in power.retreats.items())))
+                         for power in self.powers.values() if power.retreats)
+        return self.get_hash(), self.get_current_phase(), retreats, tuple(self.rules)
+
+    def _get_cached_possible_orders(self):
+        """ Returns the (shared, not to be modified) possible orders for the current board, computing them once """
+        key = self._get_possible_orders_key()
+        if self._possible_orders_cache is None or self._possible_orders_cache[0] != key:
+            self._possible_orders_cache = (key, self._compute_all_possible_orders())
+        return self._possible_orders_cache[1]
+
+    def _compute_all_possible_orders(self):
+        """ Computes a list of all possible orders for all locations (see get_all_possible_orders) """
         # pylint: disable=too-many-branches,too-many-nested-blocks
         possible_orders = {loc.upper(): set() for loc in self.map.locs}
 
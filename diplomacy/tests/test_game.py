@@ -667,3 +667,35 @@ def test_unit_owner():
 
     assert game._unit_owner('F SEV', coast_required=0) is game.get_power('RUSSIA')                                      # pylint: disable=protected-access
     assert game._unit_owner('F SEV', coast_required=1) is game.get_power('RUSSIA')                                      # pylint: disable=protected-access
+
+def test_possible_orders_cache():
+    """ Test that possible orders are cached per board position and invalidated when the board changes """
+    game = Game()
+    possible_orders = game.get_all_possible_orders()
+    cache = game._possible_orders_cache                                                                                # pylint: disable=protected-access
+    assert cache is not None
+
+    # Same board: served from the cache, and callers get their own copies
+    possible_orders['PAR'].append('A PAR - MOON')
+    assert game.get_all_possible_orders() == game._compute_all_possible_orders()                                       # pylint: disable=protected-access
+    assert game._possible_orders_cache is cache                                                                        # pylint: disable=protected-access
+    assert 'A PAR - MOON' not in game.get_all_possible_orders()['PAR']
+
+    # Per-power view
+    france_orders = game.get_possible_orders('FRANCE')
+    assert sorted(france_orders) == sorted(game.get_orderable_locations('FRANCE'))
+    assert 'A PAR - BUR' in france_orders['PAR']
+
+    # Setting orders does not change the board
+    game.set_orders('FRANCE', ['A PAR - BUR'])
+    assert game._possible_orders_cache is cache                                                                        # pylint: disable=protected-access
+
+    # Changing units invalidates the cache
+    game.set_units('FRANCE', ['A BUR'])
+    assert 'BUR' in game.get_possible_orders('FRANCE')
+    assert game.get_all_possible_orders() == game._compute_all_possible_orders()                                       # pylint: disable=protected-access
+
+    # Processing moves to a new phase with new possible orders
+    game.process()
+    assert game.get_current_phase() == 'F1901M'
+    assert game.get_all_possible_orders() == game._compute_all_possible_orders()                                       # pylint: disable=protected-access
@@ -5,8 +5,10 @@ import dotenv
 import os
 import json
 import asyncio
+import functools
 from collections import defaultdict
 import concurrent.futures
+from contextvars import ContextVar
 
 # Suppress Gemini/PaLM gRPC warnings
 os.environ["GRPC_PYTHON_LOG_LEVEL"] = "40"  # ERROR level only
@@ -17,9 +19,12 @@ os.environ["GRPC_POLL_STRATEGY"] = "poll"  # Use 'poll' for macOS compatibility
 
 from diplomacy import Game
 from diplomacy.engine.message import GLOBAL, Message
-from diplomacy.utils.export import to_saved_game_format
 
-from ai_diplomacy.clients import load_model_client
+from ai_diplomacy.clients import configure_streaming, load_model_client
+from ai_diplomacy.response_cache import ResponseCache
+from ai_diplomacy.client_pool import configure_client_pool, aclose_all
+from ai_diplomacy.rate_limit import configure_rate_limits, parse_rate_limit_overrides, rate_limiter
+from ai_diplomacy.hedging import configure_hedging, model_error_stats_var, parse_key_values
 from ai_diplomacy.utils import (
     get_valid_orders,
     gather_possible_orders,
@@ -29,8 +34,20 @@ from ai_diplomacy.negotiations import conduct_negotiations
 from ai_diplomacy.planning import planning_phase
 from ai_diplomacy.game_history import GameHistory
 from ai_diplomacy.agent import DiplomacyAgent
-import ai_diplomacy.narrative
+from ai_diplomacy.narrative import (  # also patches Game
+    cancel_narratives,
+    get_phase_summary,
+    schedule_phase_narrative,
+    wait_for_narratives,
+)
 from ai_diplomacy.initialization import initialize_agent_state_ext
+from ai_diplomacy.phase_scheduler import PhaseTaskGraph
+from ai_diplomacy.telemetry import TelemetryRecorder, telemetry_recorder_var
+from ai_diplomacy.llm_log import LOG_FORMATS, start_llm_log_writer, close_llm_log_writer
+from ai_diplomacy.phase_context import get_phase_context, release_phase_context
+from ai_diplomacy.prompt_registry import get_prompt_registry
+from ai_diplomacy.game_output import GameOutputStream, compact_game_stream
+from ai_diplomacy.checkpoint import CHECKPOINT_FILENAME, CheckpointWriter, apply_agent_state, load_checkpoint
 
 dotenv.load_dotenv()
 
@@ -44,6 +61,21 @@ logging.basicConfig(
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("root").setLevel(logging.WARNING) # Assuming root handles AFC
 
+# Results folder of the game running in the current task, so concurrent games each get their own general_game.log
+_game_log_folder: ContextVar[str] = ContextVar("game_log_folder", default="")
+
+
+class _GameLogFilter(logging.Filter):
+    """Passes records from one game's tasks (and records from outside any game) to that game's log file."""
+
+    def __init__(self, result_folder: str):
+        super().__init__()
+        self.result_folder = result_folder
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        folder = _game_log_folder.get()
+        return not folder or folder == self.result_folder
+
 
 def parse_arguments():
     parser = argparse.ArgumentParser(
@@ -93,12 +125,230 @@ def parse_arguments():
         default="",
         help="Comma-separated list of 7 token limits (in order: AUSTRIA, ENGLAND, FRANCE, GERMANY, ITALY, RUSSIA, TURKEY). Overrides --max_tokens."
     )
+    parser.add_argument(
+        "--response_cache",
+        type=str,
+        default="",
+        help=(
+            "Path to an SQLite response cache shared across runs (e.g. results/response_cache.sqlite). "
+            "Byte-identical prompts are served from the cache instead of the API. Disabled by default "
+            "because live games rely on sampling variety."
+        ),
+    )
+    parser.add_argument(
+        "--response_cache_max_mb",
+        type=int,
+        default=512,
+        help="Size limit of the response cache in MB; least recently used entries are evicted (default: 512).",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=0,
+        help="Default requests-per-minute budget per provider/model (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--tpm",
+        type=float,
+        default=0,
+        help="Default tokens-per-minute budget per provider/model, estimated from prompt/response size (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--max_concurrent_requests",
+        type=int,
+        default=0,
+        help="Maximum in-flight requests per provider/model (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--global_max_concurrent_requests",
+        type=int,
+        default=0,
+        help="Maximum in-flight LLM requests across all providers (0 = unlimited).",
+    )
+    parser.add_argument(
+        "--rate_limits",
+        type=str,
+        default="",
+        help=(
+            "Per-provider or per-model overrides as 'key=rpm:tpm[:concurrency],...', where key is a provider "
+            "(openai, anthropic, gemini, deepseek, openrouter, together) or 'provider/model'. "
+            "Example: 'openrouter=60:200000:8,anthropic/claude-opus-4-20250514=50:30000'."
+        ),
+    )
+    parser.add_argument(
+        "--max_connections",
+        type=int,
+        default=100,
+        help="Connection pool size per shared provider transport (default: 100).",
+    )
+    parser.add_argument(
+        "--max_keepalive_connections",
+        type=int,
+        default=20,
+        help="Idle keep-alive connections kept per shared provider transport (default: 20).",
+    )
+    parser.add_argument(
+        "--disable_http2",
+        action="store_true",
+        help="Use HTTP/1.1 even when the 'h2' package is installed.",
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=5,
+        help="Retries for rate-limited or transient LLM errors, with exponential backoff and jitter (default: 5).",
+    )
+    parser.add_argument(
+        "--llm_deadlines",
+        type=str,
+        default="",
+        help=(
+            "Per-response-type deadlines in seconds as 'type=seconds,...' (e.g. 'order=120,negotiation=90,"
+            "default=300'; types as passed to run_llm_and_log). Calls past their deadline are cancelled and the caller's "
+            "fallback is used. Default: no deadlines."
+        ),
+    )
+    parser.add_argument(
+        "--hedge_percentile",
+        type=float,
+        default=0.0,
+        help=(
+            "Send a duplicate request when a call is slower than this percentile (0-1) of recent latencies "
+            "for the same model and response type; the first answer wins (0 = off, e.g. 0.9)."
+        ),
+    )
+    parser.add_argument(
+        "--hedge_min_delay",
+        type=float,
+        default=1.0,
+        help="Never hedge before this many seconds (default: 1.0).",
+    )
+    parser.add_argument(
+        "--hedge_models",
+        type=str,
+        default="",
+        help="Secondary model for hedged requests as 'primary=secondary,...'. Unlisted models hedge to themselves.",
+    )
+    parser.add_argument(
+        "--stream_responses",
+        action="store_true",
+        help=(
+            "Stream LLM responses (OpenAI-compatible, Anthropic, Gemini, Together and replay clients). TTFT is recorded "
+            "in llm_metrics.jsonl, and order, diary and state-update responses are cut off as soon as the JSON block "
+            "after 'PARSABLE OUTPUT:' is complete (Gemini streams are always read to the end)."
+        ),
+    )
+    parser.add_argument(
+        "--llm_log_format",
+        choices=LOG_FORMATS,
+        default="csv",
+        help=(
+            "Format of the LLM response log: plain llm_responses.csv (default, read by the analysis scripts), "
+            "gzip CSV/JSONL, or xz CSV/JSONL (smallest)."
+        ),
+    )
+    parser.add_argument(
+        "--llm_log_rotate_mb",
+        type=float,
+        default=0,
+        help="Start a new compressed log segment after this many MB of uncompressed rows (0 = single file).",
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default="",
+        help=(
+            "Resume the game in this results directory from its checkpoint.jsonl, after the last completed "
+            "phase. Model assignment comes from the checkpoint; results keep going to the same directory."
+        ),
+    )
+    parser.add_argument(
+        "--watch_prompts",
+        action="store_true",
+        help="Development aid: reload prompt files from ai_diplomacy/prompts when they change during a game.",
+    )
+    parser.add_argument(
+        "--prompt_token_budget",
+        type=int,
+        default=0,
+        help=(
+            "Estimated input-token budget per prompt. Context prompts over it are trimmed: older diary entries "
+            "first, then older messages this round, then possible orders lose their annotations (0 = no limit)."
+        ),
+    )
+    parser.add_argument(
+        "--prompt_token_budgets",
+        type=str,
+        default="",
+        help="Per-model prompt budgets as 'model_id=tokens,...', overriding --prompt_token_budget for those models.",
+    )
+    parser.add_argument(
+        "--diary_char_budget",
+        type=int,
+        default=12000,
+        help=(
+            "Character budget for each power's diary in prompts. When exceeded, the oldest entries are folded "
+            "into the rolling consolidated summary (0 = never consolidate; default: 12000)."
+        ),
+    )
+    parser.add_argument(
+        "--num_games",
+        type=int,
+        default=1,
+        help=(
+            "Run this many independent games concurrently in one process. They share the HTTP client pool, "
+            "rate limits, hedging and response cache; each writes to its own results/<timestamp>_gameN folder."
+        ),
+    )
+    parser.add_argument(
+        "--max_concurrent_games",
+        type=int,
+        default=0,
+        help="With --num_games, run at most this many games at once; the rest start as others finish (0 = all).",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.num_games < 1:
+        parser.error("--num_games must be at least 1")
+    if args.num_games > 1 and args.resume:
+        parser.error("--resume continues a single game and cannot be combined with --num_games")
+    return args
+
+
+def configure_shared_resources(args):
+    """Process-wide setup shared by every game in this process: prompts, HTTP pool, rate limits, hedging, streaming."""
+    # Load and validate every prompt template up front; a broken template stops the run here
+    get_prompt_registry().watch(args.watch_prompts)
+    configure_client_pool(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_keepalive_connections,
+        http2=not args.disable_http2,
+    )
+    configure_rate_limits(
+        rpm=args.rpm,
+        tpm=args.tpm,
+        max_concurrency=args.max_concurrent_requests,
+        global_max_concurrency=args.global_max_concurrent_requests,
+        overrides=parse_rate_limit_overrides(args.rate_limits),
+        max_retries=args.max_retries,
+    )
+    configure_hedging(
+        hedge_percentile=args.hedge_percentile,
+        min_hedge_delay=args.hedge_min_delay,
+        deadlines=parse_key_values(args.llm_deadlines, float),
+        secondary_models=parse_key_values(args.hedge_models),
+    )
+    configure_streaming(args.stream_responses)
 
 
-async def main():
-    args = parse_arguments()
+async def run_game(args, result_folder=None, game_file_path=None, response_cache=None):
+    """
+    Plays one game to completion and writes its results folder.
+
+    Expects configure_shared_resources() to have run. Per-game state (error stats, telemetry,
+    the LLM response log, phase contexts) is kept per task, so several run_game() calls can
+    share one event loop. Returns the results folder, or None if the game could not start.
+    """
     max_year = args.max_year
 
     powers_order = ["AUSTRIA", "ENGLAND", "FRANCE", "GERMANY", "ITALY", "RUSSIA", "TURKEY"]
@@ -124,18 +374,28 @@ async def main():
         lambda: {"conversation_errors": 0, "order_decoding_errors": 0}
     )
 
-    # Create a fresh Diplomacy game
-    game = Game()
-    game_history = GameHistory()
+    resume_state = None
+    if args.resume:
+        # Pick up after the last completed phase recorded in <results_dir>/checkpoint.jsonl
+        resume_state = load_checkpoint(os.path.join(args.resume, CHECKPOINT_FILENAME))
+        game = resume_state.game
+        game_history = resume_state.game_history
+        model_error_stats.update(resume_state.model_error_stats)
+    else:
+        # Create a fresh Diplomacy game
+        game = Game()
+        game_history = GameHistory()
 
     # Ensure game has phase_summaries attribute
     if not hasattr(game, "phase_summaries"):
         game.phase_summaries = {}
 
-    # Determine the result folder based on a timestamp
-    timestamp_str = time.strftime("%Y%m%d_%H%M%S")
-    result_folder = f"./results/{timestamp_str}"
+    # Determine the result folder based on a timestamp (a resumed game keeps writing to its own folder)
+    if result_folder is None:
+        timestamp_str = time.strftime("%Y%m%d_%H%M%S")
+        result_folder = args.resume if args.resume else f"./results/{timestamp_str}"
     os.makedirs(result_folder, exist_ok=True)
+    _game_log_folder.set(result_folder)
 
     # ADDED: Setup general file logging
     general_log_file_path = os.path.join(result_folder, "general_game.log")
@@ -144,6 +404,7 @@ async def main():
     file_handler.setFormatter(file_formatter)
     # Use the same log_level as basicConfig, or set a different one if needed for the file
     file_handler.setLevel(logging.INFO) 
+    file_handler.addFilter(_GameLogFilter(result_folder))
     logging.getLogger().addHandler(file_handler) # Add handler to the root logger
     
     # It's good practice to define 'logger' after all root logger configurations if it's module-specific.
@@ -154,718 +415,722 @@ async def main():
     # File paths
     manifesto_path = f"{result_folder}/game_manifesto.txt"
     # Use provided output filename or generate one based on the timestamp
-    game_file_path = args.output if args.output else f"{result_folder}/lmvsgame.json"
+    if game_file_path is None:
+        game_file_path = args.output if args.output else f"{result_folder}/lmvsgame.json"
     overview_file_path = f"{result_folder}/overview.jsonl"
+    # Each completed phase is appended here as it finishes; compacted into game_file_path at the end (see game_output.py)
+    game_stream_path = f"{result_folder}/lmvsgame.jsonl"
+    checkpoint_path = os.path.join(result_folder, CHECKPOINT_FILENAME)
+    # Per-phase task graph timings (one JSON line per phase, see phase_scheduler.py)
+    phase_timings_path = f"{result_folder}/phase_timings.jsonl"
+    # Per-call LLM telemetry and the per-phase stage breakdown (see telemetry.py)
+    llm_metrics_path = f"{result_folder}/llm_metrics.jsonl"
+    phase_metrics_path = f"{result_folder}/phase_metrics.jsonl"
     # == Add LLM Response Log Path ==
     llm_log_file_path = f"{result_folder}/llm_responses.csv"
-
-    # Handle power model mapping
-    if args.models:
-        # Expected order: AUSTRIA, ENGLAND, FRANCE, GERMANY, ITALY, RUSSIA, TURKEY
-        powers_order = [
-            "AUSTRIA",
-            "ENGLAND",
-            "FRANCE",
-            "GERMANY",
-            "ITALY",
-            "RUSSIA",
-            "TURKEY",
-        ]
-        provided_models = [name.strip() for name in args.models.split(",")]
-        if len(provided_models) != len(powers_order):
-            logger.error(
-                f"Expected {len(powers_order)} models for --power-models but got {len(provided_models)}. Exiting."
-            )
-            return
-        game.power_model_map = dict(zip(powers_order, provided_models))
-    else:
-        game.power_model_map = assign_models_to_powers()
-
-    # == Goal 1: Centralize Agent Instances ==
-    agents = {}
-    initialization_tasks = []
-    logger.info("Initializing Diplomacy Agents for each power...")
-    for power_name, model_id in game.power_model_map.items():
-        if not game.powers[power_name].is_eliminated(): # Only create for active powers initially
-            try:
-                client = load_model_client(model_id)
-                client.max_tokens = model_max_tokens[power_name]
-                # TODO: Potentially load initial goals/relationships from config later
-                agent = DiplomacyAgent(power_name=power_name, client=client) 
-                agents[power_name] = agent
-                logger.info(f"Preparing initialization task for {power_name} with model {model_id}")
-                # Pass log path to initialization
-                initialization_tasks.append(initialize_agent_state_ext(agent, game, game_history, llm_log_file_path))
-            except Exception as e:
-                logger.error(f"Failed to create agent or client for {power_name} with model {model_id}: {e}", exc_info=True)
-        else:
-             logger.info(f"Skipping agent initialization for eliminated power: {power_name}")
-    
-    # == Run initializations concurrently ==
-    logger.info(f"Running {len(initialization_tasks)} agent initializations concurrently...")
-    initialization_results = await asyncio.gather(*initialization_tasks, return_exceptions=True)
-    # Check results for errors
-    # Note: agents dict might have fewer entries than results if client creation failed
-    initialized_powers = list(agents.keys()) # Get powers for which agents were created
-    for i, result in enumerate(initialization_results):
-         if i < len(initialized_powers): # Ensure index is valid for initialized_powers
-             power_name = initialized_powers[i]
-             if isinstance(result, Exception):
-                 logger.error(f"Failed to initialize agent state for {power_name}: {result}", exc_info=result)
-                 # Potentially remove agent if initialization failed? Depends on desired behavior.
-             else:
-                 logger.info(f"Successfully initialized agent state for {power_name}.")
-         else:
-             logger.error(f"Initialization result mismatch - unexpected result: {result}")
-    # ========================================
-
-    # == Add storage for relationships per phase ==
-    all_phase_relationships = {}
-    all_phase_relationships_history = {} # Initialize history
-
-    while not game.is_game_done:
-        phase_start = time.time()
-        current_phase = game.get_current_phase()
-
-        # Ensure the current phase is registered in the history
-        game_history.add_phase(current_phase)
-        
-        # Store the current phase's short name once for consistent use
-        current_short_phase = game.current_short_phase
-        
-        logger.info(
-            f"PHASE: {current_phase} (time so far: {phase_start - start_whole:.2f}s)"
-        )
-
-        # DEBUG: Print the short phase to confirm
-        logger.debug(f"DEBUG: current_short_phase is '{current_short_phase}'")
-
-        # Prevent unbounded simulation based on year
-        year_str = current_phase[1:5]
-        year_int = int(year_str)
-        if year_int > max_year:
-            logger.info(f"Reached year {year_int}, stopping the test game early.")
-            break
-
-        # If it's a movement phase (e.g. ends with "M"), conduct negotiations
-        if game.current_short_phase.endswith("M"):
-            if args.num_negotiation_rounds > 0:
-                logger.info(f"Running {args.num_negotiation_rounds} rounds of negotiations...")
-                game_history = await conduct_negotiations(
-                    game,
-                    agents,
-                    game_history,
-                    model_error_stats,
-                    max_rounds=args.num_negotiation_rounds,
-                    # Pass log path
-                    log_file_path=llm_log_file_path,
+    # Rows are queued and written in batches by a background task (see llm_log.py)
+    start_llm_log_writer(llm_log_file_path, fmt=args.llm_log_format, rotate_mb=args.llm_log_rotate_mb)
+    game_stream = GameOutputStream(game_stream_path, game)
+
+    # Everything below cleans up in the finally block, also when the game fails (see run_games)
+    checkpoint = None
+    telemetry = None
+    try:
+        # Handle power model mapping
+        if resume_state is not None:
+            game.power_model_map = resume_state.power_model_map
+            if args.models:
+                logger.warning("--models is ignored when resuming; using the model assignment saved in the checkpoint.")
+        elif args.models:
+            # Expected order: AUSTRIA, ENGLAND, FRANCE, GERMANY, ITALY, RUSSIA, TURKEY
+            powers_order = [
+                "AUSTRIA",
+                "ENGLAND",
+                "FRANCE",
+                "GERMANY",
+                "ITALY",
+                "RUSSIA",
+                "TURKEY",
+            ]
+            provided_models = [name.strip() for name in args.models.split(",")]
+            if len(provided_models) != len(powers_order):
+                logger.error(
+                    f"Expected {len(powers_order)} models for --power-models but got {len(provided_models)}. Exiting."
                 )
+                return None
+            game.power_model_map = dict(zip(powers_order, provided_models))
+        else:
+            game.power_model_map = assign_models_to_powers()
+
+        # Hedge/deadline outcomes are counted alongside the other per-model errors
+        model_error_stats_var.set(model_error_stats)
+        telemetry = TelemetryRecorder(llm_metrics_path)
+        telemetry_recorder_var.set(telemetry)
+
+        prompt_token_budgets = parse_key_values(args.prompt_token_budgets, int)
+
+        # == Goal 1: Centralize Agent Instances ==
+        agents = {}
+        initialization_tasks = []
+        logger.info("Initializing Diplomacy Agents for each power...")
+        for power_name, model_id in game.power_model_map.items():
+            if not game.powers[power_name].is_eliminated(): # Only create for active powers initially
+                try:
+                    client = load_model_client(model_id)
+                    client.max_tokens = model_max_tokens[power_name]
+                    client.prompt_token_budget = prompt_token_budgets.get(model_id, args.prompt_token_budget) or None
+                    client.response_cache = response_cache
+                    # TODO: Potentially load initial goals/relationships from config later
+                    agent = DiplomacyAgent(power_name=power_name, client=client) 
+                    agents[power_name] = agent
+                    if resume_state is not None:
+                        # Goals, relationships and diaries come from the checkpoint; no initialization call
+                        apply_agent_state(agent, resume_state.agent_states.get(power_name, {}))
+                        continue
+                    logger.info(f"Preparing initialization task for {power_name} with model {model_id}")
+                    # Pass log path to initialization
+                    initialization_tasks.append(initialize_agent_state_ext(agent, game, game_history, llm_log_file_path))
+                except Exception as e:
+                    logger.error(f"Failed to create agent or client for {power_name} with model {model_id}: {e}", exc_info=True)
             else:
-                logger.info("Skipping negotiation phase as num_negotiation_rounds=0")
-
-            # === Execute Planning Phase (if enabled) AFTER potential negotiations ===
-            if args.planning_phase:
-                logger.info("Executing strategic planning phase...")
-                # NOTE: Assuming planning_phase needs modification to accept log_path
-                # We'll modify this call after checking planning.py
-                # Pass log path to planning
-                await planning_phase(
-                    game,
-                    agents,
-                    game_history,
-                    model_error_stats, 
-                    log_file_path=llm_log_file_path,
-                )
-            # ======================================================================
-
-            # === Generate Negotiation Diary Entries ===
-            logger.info(f"Generating negotiation diary entries for phase {current_short_phase}...")
-            
-            # Log active and eliminated powers for negotiation diary
-            active_powers_for_neg_diary = [p for p in agents.keys() if not game.powers[p].is_eliminated()]
-            eliminated_powers_for_neg_diary = [p for p in agents.keys() if game.powers[p].is_eliminated()]
-            
-            logger.info(f"Active powers for negotiation diary: {active_powers_for_neg_diary}")
-            if eliminated_powers_for_neg_diary:
-                logger.info(f"Eliminated powers (skipped): {eliminated_powers_for_neg_diary}")
-            
-            neg_diary_tasks = []
-            for power_name, agent in agents.items():
-                if not game.powers[power_name].is_eliminated():
-                    neg_diary_tasks.append(
-                        agent.generate_negotiation_diary_entry(
+                 logger.info(f"Skipping agent initialization for eliminated power: {power_name}")
+
+        # == Run initializations concurrently ==
+        logger.info(f"Running {len(initialization_tasks)} agent initializations concurrently...")
+        initialization_results = await asyncio.gather(*initialization_tasks, return_exceptions=True)
+        # Check results for errors
+        # Note: agents dict might have fewer entries than results if client creation failed
+        initialized_powers = list(agents.keys()) # Get powers for which agents were created
+        for i, result in enumerate(initialization_results):
+             if i < len(initialized_powers): # Ensure index is valid for initialized_powers
+                 power_name = initialized_powers[i]
+                 if isinstance(result, Exception):
+                     logger.error(f"Failed to initialize agent state for {power_name}: {result}", exc_info=result)
+                     # Potentially remove agent if initialization failed? Depends on desired behavior.
+                 else:
+                     logger.info(f"Successfully initialized agent state for {power_name}.")
+             else:
+                 logger.error(f"Initialization result mismatch - unexpected result: {result}")
+        # ========================================
+
+        # == Add storage for relationships per phase ==
+        all_phase_relationships = {}
+        all_phase_relationships_history = {} # Initialize history
+
+        run_phases = True
+        if resume_state is not None:
+            all_phase_relationships.update(resume_state.all_phase_relationships)
+            all_phase_relationships_history.update(resume_state.all_phase_relationships_history)
+            # The stream is rewritten from the restored game, then extended phase by phase as usual
+            for phase_name in resume_state.completed_phases:
+                game_stream.write_phase(phase_name, agent_relationships=all_phase_relationships_history.get(phase_name))
+            last_completed = resume_state.last_completed_phase
+            if last_completed and int(last_completed[1:5]) > max_year:
+                logger.info(f"Checkpoint is already past --max_year {max_year} ({last_completed}); not playing further phases.")
+                run_phases = False
+            checkpoint = CheckpointWriter(checkpoint_path, game, resume_state=resume_state)
+        else:
+            checkpoint = CheckpointWriter(checkpoint_path, game)
+            checkpoint.write(game, game_history, agents, model_error_stats, all_phase_relationships, all_phase_relationships_history)
+
+        while run_phases and not game.is_game_done:
+            phase_start = time.time()
+            current_phase = game.get_current_phase()
+
+            # Ensure the current phase is registered in the history
+            game_history.add_phase(current_phase)
+
+            # Store the current phase's short name once for consistent use
+            current_short_phase = game.current_short_phase
+
+            logger.info(
+                f"PHASE: {current_phase} (time so far: {phase_start - start_whole:.2f}s)"
+            )
+
+            # DEBUG: Print the short phase to confirm
+            logger.debug(f"DEBUG: current_short_phase is '{current_short_phase}'")
+
+            # Prevent unbounded simulation based on year
+            year_str = current_phase[1:5]
+            year_int = int(year_str)
+            if year_int > max_year:
+                logger.info(f"Reached year {year_int}, stopping the test game early.")
+                break
+
+            # == Per-phase task graph ==
+            # Each power's steps are nodes with explicit dependencies (see ai_diplomacy/phase_scheduler.py):
+            # a power's orders start as soon as its own negotiation diary is done, its order diary as soon as
+            # its orders are set, and only game.process() waits for every power's orders.
+            graph = PhaseTaskGraph(current_short_phase)
+
+            active_powers = [p for p in agents.keys() if not game.powers[p].is_eliminated()]
+            eliminated_powers = [p for p in agents.keys() if game.powers[p].is_eliminated()]
+            logger.info(f"Active powers for {current_short_phase}: {active_powers}")
+            if eliminated_powers:
+                logger.info(f"Eliminated powers (skipped): {eliminated_powers}")
+
+            # Board state before processing; shared by order generation and the order diaries.
+            # The phase context memoizes possible orders and order context for every prompt on this board.
+            phase_context = get_phase_context(game)
+            board_state = phase_context.board_state
+            submitted_orders = {}  # power_name -> validated orders set in the game
+
+            # If it's a movement phase (e.g. ends with "M"), conduct negotiations
+            barrier_deps = []
+            if game.current_short_phase.endswith("M"):
+                if args.num_negotiation_rounds > 0:
+                    async def run_negotiations():
+                        logger.info(f"Running {args.num_negotiation_rounds} rounds of negotiations...")
+                        # Every round needs every power's messages, so this stays a single barrier node
+                        await conduct_negotiations(
                             game,
+                            agents,
                             game_history,
-                            llm_log_file_path
+                            model_error_stats,
+                            max_rounds=args.num_negotiation_rounds,
+                            # Pass log path
+                            log_file_path=llm_log_file_path,
                         )
-                    )
-            if neg_diary_tasks:
-                await asyncio.gather(*neg_diary_tasks, return_exceptions=True)
-            logger.info(f"Finished generating negotiation diary entries for {current_short_phase}.")
-            # ==========================================
-
-        # AI Decision Making: Get orders for each power
-        logger.info("Getting orders from agents...")
-        
-        # Log active and eliminated powers for order generation
-        active_powers_for_orders = [p for p in agents.keys() if not game.powers[p].is_eliminated()]
-        eliminated_powers_for_orders = [p for p in agents.keys() if game.powers[p].is_eliminated()]
-        
-        logger.info(f"Active powers for order generation: {active_powers_for_orders}")
-        if eliminated_powers_for_orders:
-            logger.info(f"Eliminated powers (skipped): {eliminated_powers_for_orders}")
-        
-        order_tasks = []
-        order_power_names = []
-        # Calculate board state once before the loop
-        board_state = game.get_state()
+                    barrier_deps = [graph.add("negotiation", run_negotiations)]
+                else:
+                    logger.info("Skipping negotiation phase as num_negotiation_rounds=0")
+
+                # === Execute Planning Phase (if enabled) AFTER potential negotiations ===
+                if args.planning_phase:
+                    async def run_planning():
+                        logger.info("Executing strategic planning phase...")
+                        # Plans for all powers are requested concurrently (see planning.py)
+                        await planning_phase(
+                            game,
+                            agents,
+                            game_history,
+                            model_error_stats, 
+                            log_file_path=llm_log_file_path,
+                        )
+                    barrier_deps = [graph.add("planning", run_planning, deps=barrier_deps)]
+                # ======================================================================
 
-        for power_name, agent in agents.items():
-            if game.powers[power_name].is_eliminated():
-                logger.debug(f"Skipping order generation for eliminated power {power_name}.")
-                continue
-
-            # ADDED: Diagnostic logging for orderable locations
-            logger.info(f"--- Diagnostic Log for {power_name} in phase {current_phase} ---")
-            try:
-                orderable_locs_from_game = game.get_orderable_locations(power_name)
-                logger.info(f"[{power_name}][{current_phase}] game.get_orderable_locations(): {orderable_locs_from_game}")
-                actual_units = game.get_units(power_name)
-                actual_unit_locs = [unit.split(' ')[1].split('/')[0] for unit in actual_units if ' ' in unit] # Corrected parsing
-                logger.info(f"[{power_name}][{current_phase}] Actual unit locations (from game.get_units()): {actual_unit_locs}")
-            except Exception as e_diag:
-                logger.error(f"[{power_name}][{current_phase}] Error during diagnostic logging: {e_diag}")
-            logger.info(f"--- End Diagnostic Log for {power_name} in phase {current_phase} ---")
-
-            # Calculate possible orders for the current power
-            possible_orders = gather_possible_orders(game, power_name)
-            if not possible_orders:
-                logger.debug(f"No orderable locations for {power_name}; submitting empty orders.")
-                game.set_orders(power_name, []) # Ensure empty orders if none possible
-                continue
-
-            order_power_names.append(power_name)
-            # NOTE: get_valid_orders is in utils, we assume it calls client.get_orders
-            # Need to modify get_valid_orders signature in utils.py later
-            
-            # Debug logging for diary
-            diary_preview = agent.format_private_diary_for_prompt()
-            logger.info(f"[{power_name}] Passing diary to get_valid_orders. Preview: {diary_preview[:200]}...")
-            
-            order_tasks.append(
-                get_valid_orders(
-                    # --- Positional Arguments --- 
-                    game,                    
-                    agent.client,            
-                    board_state,             
-                    power_name,              
-                    possible_orders,         
-                    game_history,            
-                    model_error_stats,       
-                    # --- Keyword Arguments --- 
-                    agent_goals=agent.goals,
-                    agent_relationships=agent.relationships,
-                    agent_private_diary_str=diary_preview,  # Fixed: Added missing diary parameter, now using pre-formatted value
-                    log_file_path=llm_log_file_path,
-                    phase=current_phase,     
+            async def generate_negotiation_diary(power_name):
+                await agents[power_name].generate_negotiation_diary_entry(
+                    game,
+                    game_history,
+                    llm_log_file_path
                 )
-            )
 
-        # Run order generation concurrently
-        if order_tasks:
-            logger.debug(f"Running {len(order_tasks)} order generation tasks concurrently...")
-            order_results = await asyncio.gather(*order_tasks, return_exceptions=True)
-        else:
-            logger.debug("No order generation tasks to run.")
-            order_results = []
-
-        # Process order results and set them in the game
-        for i, result in enumerate(order_results):
-            p_name = order_power_names[i]
-            agent = agents[p_name] # Get agent for logging/stats if needed
-            model_name = agent.client.model_name
-
-            if isinstance(result, Exception):
-                logger.error(f"Error during get_valid_orders for {p_name}: {result}", exc_info=result)
-                # Log error stats (consider if fallback orders should be set here)
-                if model_name in model_error_stats:
+            async def generate_orders(power_name):
+                agent = agents[power_name]
+                model_name = agent.client.model_name
+
+                # ADDED: Diagnostic logging for orderable locations
+                logger.info(f"--- Diagnostic Log for {power_name} in phase {current_phase} ---")
+                try:
+                    orderable_locs_from_game = game.get_orderable_locations(power_name)
+                    logger.info(f"[{power_name}][{current_phase}] game.get_orderable_locations(): {orderable_locs_from_game}")
+                    actual_units = game.get_units(power_name)
+                    actual_unit_locs = [unit.split(' ')[1].split('/')[0] for unit in actual_units if ' ' in unit] # Corrected parsing
+                    logger.info(f"[{power_name}][{current_phase}] Actual unit locations (from game.get_units()): {actual_unit_locs}")
+                except Exception as e_diag:
+                    logger.error(f"[{power_name}][{current_phase}] Error during diagnostic logging: {e_diag}")
+                logger.info(f"--- End Diagnostic Log for {power_name} in phase {current_phase} ---")
+
+                # Calculate possible orders for the current power
+                possible_orders = gather_possible_orders(game, power_name)
+                if not possible_orders:
+                    logger.debug(f"No orderable locations for {power_name}; submitting empty orders.")
+                    game.set_orders(power_name, []) # Ensure empty orders if none possible
+                    return []
+
+                # Debug logging for diary
+                diary_preview = agent.format_private_diary_for_prompt()
+                logger.info(f"[{power_name}] Passing diary to get_valid_orders. Preview: {diary_preview[:200]}...")
+
+                try:
+                    orders = await get_valid_orders(
+                        # --- Positional Arguments --- 
+                        game,                    
+                        agent.client,            
+                        board_state,             
+                        power_name,              
+                        possible_orders,         
+                        game_history,            
+                        model_error_stats,       
+                        # --- Keyword Arguments --- 
+                        agent_goals=agent.goals,
+                        agent_relationships=agent.relationships,
+                        agent_private_diary_str=diary_preview,
+                        log_file_path=llm_log_file_path,
+                        phase=current_phase,     
+                        phase_context=phase_context,
+                    )
+                except Exception as e:
+                    logger.error(f"Error during get_valid_orders for {power_name}: {e}", exc_info=e)
                     model_error_stats[model_name].setdefault("order_generation_errors", 0)
                     model_error_stats[model_name]["order_generation_errors"] += 1
-                # Optionally set fallback orders here if needed, e.g., game.set_orders(p_name, []) or specific fallback
-                game.set_orders(p_name, []) # Set empty orders on error for now
-                logger.warning(f"Setting empty orders for {p_name} due to generation error.")
-            elif result is None:
-                # Handle case where get_valid_orders might theoretically return None
-                logger.warning(f"get_valid_orders returned None for {p_name}. Setting empty orders.")
-                game.set_orders(p_name, [])
-                if model_name in model_error_stats:
+                    game.set_orders(power_name, []) # Set empty orders on error for now
+                    logger.warning(f"Setting empty orders for {power_name} due to generation error.")
+                    return []
+
+                if orders is None:
+                    # Handle case where get_valid_orders might theoretically return None
+                    logger.warning(f"get_valid_orders returned None for {power_name}. Setting empty orders.")
                     model_error_stats[model_name].setdefault("order_generation_errors", 0)
                     model_error_stats[model_name]["order_generation_errors"] += 1
-            else:
-                # Result is the list of validated orders
-                orders = result
-                logger.debug(f"Validated orders for {p_name}: {orders}")
+                    orders = []
+
+                logger.debug(f"Validated orders for {power_name}: {orders}")
+                game.set_orders(power_name, orders) # Set empty if get_valid_orders returned empty
                 if orders:
-                    game.set_orders(p_name, orders)
-                    logger.debug(
-                        f"Set orders for {p_name} in {game.current_short_phase}: {orders}"
-                    )
-                    # === Generate Order Diary Entry ===
-                    # Call after orders are successfully set
-                    logger.info(f"Generating order diary entry for {p_name} for phase {current_short_phase}...")
-                    try:
-                        await agent.generate_order_diary_entry(
-                            game,
-                            orders, # Pass the confirmed orders
-                            llm_log_file_path
-                        )
-                        logger.info(f"Finished generating order diary entry for {p_name}.")
-                    except Exception as e_diary:
-                        logger.error(f"Error generating order diary for {p_name}: {e_diary}", exc_info=True)
-                    # =================================
-                else:
-                    logger.debug(f"No valid orders returned by get_valid_orders for {p_name}. Setting empty orders.")
-                    game.set_orders(p_name, []) # Set empty if get_valid_orders returned empty
-
-        # --- End Async Order Generation ---
-
-        # Process orders
-        logger.info(f"Processing orders for {current_phase}...")
-        
-        # Process with a custom summary callback that captures our custom game_history data
-        def phase_summary_callback(system_prompt, user_prompt):
-            # This will be called by the game engine's _generate_phase_summary method
-            # Get messages for this phase from game_history
-            current_phase_obj = None
-            for phase in game_history.phases:
-                if phase.name == current_short_phase:
-                    current_phase_obj = phase
-                    break
-                
-            if not current_phase_obj:
-                return f"Phase {current_short_phase} Summary: (No game history data available)"
-            
-            # 1) Gather the current board state, sorted by # of centers
-            power_info = []
-            for power_name, power in game.powers.items():
-                units_list = list(power.units)
-                centers_list = list(power.centers)
-                power_info.append(
-                    (power_name, len(centers_list), units_list, centers_list)
+                    submitted_orders[power_name] = orders
+                    logger.debug(f"Set orders for {power_name} in {current_short_phase}: {orders}")
+                return orders
+
+            async def generate_order_diary(power_name):
+                orders = submitted_orders.get(power_name)
+                if not orders:
+                    return
+                # Only needs the submitted orders and the pre-processing board state, so it can
+                # run while the engine processes the phase.
+                logger.info(f"Generating order diary entry for {power_name} for phase {current_short_phase}...")
+                await agents[power_name].generate_order_diary_entry(
+                    game,
+                    orders, # Pass the confirmed orders
+                    llm_log_file_path,
+                    board_state=board_state,
+                    phase=current_short_phase,
                 )
-            # Sort by descending # of centers
-            power_info.sort(key=lambda x: x[1], reverse=True)
-
-            # 2) Build text lines for the top "Board State Overview"
-            top_lines = ["Current Board State (Ordered by SC Count):"]
-            for (p_name, sc_count, units, centers) in power_info:
-                top_lines.append(
-                    f" • {p_name}: {sc_count} centers (needs 18 to win). "
-                    f"Units={units} Centers={centers}"
+
+            order_nodes = []
+            order_diary_nodes = {}
+            for power_name in active_powers:
+                order_deps = list(barrier_deps)
+                if game.current_short_phase.endswith("M"):
+                    order_deps = [graph.add(
+                        f"negotiation_diary:{power_name}",
+                        functools.partial(generate_negotiation_diary, power_name),
+                        deps=barrier_deps,
+                        power=power_name,
+                    )]
+                order_node = graph.add(
+                    f"orders:{power_name}",
+                    functools.partial(generate_orders, power_name),
+                    deps=order_deps,
+                    power=power_name,
+                )
+                order_nodes.append(order_node)
+                order_diary_nodes[power_name] = graph.add(
+                    f"order_diary:{power_name}",
+                    functools.partial(generate_order_diary, power_name),
+                    deps=[order_node],
+                    power=power_name,
                 )
 
-            # 3) Map orders to "successful", "failed", or "other" outcomes
-            success_dict = {}
-            fail_dict = {}
-            other_dict = {}
-
-            orders_dict = game.order_history.get(current_short_phase, {})
-            results_for_phase = game.result_history.get(current_short_phase, {})
-
-            for pwr, pwr_orders in orders_dict.items():
-                for order_str in pwr_orders:
-                    # Extract the unit from the string
-                    tokens = order_str.split()
-                    if len(tokens) < 3:
-                        # Something malformed
-                        other_dict.setdefault(pwr, []).append(order_str)
-                        continue
-                    unit_name = " ".join(tokens[:2])
-                    # We retrieve the order results for that unit
-                    results_list = results_for_phase.get(unit_name, [])
-                    # Check if the results contain e.g. "dislodged", "bounce", "void"
-                    # We consider success if the result list is empty or has no negative results
-                    if not results_list or all(res not in ["bounce", "void", "no convoy", "cut", "dislodged", "disrupted"] for res in results_list):
-                        success_dict.setdefault(pwr, []).append(order_str)
-                    elif any(res in ["bounce", "void", "no convoy", "cut", "dislodged", "disrupted"] for res in results_list):
-                        fail_dict.setdefault(pwr, []).append(f"{order_str} - {', '.join(str(r) for r in results_list)}")
-                    else:
-                        other_dict.setdefault(pwr, []).append(order_str)
-
-            # 4) Build textual lists of successful, failed, and "other" moves
-            def format_moves_dict(title, moves_dict):
-                lines = [title]
-                if not moves_dict:
-                    lines.append("  None.")
+            # Process with a custom summary callback that captures our custom game_history data
+            def phase_summary_callback(system_prompt, user_prompt):
+                # This will be called by the game engine's _generate_phase_summary method
+                # Get messages for this phase from game_history
+                current_phase_obj = None
+                for phase in game_history.phases:
+                    if phase.name == current_short_phase:
+                        current_phase_obj = phase
+                        break
+
+                if not current_phase_obj:
+                    return f"Phase {current_short_phase} Summary: (No game history data available)"
+
+                # 1) Gather the current board state, sorted by # of centers
+                power_info = []
+                for power_name, power in game.powers.items():
+                    units_list = list(power.units)
+                    centers_list = list(power.centers)
+                    power_info.append(
+                        (power_name, len(centers_list), units_list, centers_list)
+                    )
+                # Sort by descending # of centers
+                power_info.sort(key=lambda x: x[1], reverse=True)
+
+                # 2) Build text lines for the top "Board State Overview"
+                top_lines = ["Current Board State (Ordered by SC Count):"]
+                for (p_name, sc_count, units, centers) in power_info:
+                    top_lines.append(
+                        f" • {p_name}: {sc_count} centers (needs 18 to win). "
+                        f"Units={units} Centers={centers}"
+                    )
+
+                # 3) Map orders to "successful", "failed", or "other" outcomes
+                success_dict = {}
+                fail_dict = {}
+                other_dict = {}
+
+                orders_dict = game.order_history.get(current_short_phase, {})
+                results_for_phase = game.result_history.get(current_short_phase, {})
+
+                for pwr, pwr_orders in orders_dict.items():
+                    for order_str in pwr_orders:
+                        # Extract the unit from the string
+                        tokens = order_str.split()
+                        if len(tokens) < 3:
+                            # Something malformed
+                            other_dict.setdefault(pwr, []).append(order_str)
+                            continue
+                        unit_name = " ".join(tokens[:2])
+                        # We retrieve the order results for that unit
+                        results_list = results_for_phase.get(unit_name, [])
+                        # Check if the results contain e.g. "dislodged", "bounce", "void"
+                        # We consider success if the result list is empty or has no negative results
+                        if not results_list or all(res not in ["bounce", "void", "no convoy", "cut", "dislodged", "disrupted"] for res in results_list):
+                            success_dict.setdefault(pwr, []).append(order_str)
+                        elif any(res in ["bounce", "void", "no convoy", "cut", "dislodged", "disrupted"] for res in results_list):
+                            fail_dict.setdefault(pwr, []).append(f"{order_str} - {', '.join(str(r) for r in results_list)}")
+                        else:
+                            other_dict.setdefault(pwr, []).append(order_str)
+
+                # 4) Build textual lists of successful, failed, and "other" moves
+                def format_moves_dict(title, moves_dict):
+                    lines = [title]
+                    if not moves_dict:
+                        lines.append("  None.")
+                        return "\n".join(lines)
+                    for pwr in sorted(moves_dict.keys()):
+                        lines.append(f"  {pwr}:")
+                        for mv in moves_dict[pwr]:
+                            lines.append(f"    {mv}")
                     return "\n".join(lines)
-                for pwr in sorted(moves_dict.keys()):
-                    lines.append(f"  {pwr}:")
-                    for mv in moves_dict[pwr]:
-                        lines.append(f"    {mv}")
-                return "\n".join(lines)
-
-            success_section = format_moves_dict("Successful Moves:", success_dict)
-            fail_section = format_moves_dict("Unsuccessful Moves:", fail_dict)
-            other_section = format_moves_dict("Other / Unclassified Moves:", other_dict)
-
-            # 5) Combine everything into the final summary text
-            summary_parts = []
-            summary_parts.append("\n".join(top_lines))
-            summary_parts.append("\n" + success_section)
-            summary_parts.append("\n" + fail_section)
-            
-            # Only include "Other" section if it has content
-            if other_dict:
-                summary_parts.append("\n" + other_section)
-
-            return f"Phase {current_short_phase} Summary:\n\n" + "\n".join(summary_parts)
-        
-        # Process with our custom callback
-        game.process(phase_summary_callback=phase_summary_callback)
-
-        # Log the results
-        logger.info(f"Results for {current_phase}:")
-        for power_name, power in game.powers.items():
-            logger.info(f"{power_name}: {power.centers}")
-
-        # Ensure messages from game_history are added to the game's message system
-        # This is required for messages to appear in the Messages tab
-        for phase in game_history.phases:
-            if phase.name == current_short_phase:
-                for msg in phase.messages:
+
+                success_section = format_moves_dict("Successful Moves:", success_dict)
+                fail_section = format_moves_dict("Unsuccessful Moves:", fail_dict)
+                other_section = format_moves_dict("Other / Unclassified Moves:", other_dict)
+
+                # 5) Combine everything into the final summary text
+                summary_parts = []
+                summary_parts.append("\n".join(top_lines))
+                summary_parts.append("\n" + success_section)
+                summary_parts.append("\n" + fail_section)
+
+                # Only include "Other" section if it has content
+                if other_dict:
+                    summary_parts.append("\n" + other_section)
+
+                return f"Phase {current_short_phase} Summary:\n\n" + "\n".join(summary_parts)
+
+            post_process = {}  # Values produced by the process node for later nodes
+
+            async def process_phase():
+                # Process orders
+                logger.info(f"Processing orders for {current_phase}...")
+                # Process with our custom callback. Run in a worker thread so other nodes (e.g. the
+                # order diaries) keep making progress on the event loop in the meantime.
+                processed_phase_data = await asyncio.to_thread(game.process, phase_summary_callback=phase_summary_callback)
+
+                # The narrative summary is generated in the background; consumers await get_phase_summary()
+                schedule_phase_narrative(game, current_short_phase, processed_phase_data)
+
+                # Log the results
+                logger.info(f"Results for {current_phase}:")
+                for power_name, power in game.powers.items():
+                    logger.info(f"{power_name}: {power.centers}")
+                post_process["board_state"] = get_phase_context(game).board_state # State *after* processing
+
+            process_node = graph.add("process", process_phase, deps=order_nodes or barrier_deps)
+
+            async def record_phase():
+                # Ensure messages from game_history are added to the game's message system
+                # This is required for messages to appear in the Messages tab
+                # Only add messages not already present (avoid duplicates); one set lookup per message
+                present = {(m.sender, m.recipient, m.message) for m in game.messages.values()}
+                # game.messages is keyed by time_sent, so every message needs its own timestamp
+                last_time_sent = game.messages.last_key() if game.messages else 0
+                for msg in game_history.get_messages_by_phase(current_short_phase):
+                    key = (msg.sender, msg.recipient, msg.content)
+                    if key in present:
+                        continue
                     try:
-                        # Only add if not already present (avoid duplicates)
-                        if not any(m.sender == msg.sender and 
-                                  m.recipient == msg.recipient and 
-                                  m.message == msg.content 
-                                  for m in game.messages.values()):
-                            game.add_message(Message(
-                                phase=current_short_phase,
-                                sender=msg.sender,
-                                recipient=msg.recipient,
-                                message=msg.content,
-                                time_sent=int(time.time())
-                            ))
+                        last_time_sent = max(int(time.time()), last_time_sent + 1)
+                        game.add_message(Message(
+                            phase=current_short_phase,
+                            sender=msg.sender,
+                            recipient=msg.recipient,
+                            message=msg.content,
+                            time_sent=last_time_sent
+                        ))
+                        present.add(key)
                     except Exception as e:
                         logger.warning(f"Could not add message to game: {e}")
 
-        # Add orders to game history
-        for power_name in game.order_history[current_short_phase]:
-            orders = game.order_history[current_short_phase][power_name]
-            results = []
-            for order in orders:
-                # Example move: "A PAR H" -> unit="A PAR", order_part="H"
-                tokens = order.split(" ", 2)
-                if len(tokens) < 3:
-                    continue
-                unit = " ".join(tokens[:2])  # e.g. "A PAR"
-                order_part = tokens[2]  # e.g. "H" or "S A MAR"
-                results.append(
-                    [str(x) for x in game.result_history[current_short_phase][unit]]
+                # Add orders to game history
+                for power_name in game.order_history[current_short_phase]:
+                    game_history.add_orders(
+                        current_short_phase,
+                        power_name,
+                        game.order_history[current_short_phase][power_name],
+                    )
+
+                logger.info(f"--- Orders Submitted for {current_phase} ---")
+                for power, orders in game.order_history.get(current_short_phase, {}).items():
+                    order_str = ", ".join(orders) if orders else "(No orders/NOP)"
+                    logger.info(f"  {power:<8}: {order_str}")
+                logger.info("-----------------------------------")
+
+                # == Collect Agent Relationships for this Phase ==
+                current_relationships_for_phase = {}
+                logger.debug(f"Collecting relationships for phase: {current_short_phase}")
+                active_powers_in_phase = set(game.powers.keys()) # Get powers present at end of phase
+                for power_name, agent in agents.items():
+                    # Only collect relationships if the power is still active in the game
+                    if power_name in active_powers_in_phase and not game.powers[power_name].is_eliminated():
+                        try:
+                            current_relationships_for_phase[power_name] = agent.relationships
+                            logger.debug(f"  Collected relationships for {power_name}")
+                        except Exception as e:
+                             logger.error(f"Error getting relationships for {power_name}: {e}")
+                all_phase_relationships[current_short_phase] = current_relationships_for_phase
+                logger.debug(f"Stored relationships for {len(current_relationships_for_phase)} agents in phase {current_short_phase}")
+                # ================================================
+
+            record_node = graph.add("record", record_phase, deps=[process_node])
+
+            async def await_phase_summary():
+                # Waits for the background narrative, if one is being generated
+                phase_summary = await get_phase_summary(game, current_phase, "(Summary not generated)")
+                if f"Summary for {current_phase} not found" in phase_summary:
+                    logger.warning(phase_summary)
+                return phase_summary
+
+            summary_node = graph.add("phase_summary", await_phase_summary, deps=[process_node])
+
+            # --- Phase Result Diary Entries ---
+            # These happen after processing but before state updates
+            completed_phase_name = current_phase
+
+            async def generate_phase_result_diary(power_name):
+                if game.powers[power_name].is_eliminated():
+                    logger.info(f"Skipping phase result diary for {power_name} (eliminated this phase).")
+                    return
+                await agents[power_name].generate_phase_result_diary_entry(
+                    game,
+                    game_history,
+                    graph.result(summary_node, "(Summary not generated)"),
+                    game.order_history.get(current_short_phase, {}),
+                    llm_log_file_path,
+                    phase_name=current_short_phase,
                 )
-            game_history.add_orders(
-                current_short_phase,
-                power_name,
-                game.order_history[current_short_phase][power_name],
-            )
 
-        logger.info(f"--- Orders Submitted for {current_phase} ---")
-        for power, orders in game.order_history.get(current_short_phase, {}).items():
-            order_str = ", ".join(orders) if orders else "(No orders/NOP)"
-            logger.info(f"  {power:<8}: {order_str}")
-        logger.info("-----------------------------------")
+            # --- Diary Consolidation ---
+            # Rolling consolidation: once a power's formatted diary exceeds --diary_char_budget, its oldest
+            # recent entries are folded into the existing summary (a no-op while the diary fits).
+            MIN_RECENT_DIARY_ENTRIES = 4  # Newest entries always kept verbatim
 
-        # == Collect Agent Relationships for this Phase ==
-        current_relationships_for_phase = {}
-        logger.debug(f"Collecting relationships for phase: {current_short_phase}")
-        active_powers_in_phase = set(game.powers.keys()) # Get powers present at end of phase
-        for power_name, agent in agents.items():
-            # Only collect relationships if the power is still active in the game
-            if power_name in active_powers_in_phase and not game.powers[power_name].is_eliminated():
-                try:
-                    current_relationships_for_phase[power_name] = agent.relationships
-                    logger.debug(f"  Collected relationships for {power_name}")
-                except Exception as e:
-                     logger.error(f"Error getting relationships for {power_name}: {e}")
-            # else:
-            #    logger.debug(f"  Skipping relationships for inactive/eliminated power {power_name}")
-        all_phase_relationships[current_short_phase] = current_relationships_for_phase
-        logger.debug(f"Stored relationships for {len(current_relationships_for_phase)} agents in phase {current_short_phase}")
-        # ================================================
-
-        # Log phase duration
-        phase_end = time.time()
-        logger.info(f"Phase {current_phase} took {phase_end - phase_start:.2f}s")
-
-        # --- Generate Phase Result Diary Entries ---
-        # This happens after processing but before state updates
-        completed_phase_name = current_phase
-        logger.info(f"Generating phase result diary entries for completed phase {completed_phase_name}...")
-        
-        # Log active and eliminated powers for phase result diary
-        active_powers_for_phase_diary = [p for p in agents.keys() if not game.powers[p].is_eliminated()]
-        eliminated_powers_for_phase_diary = [p for p in agents.keys() if game.powers[p].is_eliminated()]
-        
-        logger.info(f"Active powers for phase result diary: {active_powers_for_phase_diary}")
-        if eliminated_powers_for_phase_diary:
-            logger.info(f"Eliminated powers (skipped): {eliminated_powers_for_phase_diary}")
-        
-        # Get phase summary and all orders for this phase
-        phase_summary = game.phase_summaries.get(current_phase, "(Summary not generated)")
-        all_orders_this_phase = game.order_history.get(current_short_phase, {})
-        
-        # Generate diary entries concurrently for all active agents
-        phase_result_diary_tasks = []
-        for power_name, agent in agents.items():
-            if not game.powers[power_name].is_eliminated():
-                phase_result_diary_tasks.append(
-                    agent.generate_phase_result_diary_entry(
-                        game,
-                        game_history,
-                        phase_summary,
-                        all_orders_this_phase,
-                        llm_log_file_path
+            async def consolidate_diary(power_name):
+                if game.powers[power_name].is_eliminated():
+                    logger.info(f"[DIARY CONSOLIDATION] Skipping eliminated power: {power_name}")
+                    return
+                await agents[power_name].consolidate_diary(
+                    game,
+                    llm_log_file_path,
+                    char_budget=args.diary_char_budget,
+                    min_recent_entries=MIN_RECENT_DIARY_ENTRIES,
+                )
+
+            # --- State Update ---
+            async def update_state(power_name):
+                if game.powers[power_name].is_eliminated():
+                    logger.info(f"Skipping state update for {power_name} (eliminated).")
+                    return
+                logger.debug(f"Running state analysis for {power_name}")
+                await agents[power_name].analyze_phase_and_update_state(
+                    game, 
+                    post_process["board_state"], # Use state AFTER processing
+                    graph.result(summary_node, "(Summary not generated)"), 
+                    game_history,
+                    llm_log_file_path,
+                )
+
+            for power_name in active_powers:
+                last_node = graph.add(
+                    f"phase_result_diary:{power_name}",
+                    functools.partial(generate_phase_result_diary, power_name),
+                    deps=[record_node, summary_node, order_diary_nodes[power_name]],
+                    power=power_name,
+                )
+                if args.diary_char_budget > 0:
+                    last_node = graph.add(
+                        f"consolidation:{power_name}",
+                        functools.partial(consolidate_diary, power_name),
+                        deps=[last_node],
+                        power=power_name,
                     )
+                graph.add(
+                    f"state_update:{power_name}",
+                    functools.partial(update_state, power_name),
+                    deps=[last_node],
+                    power=power_name,
                 )
-        
-        if phase_result_diary_tasks:
-            logger.info(f"Running {len(phase_result_diary_tasks)} phase result diary tasks concurrently...")
-            await asyncio.gather(*phase_result_diary_tasks, return_exceptions=True)
-            logger.info(f"Finished generating phase result diary entries.")
-        # --- End Phase Result Diary Generation ---
-
-        # --- Diary Consolidation Check ---
-        # Periodically consolidate diary entries to prevent context bloat.
-        MIN_LATEST_FULL_ENTRIES = 10  # Number of recent entries to keep unsummarized after a consolidation.
-        CONSOLIDATE_EVERY_N_YEARS = 2 # How often to run consolidation (e.g., 2 means every 2 game years).
-
-        logger.info(f"[DIARY CONSOLIDATION] Checking consolidation for phase: {current_phase} (short: {current_short_phase})")
-
-        # We only consolidate at the start of a year (Spring Movement) to have a predictable schedule.
-        if not (current_short_phase.startswith("S") and current_short_phase.endswith("M")):
-            logger.info(f"[DIARY CONSOLIDATION] Skipping check: Not a Spring Movement phase.")
-        else:
-            try:
-                # Extract year from phase, e.g., "S1903M" -> "1903"
-                if len(current_short_phase) >= 5:
-                    current_year_str = current_short_phase[1:5]
-                    logger.info(f"[DIARY CONSOLIDATION] Extracting year from short phase: {current_short_phase}")
-                else:
-                    # Fallback for different phase formats
-                    current_year_str = current_phase[1:5]
-                    logger.info(f"[DIARY CONSOLIDATION] Extracting year from full phase: {current_phase}")
-
-                logger.info(f"[DIARY CONSOLIDATION] Extracted year string: '{current_year_str}'")
-                
-                current_year = int(current_year_str)
-                
-                # Trigger consolidation every N years, but not in the very first year (1901).
-                should_consolidate = (current_year > 1901) and ((current_year - 1901) % CONSOLIDATE_EVERY_N_YEARS == 0)
-                
-                logger.info(f"[DIARY CONSOLIDATION] Current year: {current_year}. Trigger every {CONSOLIDATE_EVERY_N_YEARS} years. Should consolidate: {should_consolidate}")
-
-                if should_consolidate:
-                    logger.info(f"[DIARY CONSOLIDATION] TRIGGERING consolidation for current year {current_year}.")
-                    
-                    active_powers_for_consolidation = [p for p in agents.keys() if not game.powers[p].is_eliminated()]
-                    eliminated_powers_for_consolidation = [p for p in agents.keys() if game.powers[p].is_eliminated()]
-                    
-                    logger.info(f"[DIARY CONSOLIDATION] Active powers for consolidation: {active_powers_for_consolidation}")
-                    if eliminated_powers_for_consolidation:
-                        logger.info(f"[DIARY CONSOLIDATION] Eliminated powers (skipped): {eliminated_powers_for_consolidation}")
-                    
-                    consolidation_tasks = []
-                    for power_name, agent in agents.items():
-                        if not game.powers[power_name].is_eliminated():
-                            logger.info(f"[DIARY CONSOLIDATION] Adding consolidation task for {power_name}")
-                            consolidation_tasks.append(
-                                agent.consolidate_entire_diary(
-                                    game,
-                                    llm_log_file_path,
-                                    entries_to_keep_unsummarized=MIN_LATEST_FULL_ENTRIES
-                                )
-                            )
-                        else:
-                            logger.info(f"[DIARY CONSOLIDATION] Skipping eliminated power: {power_name}")
-                    
-                    if consolidation_tasks:
-                        logger.info(f"[DIARY CONSOLIDATION] Running {len(consolidation_tasks)} diary consolidation tasks...")
-                        await asyncio.gather(*consolidation_tasks, return_exceptions=True)
-                        logger.info("[DIARY CONSOLIDATION] Diary consolidation complete")
-                    else:
-                        logger.warning("[DIARY CONSOLIDATION] No consolidation tasks to run")
-                else:
-                    logger.info(f"[DIARY CONSOLIDATION] Conditions not met for consolidation.")
-            except (ValueError, IndexError) as e:
-                logger.error(f"[DIARY CONSOLIDATION] ERROR: Could not parse year from phase {current_phase}: {e}")
-            except Exception as e:
-                logger.error(f"[DIARY CONSOLIDATION] UNEXPECTED ERROR: {e}", exc_info=True)
-        # --- End Diary Consolidation ---
-
-        # --- Async State Update --- 
-        logger.info(f"Starting state update analysis for completed phase {completed_phase_name}...")
-        
-        # Phase summary is already retrieved above
-        if f"Summary for {current_phase} not found" in phase_summary:
-             logger.warning(phase_summary)
-
-        current_board_state = game.get_state() # State *after* processing
-
-        # Update state concurrently for active agents
-        active_agent_powers = [p for p in game.powers.items() if p[0] in agents and not p[1].is_eliminated()] # Filter for powers with active agents AND not eliminated
-        
-        # Log active and eliminated powers for state updates
-        active_powers_for_state_update = [p[0] for p in active_agent_powers]
-        eliminated_powers_for_state_update = [p for p in agents.keys() if game.powers[p].is_eliminated()]
-        
-        logger.info(f"Active powers for state update: {active_powers_for_state_update}")
-        if eliminated_powers_for_state_update:
-            logger.info(f"Eliminated powers (skipped): {eliminated_powers_for_state_update}")
-
-        if active_agent_powers: # Only run if there are agents to update
-             logger.info(f"Beginning concurrent state analysis for {len(active_agent_powers)} agents...")
-             
-             state_update_tasks = []
-             power_names_for_analysis = []
-
-             for power_name, _ in active_agent_powers:
-                  agent = agents[power_name]
-                  logger.debug(f"Preparing state analysis task for {power_name}")
-                  # Append the awaitable call
-                  state_update_tasks.append(
-                       agent.analyze_phase_and_update_state(
-                            game, 
-                            current_board_state, # Use state AFTER processing
-                            phase_summary, 
-                            game_history,
-                            llm_log_file_path,
-                       )
-                  )
-                  power_names_for_analysis.append(power_name)
-                  
-             # Run analysis tasks concurrently
-             if state_update_tasks:
-                  logger.debug(f"Running {len(state_update_tasks)} state analysis tasks concurrently...")
-                  analysis_results = await asyncio.gather(*state_update_tasks, return_exceptions=True)
-             else:
-                  analysis_results = []
-                  
-             # Process results (check for exceptions)
-             for i, result in enumerate(analysis_results):
-                 power_name = power_names_for_analysis[i]
-                 if isinstance(result, Exception):
-                      logger.error(f"Error during state analysis for {power_name}: {result}", exc_info=result)
-                      # Optionally log error stats here
-                 else:
-                      # Result is None if the function completes normally
-                      logger.debug(f"State analysis completed successfully for {power_name}.")
-
-             # === Populate relationship history for the completed phase ===
-             current_phase_name_for_history = completed_phase_name # Or game.current_short_phase if more appropriate
-             all_phase_relationships_history[current_phase_name_for_history] = {}
-             for power_name, agent_obj in agents.items():
-                 all_phase_relationships_history[current_phase_name_for_history][power_name] = agent_obj.relationships.copy()
-             logger.info(f"Recorded relationships for phase {current_phase_name_for_history} into history.")
-             # ==========================================================
-
-             logger.info(f"Finished concurrent state analysis for {len(active_agent_powers)} agents.")
-             logger.info(f"Completed state update analysis for phase {completed_phase_name}.")
-        else:
-             logger.info(f"No active agents found to perform state update analysis for phase {completed_phase_name}.")
-        # --- End Async State Update ---
-
-        # Append the strategic directives to the manifesto file
-        strategic_directives = game_history.get_strategic_directives()
-        if strategic_directives:
-            out_str = f"Strategic directives for {current_phase}:\n"
-            for power, directive in strategic_directives.items():
-                out_str += f"{power}: {directive}\n\n"
-            out_str += f"------------------------------------------\n"
-            with open(manifesto_path, "a") as f:
-                f.write(out_str)
-
-        # Check if we've exceeded the max year
-        year_str = current_phase[1:5]
-        year_int = int(year_str)
-        if year_int > max_year:
-            logger.info(f"Reached year {year_int}, stopping the test game early.")
-            break
-
-    # Game is done
-    total_time = time.time() - start_whole
-    logger.info(f"Game ended after {total_time:.2f}s. Saving results...")
-
-    # Now save the game with our added data
-    output_path = game_file_path
-    # If the file already exists, append a timestamp to the filename
-    if os.path.exists(output_path):
-        logger.info("Game file already exists, saving with unique filename.")
-        timestamp = int(time.time())
-        base, ext = os.path.splitext(output_path)
-        output_path = f"{base}_{timestamp}{ext}"
-
-    # Generate the saved game JSON using the standard export function
-    saved_game = to_saved_game_format(game)
-    
-    # Verify phase_summaries are available in game.phase_summaries
-    logger.info(f"Game has {len(game.phase_summaries)} phase summaries: {list(game.phase_summaries.keys())}")
-
-    # CRITICAL: Add phase_summaries as a top-level property in the saved game
-    # The frontend expects this exact structure
-    saved_game['phase_summaries'] = game.phase_summaries
-    logger.info(f"Added phase_summaries to saved game with {len(game.phase_summaries)} phases")
-
-    # Also add summaries to individual phases for backward compatibility
-    summary_phases_count = 0
-    for i, phase in enumerate(saved_game['phases']):
-        phase_name = phase['name']
-        if phase_name in game.phase_summaries:
-            saved_game['phases'][i]['summary'] = game.phase_summaries[phase_name]
-            summary_phases_count += 1
-            logger.debug(f"Added summary to phase {phase_name} in export")
-    logger.info(f"Added summaries to {summary_phases_count}/{len(saved_game['phases'])} phases in the export")
-
-    # == Capture Final Agent States After All Updates ==
-    final_agent_states = {}
-    if agents: # Ensure agents exist
+
+            # == Run the phase ==
+            await graph.run()
+            graph.write_timings(phase_timings_path)
+            telemetry.write_phase_breakdown(graph, phase_metrics_path)
+            logger.info(
+                f"Phase {current_phase} task graph took {graph.wall_time:.2f}s; "
+                f"critical path: {' -> '.join(graph.critical_path())}"
+            )
+
+            # === Populate relationship history for the completed phase ===
+            current_phase_name_for_history = completed_phase_name # Or game.current_short_phase if more appropriate
+            all_phase_relationships_history[current_phase_name_for_history] = {}
+            for power_name, agent_obj in agents.items():
+                all_phase_relationships_history[current_phase_name_for_history][power_name] = agent_obj.relationships.copy()
+            logger.info(f"Recorded relationships for phase {current_phase_name_for_history} into history.")
+            # ==========================================================
+
+            # Append the completed phase to the game stream so a crash loses at most the phase in progress
+            game_stream.write_phase(
+                current_short_phase,
+                agent_relationships=all_phase_relationships_history[current_phase_name_for_history],
+            )
+            # Checkpoint after the phase so --resume can continue from here without repeating any LLM call
+            checkpoint.write(
+                game,
+                game_history,
+                agents,
+                model_error_stats,
+                all_phase_relationships,
+                all_phase_relationships_history,
+                completed_phase=current_short_phase,
+            )
+
+            # Log phase duration
+            phase_end = time.time()
+            logger.info(f"Phase {current_phase} took {phase_end - phase_start:.2f}s")
+
+            # Append the strategic directives to the manifesto file
+            strategic_directives = game_history.get_strategic_directives()
+            if strategic_directives:
+                out_str = f"Strategic directives for {current_phase}:\n"
+                for power, directive in strategic_directives.items():
+                    out_str += f"{power}: {directive}\n\n"
+                out_str += f"------------------------------------------\n"
+                with open(manifesto_path, "a") as f:
+                    f.write(out_str)
+
+            # Check if we've exceeded the max year
+            year_str = current_phase[1:5]
+            year_int = int(year_str)
+            if year_int > max_year:
+                logger.info(f"Reached year {year_int}, stopping the test game early.")
+                break
+
+        # Game is done
+        total_time = time.time() - start_whole
+        logger.info(f"Game ended after {total_time:.2f}s. Saving results...")
+
+        # Now save the game with our added data
+        output_path = game_file_path
+        # If the file already exists, append a timestamp to the filename
+        if os.path.exists(output_path):
+            logger.info("Game file already exists, saving with unique filename.")
+            timestamp = int(time.time())
+            base, ext = os.path.splitext(output_path)
+            output_path = f"{base}_{timestamp}{ext}"
+
+        # Make sure every narrative summary has landed before exporting
+        await wait_for_narratives(game)
+
+        # == Capture Final Agent States After All Updates ==
+        final_agent_states = {}
         for power_name, agent in agents.items():
-            # Access attributes directly as they should exist on the agent object
             final_agent_states[power_name] = {
                 "relationships": agent.relationships,
                 "goals": agent.goals,
                 # Optionally add last diary entry or other final state info here
             }
         logger.info(f"Captured final states for {len(final_agent_states)} agents.")
-        # Add this dictionary to the main saved_game object
-        saved_game['final_agent_states'] = final_agent_states
-        logger.info("Added 'final_agent_states' key to the saved game data.")
-    else:
-        logger.info("No agents found, skipping capture of final agent states.")
-        saved_game['final_agent_states'] = {} # Add empty dict for consistency
-
-    # == Add Agent Relationships to Each Phase in the Export (Using History) ==
-    relationships_added_to_phases_count = 0
-    for i, phase_data in enumerate(saved_game.get('phases', [])):
-        phase_name = phase_data.get('name')
-        if phase_name in all_phase_relationships_history:
-            saved_game['phases'][i]['agent_relationships'] = all_phase_relationships_history[phase_name]
-            relationships_added_to_phases_count += 1
-            logger.debug(f"Added agent_relationships from history to phase {phase_name} in export")
-    logger.info(f"Added agent_relationships from history to {relationships_added_to_phases_count}/{len(saved_game.get('phases', []))} phases in the export")
-    # ======================================================================
-
-    # Save the modified game data
-    logger.info(f"Saving game to {output_path}...")
-    with open(output_path, "w") as f:
-        json.dump(saved_game, f, indent=4)
-
-    # Dump error stats and power model mapping to the overview file
-    with open(overview_file_path, "w") as overview_file:
-        overview_file.write(json.dumps(model_error_stats) + "\n")
-        overview_file.write(json.dumps(game.power_model_map) + "\n")
-        overview_file.write(json.dumps(vars(args)) + "\n")
-
-    logger.info(f"Saved game data, manifesto, and error stats in: {result_folder}")
+
+        # Close the stream with the current phase, every phase summary and the final agent states, then compact it
+        # into the lmvsgame.json schema (top-level phase_summaries, per-phase summary and agent_relationships)
+        game_stream.write_final(final_agent_states)
+        game_stream.close()
+        checkpoint.close()
+        logger.info(f"Saving game to {output_path}...")
+        compact_game_stream(game_stream_path, output_path)
+
+        # Dump error stats and power model mapping to the overview file
+        with open(overview_file_path, "w") as overview_file:
+            overview_file.write(json.dumps(model_error_stats) + "\n")
+            overview_file.write(json.dumps(game.power_model_map) + "\n")
+            overview_file.write(json.dumps(vars(args)) + "\n")
+            # The rate limiter and response cache are process-wide: with --num_games these count every game
+            overview_file.write(json.dumps({"rate_limits": rate_limiter.summary(), "scope": "process"}) + "\n")
+            overview_file.write(json.dumps({"llm_telemetry": telemetry.summary()}) + "\n")
+            if response_cache is not None:
+                overview_file.write(json.dumps({"response_cache": response_cache.summary(), "scope": "process"}) + "\n")
+
+        logger.info(f"Saved game data, manifesto, and error stats in: {result_folder}")
+        return result_folder
+    finally:
+        cancel_narratives(game)
+        game_stream.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        if telemetry is not None:
+            telemetry.close()
+        release_phase_context(game)
+        await close_llm_log_writer(llm_log_file_path)
+        logging.getLogger().removeHandler(file_handler)
+        file_handler.close()
+
+
+async def run_games(args, response_cache=None):
+    """
+    Runs args.num_games independent games on this event loop, at most args.max_concurrent_games at a time.
+
+    Each game runs in its own task (and so its own copy of the per-game ContextVars) with its own
+    results folder. A game that fails is logged and does not stop the others.
+    """
+    timestamp_str = time.strftime("%Y%m%d_%H%M%S")
+    limit = args.max_concurrent_games if args.max_concurrent_games > 0 else args.num_games
+    semaphore = asyncio.Semaphore(limit)
+    logger.info(f"Running {args.num_games} games concurrently (at most {limit} at a time)")
+
+    async def run_one(game_index: int):
+        result_folder = f"./results/{timestamp_str}_game{game_index}"
+        game_file_path = None
+        if args.output:
+            base, ext = os.path.splitext(args.output)
+            game_file_path = f"{base}_game{game_index}{ext}"
+        async with semaphore:
+            return await run_game(args, result_folder, game_file_path, response_cache)
+
+    results = await asyncio.gather(
+        *(run_one(i) for i in range(1, args.num_games + 1)), return_exceptions=True
+    )
+    for game_index, result in enumerate(results, start=1):
+        if isinstance(result, BaseException):
+            logger.error(f"Game {game_index} failed: {result}", exc_info=result)
+        elif result is None:
+            logger.error(f"Game {game_index} did not start.")
+        else:
+            logger.info(f"Game {game_index} finished: {result}")
+    return results
+
+
+async def main():
+    args = parse_arguments()
+    configure_shared_resources(args)
+
+    # One cache for the whole process; concurrent games read and fill it together
+    response_cache = None
+    if args.response_cache:
+        response_cache = ResponseCache(args.response_cache, max_bytes=args.response_cache_max_mb * 1024 * 1024)
+
+    try:
+        if args.num_games > 1:
+            await run_games(args, response_cache)
+        else:
+            await run_game(args, response_cache=response_cache)
+    finally:
+        if response_cache is not None:
+            response_cache.close()
+        await aclose_all()
     logger.info("Done.")
 
 
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Round-trip tests for phase checkpoints and --resume (ai_diplomacy/checkpoint.py)."""
+
+import copy
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.insert(0, str(Path(__file__).parent))
+
+from diplomacy import Game
+
+from ai_diplomacy.checkpoint import CheckpointWriter, load_checkpoint
+from ai_diplomacy.game_history import GameHistory
+
+ORDERS = {
+    "S1901M": {"FRANCE": ["A PAR - BUR", "A MAR - SPA", "F BRE - MAO"], "GERMANY": ["A MUN - RUH", "F KIE - DEN"]},
+    "F1901M": {"FRANCE": ["F MAO - POR", "A BUR - BEL"], "GERMANY": ["A RUH - HOL", "F DEN H"]},
+    "W1901A": {"FRANCE": ["A PAR B", "F BRE B"], "GERMANY": ["A MUN B"]},
+    "S1902M": {"FRANCE": ["A BEL H"], "GERMANY": ["A HOL H"]},
+}
+
+
+def _new_game():
+    game = Game()
+    game.power_model_map = {power: f"model-{power.lower()}" for power in game.powers}
+    game.phase_summaries = {}
+    agents = {
+        power: SimpleNamespace(
+            goals=[f"{power} goal"], relationships={"ENGLAND": "Neutral"},
+            private_journal=[], full_private_diary=[], private_diary=[],
+        )
+        for power in ("FRANCE", "GERMANY")
+    }
+    return game, GameHistory(), agents
+
+
+def _play_phase(game, game_history, agents, stats, relationships, relationships_history):
+    """One phase the way lm_game.py records it, then the mutations that cross record boundaries."""
+    phase = game.get_current_phase()
+    game_history.add_phase(phase)
+    game_history.add_message(phase, "FRANCE", "GERMANY", f"Deal for {phase}? {{\"braces\": \"and \\\"quotes\\\"\"}}")
+    for power, orders in ORDERS.get(phase, {}).items():
+        game.set_orders(power, orders)
+        game_history.add_orders(phase, power, orders)
+    game.process()
+    game.phase_summaries[phase] = f"Summary of {phase}"
+    for power, agent in agents.items():
+        agent.full_private_diary.append(f"[{phase}] {power} diary")
+        agent.private_diary.append(f"[{phase}] {power} diary")
+        agent.private_journal.append(f"{phase} note")
+        agent.goals = [f"{power} goal after {phase}"]
+    stats["model-france"]["order_decoding_errors"] += 1
+    relationships[phase] = {power: dict(agent.relationships) for power, agent in agents.items()}
+    relationships_history[phase] = {"FRANCE": {"GERMANY": "Friendly"}}
+    return phase
+
+
+def _snapshot(game, game_history, agents, stats, relationships, relationships_history, completed):
+    return {
+        "phase": game.get_current_phase(),
+        "state": copy.deepcopy(game.get_state()),
+        "summaries": dict(game.phase_summaries),
+        "history": [phase.to_dict() for phase in game_history.phases],
+        "agents": {
+            power: {
+                "goals": list(agent.goals),
+                "relationships": dict(agent.relationships),
+                "private_journal": list(agent.private_journal),
+                "full_private_diary": list(agent.full_private_diary),
+                "private_diary": list(agent.private_diary),
+            }
+            for power, agent in agents.items()
+        },
+        "stats": copy.deepcopy({model: dict(s) for model, s in stats.items()}),
+        "relationships": copy.deepcopy(relationships),
+        "relationships_history": copy.deepcopy(relationships_history),
+        "completed": list(completed),
+    }
+
+
+def _loaded(state):
+    return {
+        "phase": state.game.get_current_phase(),
+        "state": state.game.get_state(),
+        "summaries": dict(state.game.phase_summaries),
+        "history": [phase.to_dict() for phase in state.game_history.phases],
+        "agents": state.agent_states,
+        "stats": state.model_error_stats,
+        "relationships": state.all_phase_relationships,
+        "relationships_history": state.all_phase_relationships_history,
+        "completed": state.completed_phases,
+    }
+
+
+def _comparable(snapshot):
+    # The engine state carries a timestamp that differs between the live and the rebuilt game
+    return dict(snapshot, state={k: v for k, v in snapshot["state"].items() if k != "timestamp"})
+
+
+def test_checkpoint_round_trip_with_torn_last_line():
+    game, game_history, agents = _new_game()
+    stats = {"model-france": {"conversation_errors": 0, "order_decoding_errors": 0}}
+    relationships, relationships_history, completed = {}, {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoint.jsonl")
+        writer = CheckpointWriter(path, game)
+        writer.write(game, game_history, agents, stats, relationships, relationships_history)
+
+        for index in range(3):
+            completed.append(_play_phase(game, game_history, agents, stats, relationships, relationships_history))
+            if index == 1:
+                # Consolidation rewrites the context diary: the next record must store it in full
+                for power, agent in agents.items():
+                    agent.private_diary = [f"{power} consolidated summary", agent.private_diary[-1]]
+            writer.write(game, game_history, agents, stats, relationships, relationships_history, completed[-1])
+            # Late additions to the last history phase must reach the next record (history_start overlap)
+            game_history.add_message(completed[-1], "GERMANY", "FRANCE", f"Late reply in {completed[-1]}")
+        expected = _snapshot(game, game_history, agents, stats, relationships, relationships_history, completed)
+
+        # One more phase whose record is cut short by a "crash"
+        completed.append(_play_phase(game, game_history, agents, stats, relationships, relationships_history))
+        writer.write(game, game_history, agents, stats, relationships, relationships_history, completed[-1])
+        writer.close()
+        size = os.path.getsize(path)
+        with open(path, "r+b") as f:
+            f.truncate(size - 200)
+
+        state = load_checkpoint(path)
+        assert state.records == 4  # initialization + 3 phases
+        assert state.valid_bytes < size - 200
+        assert state.last_completed_phase == expected["completed"][-1]
+        assert state.power_model_map == game.power_model_map
+        # Late messages written after the last complete record are lost; everything before it survives
+        expected["history"][-1]["messages"] = expected["history"][-1]["messages"][:-1]
+        assert _comparable(_loaded(state)) == _comparable(expected)
+        assert state.agent_states["FRANCE"]["private_diary"][0] == "FRANCE consolidated summary"
+
+        # Resuming truncates the torn line and appends after the last complete record
+        resumed_writer = CheckpointWriter(path, state.game, resume_state=state)
+        assert os.path.getsize(path) == state.valid_bytes
+        resumed_agents = {power: SimpleNamespace(**agent_state) for power, agent_state in state.agent_states.items()}
+        resumed_phase = _play_phase(
+            state.game, state.game_history, resumed_agents, state.model_error_stats,
+            state.all_phase_relationships, state.all_phase_relationships_history,
+        )
+        resumed_writer.write(
+            state.game, state.game_history, resumed_agents, state.model_error_stats,
+            state.all_phase_relationships, state.all_phase_relationships_history, resumed_phase,
+        )
+        resumed_writer.close()
+        resumed_expected = _snapshot(
+            state.game, state.game_history, resumed_agents, state.model_error_stats,
+            state.all_phase_relationships, state.all_phase_relationships_history,
+            expected["completed"] + [resumed_phase],
+        )
+
+        reloaded = load_checkpoint(path)
+        assert reloaded.records == 5
+        assert _comparable(_loaded(reloaded)) == _comparable(resumed_expected)
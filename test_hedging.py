@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Tests for hedged requests to a secondary model (ai_diplomacy/hedging.py)."""
+
+import asyncio
+import sys
+from collections import defaultdict
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import ai_diplomacy.clients as clients
+from ai_diplomacy.hedging import hedged_call, hedging, model_error_stats_var
+
+
+class FakeClient:
+    def __init__(self, model_name, system_prompt="", max_tokens=1000):
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.max_tokens = max_tokens
+
+
+def _run_hedged(attempt, deadline=None, hedge_after=0.01):
+    """Runs hedged_call on a primary that hedges to itself after `hedge_after` seconds; returns (result, stats)."""
+    if hedge_after is None:
+        hedging.configure()
+    else:
+        hedging.configure(hedge_percentile=0.5, min_hedge_delay=hedge_after, min_samples=1)
+        hedging.record_latency("primary", "order", hedge_after)
+    client = FakeClient("primary")
+
+    async def run():
+        stats = defaultdict(dict)
+        model_error_stats_var.set(stats)
+        result = await hedged_call(client, "order", attempt, deadline=deadline)
+        attempt.cleaned_up_at_return = list(attempt.cleaned_up)
+        return result, stats
+
+    try:
+        return asyncio.run(run())
+    finally:
+        hedging.configure()
+
+
+class Attempts:
+    """attempt() for hedged_call: the n-th request (0 = primary, 1 = hedge) runs behaviours[n]."""
+
+    def __init__(self, *behaviours):
+        self.behaviours = behaviours
+        self.started = 0
+        self.cancelled = []
+        self.cleaned_up = []
+
+    async def __call__(self, target_client):
+        index = self.started
+        self.started += 1
+        delay, outcome = self.behaviours[index]
+        try:
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        finally:
+            self.cleaned_up.append(index)
+
+
+def test_hedge_wins_and_slow_primary_is_cancelled_and_awaited():
+    attempts = Attempts((5, "primary"), (0.02, "hedge"))
+    (response, _), stats = _run_hedged(attempts)
+    assert response == "hedge"
+    assert stats["primary"] == {"hedges_fired": 1, "hedges_won": 1}
+    # The losing primary was cancelled and had finished its cleanup before hedged_call returned
+    assert attempts.cancelled == [0]
+    assert sorted(attempts.cleaned_up_at_return) == [0, 1]
+
+
+def test_primary_wins_before_hedge_returns():
+    attempts = Attempts((0.05, "primary"), (5, "hedge"))
+    (response, _), stats = _run_hedged(attempts)
+    assert response == "primary"
+    assert stats["primary"] == {"hedges_fired": 1}
+    assert attempts.cancelled == [1]
+    assert sorted(attempts.cleaned_up_at_return) == [0, 1]
+
+
+def test_deadline_returns_empty_and_cancels_everything():
+    attempts = Attempts((5, "primary"), (5, "hedge"))
+    (response, answered_by), stats = _run_hedged(attempts, deadline=0.1)
+    assert response == "" and answered_by.model_name == "primary"
+    assert stats["primary"] == {"hedges_fired": 1, "deadline_timeouts": 1}
+    assert sorted(attempts.cancelled) == [0, 1]
+    assert sorted(attempts.cleaned_up_at_return) == [0, 1]
+
+
+def test_deadline_without_hedging():
+    attempts = Attempts((5, "primary"))
+    (response, _), stats = _run_hedged(attempts, deadline=0.05, hedge_after=None)
+    assert response == ""
+    assert stats["primary"] == {"deadline_timeouts": 1}
+    assert attempts.cancelled == [0]
+
+
+def test_primary_fails_after_hedge_fired_and_hedge_succeeds():
+    attempts = Attempts((0.03, RuntimeError("primary down")), (0.08, "hedge"))
+    (response, _), stats = _run_hedged(attempts)
+    assert response == "hedge"
+    assert stats["primary"] == {"hedges_fired": 1, "hedges_won": 1}
+    assert attempts.cancelled == []
+
+
+def test_every_request_failing_raises_the_first_error():
+    attempts = Attempts((0.03, RuntimeError("primary down")), (0.05, ValueError("hedge down")))
+    try:
+        _run_hedged(attempts)
+    except RuntimeError as e:
+        assert str(e) == "primary down"
+    else:
+        raise AssertionError("expected the primary's error")
+
+
+def test_concurrent_hedges_keep_their_own_system_prompt():
+    """Two powers on the same primary model hedging at once each send their own system prompt."""
+    original_loader = clients.load_model_client
+    clients.load_model_client = lambda model_id: FakeClient(model_id)
+    hedging.configure(hedge_percentile=0.5, min_hedge_delay=0.01, min_samples=1, secondary_models={"primary": "secondary"})
+    hedging.record_latency("primary", "order", 0.01)
+    try:
+        england = FakeClient("primary", system_prompt="You are ENGLAND", max_tokens=111)
+        france = FakeClient("primary", system_prompt="You are FRANCE", max_tokens=222)
+
+        async def attempt(target_client):
+            if target_client.model_name == "primary":
+                await asyncio.sleep(5)  # The primary is slow, so the hedge answers
+            # Clients read their prompt only once the rate limiter lets the call through
+            await asyncio.sleep(0.05)
+            return f"{target_client.system_prompt}/{target_client.max_tokens}"
+
+        async def run_both():
+            return await asyncio.gather(
+                hedged_call(england, "order", attempt),
+                hedged_call(france, "order", attempt),
+            )
+
+        (england_response, england_hedge), (france_response, france_hedge) = asyncio.run(run_both())
+    finally:
+        clients.load_model_client = original_loader
+        hedging.configure()
+
+    assert england_hedge.model_name == "secondary" and france_hedge.model_name == "secondary"
+    assert england_hedge is not france_hedge
+    assert england_response == "You are ENGLAND/111"
+    assert france_response == "You are FRANCE/222"
@@ -53,6 +53,30 @@ def test_ignored_messages_tracking():
     print("✅ Ignored message tracking test passed!")
     return True
 
+def test_indexed_history_tracks_direct_edits():
+    """Lookups stay correct when phases/messages are added through the API or appended directly."""
+    game_history = GameHistory()
+    game_history.add_phase("S1901M")
+    game_history.add_message("S1901M", "ENGLAND", "FRANCE", "Belgium?")
+    game_history.add_message("S1901M", "FRANCE", "GLOBAL", "Hello ENGLAND")
+
+    phase2 = Phase("F1901M")
+    phase2.messages = [{"sender": "FRANCE", "recipient": "ENGLAND", "content": "Yes."}]
+    game_history.phases.append(phase2)
+    game_history.add_message("F1901M", "GERMANY", "ENGLAND", "Denmark?")
+
+    assert [m.content for m in game_history.get_messages_by_phase("S1901M")] == ["Belgium?", "Hello ENGLAND"]
+    assert len(game_history.get_messages_by_phase("F1901M")) == 2
+    assert game_history.get_messages_by_phase("S1999M") == []
+    assert "FRANCE" in game_history.phases[0].get_private_messages("ENGLAND")
+    assert [m["sender"] for m in game_history.get_recent_messages_to_power("ENGLAND")] == ["FRANCE", "FRANCE", "GERMANY"]
+    assert game_history.get_ignored_messages_by_power("ENGLAND") == {}
+
+    # Replacing a phase's message list re-indexes it
+    game_history.phases[0].messages = []
+    assert game_history.get_messages_by_phase("S1901M") == []
+    assert game_history.phases[0].get_global_messages() == ""
+
 if __name__ == "__main__":
     print("Ignored Messages Tracking Test")
     print("============================\n")
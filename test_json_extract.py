@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Tests for JSON extraction from LLM responses (ai_diplomacy/json_extract.py)."""
+
+import json
+import random
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from ai_diplomacy.clients import STREAM_STOP_KEYS
+from ai_diplomacy.json_extract import JsonStreamDetector, extract_orders, iter_json_objects, scan_json_candidates
+
+
+def test_scan_finds_top_level_objects_in_order():
+    text = 'Reasoning {"a": 1} more prose {"b": {"c": 2}} end'
+    candidates = scan_json_candidates(text)
+    assert [c.text for c in candidates] == ['{"a": 1}', '{"b": {"c": 2}}']
+    assert [c.start for c in candidates] == [text.index('{"a"'), text.index('{"b"')]
+    assert all(c.complete and not c.fenced and not c.after_marker for c in candidates)
+
+
+def test_scan_marks_marker_and_fenced_candidates():
+    text = 'x {"bare": 1}\n```json\n{"fenced": 1}\n```\nPARSABLE OUTPUT:\n{"marked": 1}'
+    bare, fenced, marked = scan_json_candidates(text)
+    assert (bare.priority, fenced.priority, marked.priority) == (2, 1, 0)
+    assert fenced.fenced and not fenced.after_marker
+    assert marked.after_marker
+
+
+def test_scan_ignores_braces_and_escaped_quotes_in_strings():
+    text = 'PARSABLE OUTPUT: {"note": "a } brace, a \\" quote and a \\\\", "x": "{"} trailing'
+    (candidate,) = scan_json_candidates(text)
+    assert candidate.text == '{"note": "a } brace, a \\" quote and a \\\\", "x": "{"}'
+    assert next(iter_json_objects(text)) == {"note": 'a } brace, a " quote and a \\', "x": "{"}
+
+
+def test_scan_truncated_object_keeps_closed_nested_objects():
+    text = 'PARSABLE OUTPUT: {"updated_relationships": {"FRANCE": "Ally"}, "goals": ["hold'
+    candidates = scan_json_candidates(text)
+    assert [c.text for c in candidates] == ['{"FRANCE": "Ally"}', text[text.index("{"):]]
+    assert candidates[0].complete and not candidates[1].complete
+    assert candidates[1].priority == 0  # after the marker, even though truncated
+
+
+def test_scan_fence_abandons_unclosed_object():
+    text = '```json\n{"orders": ["A PAR H"]\n```\n{"orders": ["F BRE H"]}'
+    candidates = scan_json_candidates(text)
+    assert [c.text for c in candidates] == ['{"orders": ["F BRE H"]}']
+
+
+def test_iter_json_objects_prefers_marker_then_fenced_then_bare():
+    text = '{"bare": 1}\n```\n{"fenced": 1}\n```\n**PARSABLE OUTPUT:** {"marked": 1}'
+    assert list(iter_json_objects(text)) == [{"marked": 1}, {"fenced": 1}, {"bare": 1}]
+
+
+def test_iter_json_objects_unwraps_double_brace_templates():
+    text = 'PARSABLE OUTPUT:\n```{{"orders": ["A VIE - GAL"]}}```'
+    assert list(iter_json_objects(text)) == [{"orders": ["A VIE - GAL"]}]
+
+
+def test_iter_json_objects_cleans_comments_and_trailing_commas():
+    text = "JSON: {'intent': \"hold\", // keep it short\n \"goals\": [\"a\",],}"
+    assert list(iter_json_objects(text)) == [{"intent": "hold", "goals": ["a"]}]
+
+
+def test_iter_json_objects_required_key_skips_other_objects():
+    text = 'e.g. {like this} then {"other": 1} and {"orders": ["A PAR H"]}'
+    assert list(iter_json_objects(text, required_key="orders")) == [{"orders": ["A PAR H"]}]
+    assert list(iter_json_objects(text, required_key="missing")) == []
+
+
+def test_extract_orders_from_marker_block():
+    text = 'I will attack.\n\nPARSABLE OUTPUT:\n{\n  "orders": ["A PAR - BUR", "F BRE - MAO"]\n}\n'
+    assert extract_orders(text) == ["A PAR - BUR", "F BRE - MAO"]
+
+
+def test_extract_orders_prefers_marker_over_earlier_objects():
+    text = 'Draft: {"orders": ["A PAR H"]}\n```json\n{"orders": ["F BRE H"]}\n```\nPARSABLE OUTPUT: {"orders": ["A PAR - BUR"]}'
+    assert extract_orders(text) == ["A PAR - BUR"]
+
+
+def test_extract_orders_from_fenced_block_with_nested_object():
+    text = 'Plan:\n```json\n{"orders": ["A MAR S A PAR - BUR"], "meta": {"note": "{hold}"}}\n```'
+    assert extract_orders(text) == ["A MAR S A PAR - BUR"]
+
+
+def test_extract_orders_from_truncated_response():
+    text = 'PARSABLE OUTPUT:\n{"orders": ["A PAR - BUR", "F BRE - MAO"'
+    assert extract_orders(text) == ["A PAR - BUR", "F BRE - MAO"]
+
+
+def test_extract_orders_falls_back_to_bare_list():
+    text = "My orders: 'orders': ['A PAR H', 'F BRE H'] and no object around them"
+    assert extract_orders(text) == ["A PAR H", "F BRE H"]
+
+
+def test_extract_orders_without_orders_returns_none():
+    assert extract_orders('PARSABLE OUTPUT: {"goals": ["survive"]}') is None
+    assert extract_orders("") is None
+
+
+def _stream_corpus(n, seed=0):
+    """Responses built from the pieces that make the stream detector's state cross chunk boundaries."""
+    rng = random.Random(seed)
+    prose = [
+        "Considering Burgundy.", "e.g. {like this}", 'a "quoted {brace}" aside', "use `code` here",
+        "a ``` fence", "path C:\\temp\\", "JSON: is the format", "\n\n",
+    ]
+    markers = ["PARSABLE OUTPUT:", "**PARSABLE OUTPUT:**", "PARSABLE OUTPUT\n", "JSON: ", "parsable output -> "]
+    keys = sorted({key for stop_keys in STREAM_STOP_KEYS.values() for key in stop_keys}) + ["intent", "notes"]
+    values = ['a \\" quote', "back\\slash\\", "} brace {", "tick ` and ``` fence", "unicode \u00e9", "plain"]
+
+    def body():
+        data = {rng.choice(keys): [rng.choice(values) for _ in range(rng.randint(0, 3))]}
+        if rng.random() < 0.5:
+            data["nested"] = {"note": rng.choice(values), "deeper": {"x": rng.choice(values)}}
+        text = json.dumps(data, indent=rng.choice([None, 2]))
+        roll = rng.random()
+        if roll < 0.15:
+            text = "{" + text + "}"  # {{ ... }} template
+        elif roll < 0.25:
+            text = text[:-1] + ",}"  # needs the cleanup pass
+        elif roll < 0.3:
+            text = text[: len(text) // 2]  # never closes
+        return text
+
+    corpus = []
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            parts.append(" ".join(rng.choice(prose) for _ in range(rng.randint(0, 5))))
+            if rng.random() < 0.7:
+                parts.append(rng.choice(markers))
+            fenced = rng.random() < 0.3
+            parts.append(("```json\n" if fenced else "") + body() + ("\n```" if fenced else ""))
+        text = " ".join(parts)
+        if rng.random() < 0.2:
+            text = text[: rng.randint(0, len(text))]  # cut off at max_tokens
+        corpus.append(text)
+    return corpus
+
+
+def _chunks(text, rng):
+    pos = 0
+    while pos < len(text):
+        size = rng.choice([1, 1, 2, 3, rng.randint(1, 80)])
+        yield text[pos:pos + size]
+        pos += size
+
+
+def test_stream_detector_early_stop_matches_full_response():
+    """
+    Whenever feed() says stop, the text read so far parses like the whole response: the same
+    first object (DiplomacyAgent._extract_json_from_text) and, for orders, the same extract_orders.
+    """
+    rng = random.Random(1)
+    stops = 0
+    for text, response_type in ((t, r) for t in _stream_corpus(300) for r in STREAM_STOP_KEYS):
+        stop_keys = STREAM_STOP_KEYS[response_type]
+        whole = JsonStreamDetector(stop_keys)
+        whole_stopped = whole.feed(text)
+        for _ in range(3):
+            detector = JsonStreamDetector(stop_keys)
+            read = []
+            stopped = False
+            for chunk in _chunks(text, rng):
+                read.append(chunk)
+                if detector.feed(chunk):
+                    stopped = True
+                    break
+            # Chunking never changes the decision or the result
+            assert stopped == whole_stopped, text
+            assert detector.result == whole.result, text
+            if not stopped:
+                continue
+            stops += 1
+            truncated = "".join(read)
+            first = next(iter_json_objects(text), None)
+            assert next(iter_json_objects(truncated), None) == first == detector.result, text
+            if response_type == "order":
+                assert extract_orders(truncated) == extract_orders(text), text
+    assert stops > 300  # the corpus exercises the early stop, not just the read-to-the-end path